@@ -0,0 +1,5 @@
+"""
+Converter benchmarks
+Run from the project root with the sources on the path:
+    PYTHONPATH=src python -m benchmarks.run --help
+"""
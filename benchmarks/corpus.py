@@ -0,0 +1,203 @@
+"""
+Synthetic benchmark corpus
+Generates deterministic fixtures: the same scale always produces the same
+images, PDFs, spreadsheets and Word documents.
+"""
+import datetime
+import os
+import random
+import re
+import zipfile
+
+# Fixed timestamp for document metadata, so fixtures are byte-for-byte stable
+FIXED_DATE = datetime.datetime(2024, 1, 1)
+
+SCALES = {
+    'small': {
+        'image_sizes': (256, 1024),
+        'image_modes': ('RGB', 'RGBA', 'P'),
+        'pdf_rows': (50,),
+        'xlsx_rows': (500,),
+        'xlsx_sheets': 3,
+        'docx_paragraphs': (50,),
+    },
+    'large': {
+        'image_sizes': (256, 1024, 4096),
+        'image_modes': ('RGB', 'RGBA', 'P', 'L'),
+        'pdf_rows': (50, 1000),
+        'xlsx_rows': (1000, 20000),
+        'xlsx_sheets': 5,
+        'docx_paragraphs': (100, 2000),
+    },
+}
+
+
+def _words(rng, count):
+    vocabulary = ('invoice', 'total', 'amount', 'region', 'north', 'south', 'quarter',
+                  'revenue', 'cost', 'margin', 'units', 'price', 'customer', 'order')
+    return ' '.join(rng.choice(vocabulary) for _ in range(count))
+
+
+def _table_rows(rng, rows, columns=6):
+    header = [f'Column {index + 1}' for index in range(columns)]
+    body = [
+        [str(rng.randint(0, 99999)) if column % 2 else _words(rng, 2) for column in range(columns)]
+        for _ in range(rows)
+    ]
+    return [header] + body
+
+
+def _normalise_zip(path):
+    """
+    Rewrite an Office zip with fixed timestamps: entry dates and the
+    modified time that openpyxl and python-docx stamp on save
+    """
+    with zipfile.ZipFile(path) as source:
+        entries = [(info.filename, source.read(info)) for info in source.infolist()]
+
+    fixed = FIXED_DATE.strftime('%Y-%m-%dT%H:%M:%SZ').encode()
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, data in entries:
+            if name == 'docProps/core.xml':
+                data = re.sub(rb'(<dcterms:modified[^>]*>)[^<]*', rb'\g<1>' + fixed, data)
+            target.writestr(zipfile.ZipInfo(name, FIXED_DATE.timetuple()[:6]), data, zipfile.ZIP_DEFLATED)
+
+
+def make_image(path, size, mode, seed=0):
+    """Gradient with a band of noise, so encoders see both flat and busy areas"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.linear_gradient('L').resize((size, size))
+    noise = Image.frombytes('L', (size, size // 4), rng.randbytes(size * (size // 4)))
+    image.paste(noise, (0, size // 2))
+
+    if mode == 'RGB':
+        image = Image.merge('RGB', (image, image.rotate(90), image.rotate(180)))
+    elif mode == 'RGBA':
+        image = Image.merge('RGBA', (image, image.rotate(90), image.rotate(180), image.rotate(270)))
+    elif mode == 'P':
+        image = Image.merge('RGB', (image, image.rotate(90), image.rotate(180))).quantize(64)
+
+    image.save(path, format='PNG')
+    return path
+
+
+def make_pdf(path, rows, ruled, seed=0):
+    """PDF with a table, drawn with grid lines (ruled) or without"""
+    from reportlab import rl_config
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+    rl_config.invariant = 1
+    rng = random.Random(seed)
+    table = Table(_table_rows(rng, rows), repeatRows=1)
+    if ruled:
+        table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 0.5, colors.black)]))
+    SimpleDocTemplate(path, pagesize=A4).build([table])
+    return path
+
+
+def make_large_pdf(path, size_mb, seed=0):
+    """
+    PDF of about `size_mb` MB: pages of incompressible scan-like images,
+    each under a line of text, like a scanned report
+    """
+    import io
+
+    import fitz
+    from PIL import Image
+
+    rng = random.Random(seed)
+    document = fitz.open()
+    page_image_size = 1024
+    while True:
+        buffer = io.BytesIO()
+        Image.frombytes(
+            'RGB', (page_image_size, page_image_size), rng.randbytes(page_image_size * page_image_size * 3)
+        ).save(buffer, format='PNG', compress_level=1)
+        page = document.new_page()
+        page.insert_text((72, 60), _words(rng, 8))
+        page.insert_image(fitz.Rect(72, 80, 523, 531), stream=buffer.getvalue())
+        # Images dominate, so the stream lengths are a good size estimate
+        if document.page_count * len(buffer.getvalue()) >= size_mb * 1024 * 1024:
+            break
+    document.set_metadata({})
+    document.save(path, no_new_id=True)
+    document.close()
+    return path
+
+
+def make_xlsx(path, rows, sheets, seed=0):
+    """Workbook with several sheets of N rows each"""
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    workbook.properties.created = FIXED_DATE
+    workbook.properties.modified = FIXED_DATE
+    for index in range(sheets):
+        sheet = workbook.create_sheet(f'Sheet{index + 1}')
+        for row in _table_rows(rng, rows):
+            sheet.append(row)
+    workbook.save(path)
+    _normalise_zip(path)
+    return path
+
+
+def make_docx(path, paragraphs, seed=0):
+    """Word document with headings, paragraphs and a table every 20 paragraphs"""
+    import docx
+
+    rng = random.Random(seed)
+    document = docx.Document()
+    document.core_properties.created = FIXED_DATE
+    document.core_properties.modified = FIXED_DATE
+    for index in range(paragraphs):
+        if index % 20 == 0:
+            document.add_heading(_words(rng, 4), level=1)
+            rows = _table_rows(rng, 5, columns=4)
+            table = document.add_table(rows=len(rows), cols=4)
+            for row, values in zip(table.rows, rows):
+                for cell, value in zip(row.cells, values):
+                    cell.text = value
+        document.add_paragraph(_words(rng, 40))
+    document.save(path)
+    _normalise_zip(path)
+    return path
+
+
+def generate(output_dir, scale='small'):
+    """
+    Generate the corpus for a scale, reusing files that already exist
+
+    Args:
+        output_dir (str): Directory to write fixtures to
+        scale (str): Key of SCALES
+
+    Returns:
+        dict: kind ('image', 'pdf', 'xlsx', 'docx') -> list of (name, path)
+    """
+    settings = SCALES[scale]
+    os.makedirs(output_dir, exist_ok=True)
+    corpus = {'image': [], 'pdf': [], 'xlsx': [], 'docx': []}
+
+    def add(kind, name, maker, *args):
+        path = os.path.join(output_dir, name)
+        if not os.path.exists(path):
+            maker(path, *args)
+        corpus[kind].append((name, path))
+
+    for size in settings['image_sizes']:
+        for mode in settings['image_modes']:
+            add('image', f'image_{size}_{mode.lower()}.png', make_image, size, mode)
+    for rows in settings['pdf_rows']:
+        add('pdf', f'table_{rows}_ruled.pdf', make_pdf, rows, True)
+        add('pdf', f'table_{rows}_unruled.pdf', make_pdf, rows, False)
+    for rows in settings['xlsx_rows']:
+        add('xlsx', f'sheets_{settings["xlsx_sheets"]}x{rows}.xlsx', make_xlsx, rows, settings['xlsx_sheets'])
+    for paragraphs in settings['docx_paragraphs']:
+        add('docx', f'document_{paragraphs}.docx', make_docx, paragraphs)
+
+    return corpus
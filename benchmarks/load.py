@@ -0,0 +1,397 @@
+"""
+HTTP load generator for the conversion API
+
+Replays a weighted mix of /api/convert/* requests at a target rate (open
+loop) or with a fixed number of concurrent clients (closed loop), and
+reports latency percentiles, error rates and throughput per endpoint along
+with server CPU and RSS sampled during the run.
+
+    # In-process, through the Flask test client
+    PYTHONPATH=src python -m benchmarks.load --in-process --concurrency 4 --duration 30
+
+    # Start gunicorn locally and drive it at 5 requests/s
+    PYTHONPATH=src python -m benchmarks.load --spawn gunicorn --rps 5 --duration 60
+
+    # An already running server
+    PYTHONPATH=src python -m benchmarks.load --url http://localhost:5001 --server-pid 1234
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import corpus as corpus_module
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# (weight, path, corpus kind, form fields)
+DEFAULT_MIX = [
+    (6, '/api/convert/image', 'image', {'to_format': 'webp'}),
+    (2, '/api/convert/word-to-pdf', 'docx', {}),
+    (1, '/api/convert/excel-to-pdf', 'xlsx', {}),
+    (1, '/api/convert/pdf-to-word', 'pdf', {}),
+    (1, '/api/convert/pdf-to-excel', 'pdf', {}),
+]
+
+
+def load_mix(path):
+    """
+    Read a request mix from JSON: a list of objects with weight, path,
+    kind (image, pdf, xlsx or docx) and optional form fields
+    """
+    with open(path) as f:
+        return [(item['weight'], item['path'], item['kind'], item.get('form', {})) for item in json.load(f)]
+
+
+def encode_multipart(fields, filename, data):
+    """
+    Encode form fields and one file as multipart/form-data
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class HttpClient:
+    """Keep-alive HTTP client with one connection per thread"""
+
+    def __init__(self, url):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self._local = threading.local()
+
+    def post(self, path, fields, filename, data):
+        body, content_type = encode_multipart(fields, filename, data)
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port)
+            try:
+                connection.request('POST', path, body=body, headers={'Content-Type': content_type})
+                response = connection.getresponse()
+                payload = response.read()
+                return response.status, len(payload)
+            except (http.client.HTTPException, OSError):
+                # Server closed a kept-alive connection: reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+
+class InProcessClient:
+    """Client going through the Flask test client, without a network hop"""
+
+    def __init__(self):
+        os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+        from server import server
+        self.server = server
+        self._local = threading.local()
+
+    def post(self, path, fields, filename, data):
+        import io
+
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.server.test_client()
+        form = dict(fields)
+        form['file'] = (io.BytesIO(data), filename)
+        response = client.post(path, data=form, content_type='multipart/form-data')
+        return response.status_code, len(response.data)
+
+
+class ResourceSampler(threading.Thread):
+    """Samples CPU and RSS of a process tree at a fixed interval"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        from util.process_stats import process_tree_stats
+
+        last_cpu, last_time = process_tree_stats(self.pid)[0], time.monotonic()
+        while not self._stop_event.wait(self.interval):
+            cpu, rss = process_tree_stats(self.pid)
+            now = time.monotonic()
+            self.samples.append({
+                'cpu_percent': 100 * (cpu - last_cpu) / (now - last_time),
+                'rss_mb': rss / (1024 * 1024),
+            })
+            last_cpu, last_time = cpu, now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        cpu = [sample['cpu_percent'] for sample in self.samples]
+        rss = [sample['rss_mb'] for sample in self.samples]
+        return {
+            'cpu_percent_avg': sum(cpu) / len(cpu),
+            'cpu_percent_max': max(cpu),
+            'rss_mb_avg': sum(rss) / len(rss),
+            'rss_mb_max': max(rss),
+            'samples': len(self.samples),
+        }
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list, or None if it is empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarise(records, elapsed):
+    """
+    Aggregate request records per endpoint
+
+    Args:
+        records (list): (path, status, latency seconds) tuples
+        elapsed (float): Duration of the run in seconds
+
+    Returns:
+        dict: endpoint -> requests, errors, error_rate, throughput and
+            p50/p95/p99 latency in ms; 'all' aggregates every endpoint
+    """
+    groups = {}
+    for path, status, latency in records:
+        groups.setdefault(path, []).append((status, latency))
+        groups.setdefault('all', []).append((status, latency))
+
+    summary = {}
+    for path, items in groups.items():
+        latencies = [latency * 1000 for _, latency in items]
+        errors = sum(1 for status, _ in items if status is None or status >= 400)
+        summary[path] = {
+            'requests': len(items),
+            'errors': errors,
+            'error_rate': errors / len(items),
+            'throughput_rps': len(items) / elapsed if elapsed else 0,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+        }
+    return summary
+
+
+def run_load(client, mix, fixtures, duration, concurrency, rps=None, seed=0):
+    """
+    Drive the client with the request mix
+
+    With rps set, requests are scheduled at a fixed rate and latency counts
+    from the scheduled start, so queueing behind a slow server is measured
+    (no coordinated omission). Otherwise `concurrency` clients loop
+    back-to-back.
+
+    Returns:
+        tuple: (records, elapsed seconds)
+    """
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _, _ in mix]
+    records = []
+    records_lock = threading.Lock()
+
+    def send(request, scheduled):
+        _, path, kind, fields = request
+        filename, data = rng.choice(fixtures[kind])
+        try:
+            status, _ = client.post(path, fields, filename, data)
+        except Exception:
+            status = None
+        with records_lock:
+            records.append((path, status, time.monotonic() - scheduled))
+
+    started = time.monotonic()
+    deadline = started + duration
+
+    if rps:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            sent = 0
+            while True:
+                scheduled = started + sent / rps
+                if scheduled >= deadline:
+                    break
+                time.sleep(max(0, scheduled - time.monotonic()))
+                executor.submit(send, rng.choices(mix, weights)[0], scheduled)
+                sent += 1
+    else:
+        def worker():
+            while time.monotonic() < deadline:
+                send(rng.choices(mix, weights)[0], time.monotonic())
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return records, time.monotonic() - started
+
+
+def load_fixtures(mix, corpus_dir):
+    """Read corpus files for every kind used by the mix into memory"""
+    corpus = corpus_module.generate(corpus_dir, 'small')
+    fixtures = {}
+    for _, _, kind, _ in mix:
+        if kind not in fixtures:
+            fixtures[kind] = []
+            for name, path in corpus[kind]:
+                with open(path, 'rb') as f:
+                    fixtures[kind].append((name, f.read()))
+    return fixtures
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(kind):
+    """
+    Start a local server and wait until /api/health answers
+
+    Args:
+        kind (str): 'gunicorn' (production setup), 'uvicorn' (ASGI) or 'dev'
+            (server.py)
+
+    Returns:
+        tuple: (Popen, base url)
+    """
+    port = _free_port()
+    env = dict(os.environ, HOST='127.0.0.1', PORT=str(port), DEBUG='false')
+    # All load comes from one address, which the rate limiter would throttle
+    env.setdefault('RATE_LIMIT_ENABLED', 'false')
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py', 'wsgi:server']
+    elif kind == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1', '--port', str(port)]
+    else:
+        command = [sys.executable, 'server.py']
+    process = subprocess.Popen(command, cwd=SRC_DIR, env=env)
+
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(120):
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return process, url
+        except OSError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError('Server did not become healthy')
+
+
+def print_report(report):
+    print(f"{'endpoint':40s} {'reqs':>6s} {'err%':>6s} {'rps':>7s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+    for path, stats in sorted(report['endpoints'].items(), key=lambda item: item[0] == 'all'):
+        print(f"{path:40s} {stats['requests']:6d} {stats['error_rate'] * 100:6.1f} "
+              f"{stats['throughput_rps']:7.2f} {stats['p50_ms']:7.0f}ms {stats['p95_ms']:7.0f}ms "
+              f"{stats['p99_ms']:7.0f}ms")
+    server = report.get('server')
+    if server:
+        print(f"\nserver cpu avg {server['cpu_percent_avg']:.0f}% max {server['cpu_percent_max']:.0f}%, "
+              f"rss avg {server['rss_mb_avg']:.0f}MB max {server['rss_mb_max']:.0f}MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the conversion API')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='base url of a running server')
+    target.add_argument('--spawn', choices=('gunicorn', 'uvicorn', 'dev'), help='start a local server')
+    target.add_argument('--in-process', action='store_true', help='use the Flask test client')
+    parser.add_argument('--server-pid', type=int, help='pid to sample CPU/RSS from with --url')
+    parser.add_argument('--mix', help='JSON file describing the request mix')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--concurrency', type=int, default=4, help='clients, or max in flight with --rps')
+    parser.add_argument('--rps', type=float, help='target request rate (open loop)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'filea-bench-corpus', 'small'))
+    parser.add_argument('--output', help='write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    mix = load_mix(args.mix) if args.mix else DEFAULT_MIX
+    fixtures = load_fixtures(mix, args.corpus_dir)
+
+    process = None
+    if args.in_process:
+        client = InProcessClient()
+        # Samples include the load generator itself in this mode
+        server_pid = os.getpid()
+    elif args.spawn:
+        process, url = spawn_server(args.spawn)
+        client = HttpClient(url)
+        server_pid = process.pid
+    else:
+        client = HttpClient(args.url)
+        server_pid = args.server_pid
+
+    sampler = ResourceSampler(server_pid) if server_pid else None
+    try:
+        if sampler:
+            sampler.start()
+        records, elapsed = run_load(client, mix, fixtures, args.duration, args.concurrency, args.rps, args.seed)
+    finally:
+        if sampler:
+            sampler.stop()
+        if process:
+            process.terminate()
+            process.wait()
+
+    report = {
+        'config': {
+            'duration': args.duration,
+            'concurrency': args.concurrency,
+            'rps': args.rps,
+            'target': 'in-process' if args.in_process else (args.spawn or args.url),
+        },
+        'endpoints': summarise(records, elapsed) if records else {},
+        'server': sampler.summary() if sampler else {},
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
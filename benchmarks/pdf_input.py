@@ -0,0 +1,133 @@
+"""
+PDF input benchmark
+
+Compares opening a large PDF by path in every PyMuPDF-backed step (page
+count, pre-scan, pdf2docx) with mapping it once and handing all of them the
+same buffer. Each variant runs in a forked child and reports time, peak RSS
+growth, and the read syscalls and bytes read it made.
+
+    PYTHONPATH=src python -m benchmarks.pdf_input --size-mb 100
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import corpus as corpus_module
+
+
+def by_path(pdf_path, docx_path, pages):
+    """Every step opens the file itself"""
+    import fitz
+    import pdf2docx
+
+    with fitz.open(pdf_path, filetype='pdf') as pdf:
+        pdf.page_count, pdf.load_page(0).rect
+    with fitz.open(pdf_path, filetype='pdf') as pdf:
+        pdf.needs_pass
+    cv = pdf2docx.Converter(pdf_path)
+    try:
+        cv.convert(docx_path, start=0, end=pages)
+    finally:
+        cv.close()
+
+
+def by_mapping(pdf_path, docx_path, pages):
+    """One mapping shared by every step"""
+    import fitz
+    import pdf2docx
+    from util.mapped_file import mapped
+
+    with mapped(pdf_path) as buffer:
+        with fitz.open(stream=buffer, filetype='pdf') as pdf:
+            pdf.page_count, pdf.load_page(0).rect
+        with fitz.open(stream=buffer, filetype='pdf') as pdf:
+            pdf.needs_pass
+        cv = pdf2docx.Converter(pdf_path, stream=buffer)
+        try:
+            cv.convert(docx_path, start=0, end=pages)
+        finally:
+            cv.close()
+
+
+VARIANTS = (('path', by_path), ('mapped', by_mapping))
+
+
+def _run_variant(conn, func, pdf_path, pages):
+    """Child process body: run a variant once and measure it"""
+    from util.process_stats import current_rss, peak_rss, read_counters
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            start_rss = current_rss()
+            start_reads = read_counters()
+            started = time.perf_counter()
+            func(pdf_path, os.path.join(tmp_dir, 'output.docx'), pages)
+            seconds = time.perf_counter() - started
+            reads = read_counters()
+        conn.send({
+            'seconds': seconds,
+            'rss_delta_mb': (peak_rss() - start_rss) / (1024 * 1024),
+            'read_syscalls': reads[0] - start_reads[0] if reads else None,
+            'read_mb': (reads[1] - start_reads[1]) / (1024 * 1024) if reads else None,
+        })
+    except Exception as e:
+        conn.send({'error': f'{type(e).__name__}: {e}'})
+    finally:
+        conn.close()
+
+
+def run_variant(func, pdf_path, pages):
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_variant, args=(child_conn, func, pdf_path, pages))
+    process.start()
+    child_conn.close()
+    try:
+        outcome = parent_conn.recv()
+    except EOFError:
+        outcome = {'error': f'benchmark process exited with code {process.exitcode}'}
+    process.join()
+    return outcome
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare path and memory-mapped PDF input')
+    parser.add_argument('--size-mb', type=int, default=100, help='size of the generated PDF')
+    parser.add_argument('--pages', type=int, default=2, help='pages pdf2docx converts')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per variant; the median is shown')
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'filea-bench-corpus'))
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    pdf_path = os.path.join(args.corpus_dir, f'scanned_{args.size_mb}mb.pdf')
+    if not os.path.exists(pdf_path):
+        # In a child, so the parent (and every fork) stays small
+        generator = multiprocessing.get_context('fork').Process(
+            target=corpus_module.make_large_pdf, args=(pdf_path, args.size_mb)
+        )
+        generator.start()
+        generator.join()
+
+    # Import the libraries once in the parent so children don't time imports
+    import fitz  # noqa: F401
+    import pdf2docx  # noqa: F401
+
+    print(f"{os.path.basename(pdf_path)}: {os.path.getsize(pdf_path) / (1024 * 1024):.1f}MB")
+    print(f"{'input':10s} {'time':>10s} {'peak RSS +':>12s} {'read calls':>12s} {'read':>10s}")
+    for name, func in VARIANTS:
+        outcomes = [run_variant(func, pdf_path, args.pages) for _ in range(args.repeat)]
+        errors = [outcome['error'] for outcome in outcomes if 'error' in outcome]
+        if errors:
+            print(f"{name:10s} ERROR {errors[0]}")
+            return 1
+        median = sorted(outcomes, key=lambda outcome: outcome['seconds'])[len(outcomes) // 2]
+        print(f"{name:10s} {median['seconds'] * 1000:8.1f}ms {median['rss_delta_mb']:10.1f}MB "
+              f"{median['read_syscalls']:12d} {median['read_mb']:8.1f}MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
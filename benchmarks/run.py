@@ -0,0 +1,256 @@
+"""
+Converter benchmark runner
+
+Times each converter on the synthetic corpus and records throughput and
+peak RSS. Every benchmark runs in a forked child so peak RSS is measured
+per benchmark rather than accumulated across the run.
+
+    PYTHONPATH=src python -m benchmarks.run --output baseline.json
+    PYTHONPATH=src python -m benchmarks.run --compare baseline.json --threshold 0.15
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks import corpus as corpus_module
+
+IMAGE_TARGETS = ('jpg', 'webp', 'png', 'avif')
+
+# RSS growth below this is noise, whatever the relative change
+MIN_RSS_CHANGE_MB = 5
+
+
+def get_cases(corpus):
+    """
+    Build the benchmark cases for a corpus
+
+    Returns:
+        list: (name, input_path, output_extension, func(input_path, output_path))
+    """
+    from converters.image_converter import ImageConverter
+    from converters.pdf_converter import DocumentConverter
+    from converters.excel_converter import ExcelConverter
+
+    # Pillow keeps the original names, so older baselines still compare
+    engines = [('image_convert', 'pillow')]
+    if ImageConverter.ENGINES['vips'].available():
+        engines.append(('image_convert_vips', 'vips'))
+
+    cases = []
+    for name, path in corpus['image']:
+        for fmt in IMAGE_TARGETS:
+            for prefix, engine in engines:
+                cases.append((
+                    f'{prefix}/{name}->{fmt}', path, fmt,
+                    lambda input_path, output_path, fmt=fmt, engine=engine:
+                        ImageConverter.convert(input_path, output_path, fmt, engine)
+                ))
+    for name, path in corpus['pdf']:
+        cases.append((f'pdf_to_word/{name}', path, 'docx', DocumentConverter.pdf_to_word))
+        cases.append((f'pdf_to_excel/{name}', path, 'xlsx', ExcelConverter.pdf_to_excel))
+    for name, path in corpus['docx']:
+        cases.append((f'word_to_pdf/{name}', path, 'pdf', DocumentConverter.word_to_pdf))
+    for name, path in corpus['xlsx']:
+        cases.append((f'excel_to_pdf/{name}', path, 'pdf', ExcelConverter.excel_to_pdf))
+    return cases
+
+
+def _run_case(conn, func, input_path, output_extension, repeat):
+    """Child process body: warm up once, then time `repeat` runs"""
+    from util.process_stats import current_rss, peak_rss
+
+    try:
+        start_rss = current_rss()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, f'output.{output_extension}')
+            func(input_path, output_path)
+            durations = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                func(input_path, output_path)
+                durations.append(time.perf_counter() - started)
+        conn.send({'durations': durations, 'start_rss': start_rss, 'peak_rss': peak_rss()})
+    except Exception as e:
+        conn.send({'error': f'{type(e).__name__}: {e}'})
+    finally:
+        conn.close()
+
+
+def run_case(func, input_path, output_extension, repeat):
+    """
+    Run one benchmark in a forked child
+
+    Returns:
+        dict: seconds (median), min_seconds, mb_per_s, peak_rss_mb,
+            rss_delta_mb, or error
+    """
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case, args=(child_conn, func, input_path, output_extension, repeat))
+    process.start()
+    child_conn.close()
+    try:
+        outcome = parent_conn.recv()
+    except EOFError:
+        outcome = {'error': f'benchmark process exited with code {process.exitcode}'}
+    process.join()
+
+    if 'error' in outcome:
+        return outcome
+
+    median = statistics.median(outcome['durations'])
+    size_mb = os.path.getsize(input_path) / (1024 * 1024)
+    return {
+        'seconds': median,
+        'min_seconds': min(outcome['durations']),
+        'mb_per_s': size_mb / median if median else None,
+        'peak_rss_mb': outcome['peak_rss'] / (1024 * 1024),
+        'rss_delta_mb': (outcome['peak_rss'] - outcome['start_rss']) / (1024 * 1024),
+    }
+
+
+def run(scale, repeat, corpus_dir, name_filter=None):
+    """
+    Run every benchmark matching the filter
+
+    Returns:
+        dict: Results document with meta and per-benchmark results
+    """
+    from util.lazy_import import prewarm
+
+    # Generate fixtures in a child so the parent (and every fork) stays small
+    generator = multiprocessing.get_context('fork').Process(
+        target=corpus_module.generate, args=(corpus_dir, scale)
+    )
+    generator.start()
+    generator.join()
+    corpus = corpus_module.generate(corpus_dir, scale)
+
+    # Import the libraries once in the parent so children don't time imports
+    prewarm()
+
+    results = {}
+    for name, input_path, output_extension, func in get_cases(corpus):
+        if name_filter and name_filter not in name:
+            continue
+        result = run_case(func, input_path, output_extension, repeat)
+        results[name] = result
+        if 'error' in result:
+            print(f"{name:60s} ERROR {result['error']}")
+        else:
+            print(f"{name:60s} {result['seconds'] * 1000:10.1f}ms {result['peak_rss_mb']:8.1f}MB")
+
+    return {
+        'meta': {
+            'scale': scale,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare_engines(results):
+    """
+    Pair up the Pillow and libvips runs of each image benchmark
+
+    Returns:
+        list: (benchmark, pillow seconds, vips seconds, pillow peak RSS MB,
+            vips peak RSS MB) tuples
+    """
+    rows = []
+    for name, pillow in sorted(results.items()):
+        if not name.startswith('image_convert/'):
+            continue
+        vips = results.get(name.replace('image_convert/', 'image_convert_vips/', 1))
+        if vips is None or 'error' in pillow or 'error' in vips:
+            continue
+        rows.append((
+            name.split('/', 1)[1],
+            pillow['seconds'],
+            vips['seconds'],
+            pillow['peak_rss_mb'],
+            vips['peak_rss_mb'],
+        ))
+    return rows
+
+
+def compare(current, baseline, threshold, rss_threshold):
+    """
+    Compare a run against a baseline
+
+    Args:
+        current (dict): Results document of this run
+        baseline (dict): Results document to compare against
+        threshold (float): Allowed relative slowdown (0.15 = 15%)
+        rss_threshold (float): Allowed relative growth of the RSS a
+            benchmark adds on top of the process it starts from
+
+    Returns:
+        list: Descriptions of benchmarks that regressed
+    """
+    regressions = []
+    for name, result in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None or 'error' in base or 'error' in result:
+            continue
+        time_change = result['seconds'] / base['seconds'] - 1
+        # Compare the growth during the benchmark, not the inherited parent RSS
+        rss_growth = result['rss_delta_mb'] - base['rss_delta_mb']
+        rss_change = rss_growth / max(base['rss_delta_mb'], MIN_RSS_CHANGE_MB)
+        flags = []
+        if time_change > threshold:
+            flags.append(f'time {time_change:+.0%}')
+        if rss_change > rss_threshold and rss_growth > MIN_RSS_CHANGE_MB:
+            flags.append(f'peak RSS {rss_growth:+.1f}MB')
+        print(f"{name:60s} time {time_change:+7.1%}  rss {rss_change:+7.1%}  {'REGRESSION' if flags else ''}")
+        if flags:
+            regressions.append(f"{name}: {', '.join(flags)}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the file converters')
+    parser.add_argument('--scale', choices=sorted(corpus_module.SCALES), default='small')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'filea-bench-corpus'))
+    parser.add_argument('--output', help='write results (a new baseline) to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown, e.g. 0.15')
+    parser.add_argument('--rss-threshold', type=float, default=0.20, help='allowed peak RSS growth')
+    args = parser.parse_args(argv)
+
+    current = run(args.scale, args.repeat, os.path.join(args.corpus_dir, args.scale), args.filter)
+
+    engine_rows = compare_engines(current['results'])
+    if engine_rows:
+        print(f"\n{'image engines':40s} {'pillow':>10s} {'vips':>10s} {'speedup':>8s} {'RSS pillow/vips':>18s}")
+        for name, pillow, vips, pillow_rss, vips_rss in engine_rows:
+            print(f"{name:40s} {pillow * 1000:8.1f}ms {vips * 1000:8.1f}ms {pillow / vips:7.2f}x "
+                  f"{pillow_rss:8.1f}/{vips_rss:.1f}MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.rss_threshold)
+        if regressions:
+            print('\nRegressions:\n  ' + '\n  '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
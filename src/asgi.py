@@ -0,0 +1,17 @@
+"""
+ASGI entry point
+
+Serves the same app behind an event loop, which holds slow uploads and
+downloads without tying up a thread each:
+    cd src && uvicorn asgi:application --host 0.0.0.0 --port 5001 --workers 4
+"""
+import config
+from util.asgi_adapter import AsgiAdapter
+from util.lazy_import import prewarm
+from server import server
+
+server.debug = False
+
+prewarm()
+
+application = AsgiAdapter(server, config.ASGI_THREADS, config.ASGI_MAX_BODY_SIZE)
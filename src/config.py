@@ -4,27 +4,193 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'true').lower() in ('1', 'true', 'yes')
 HOST = os.getenv('HOST')
 PORT = int(os.getenv('PORT', '5000'))
 
 # MongoDB connection using URI string (supports credentials)
 # Set to None to disable MongoDB (file conversion doesn't require database)
 MONGO_URI = os.getenv('MONGO_URI', None)
+# 'mongomock://localhost' runs against an in-memory stand-in (needs mongomock)
+MONGO_ENABLED = bool(MONGO_URI) and MONGO_URI.startswith(('mongodb', 'mongomock'))
 if MONGO_URI:
     MONGODB_SETTINGS = {
         'host': MONGO_URI,
     }
 
+# Conversion records: one ConversionRecord per request, buffered in process
+# and bulk-inserted every RECORD_FLUSH_SIZE records or RECORD_FLUSH_INTERVAL_MS,
+# and expired by MongoDB after CONVERSION_RECORD_TTL_DAYS
+CONVERSION_RECORDS = MONGO_ENABLED and os.getenv('CONVERSION_RECORDS', 'true').lower() in ('1', 'true', 'yes')
+RECORD_FLUSH_SIZE = int(os.getenv('RECORD_FLUSH_SIZE', '100'))
+RECORD_FLUSH_INTERVAL_MS = int(os.getenv('RECORD_FLUSH_INTERVAL_MS', '1000'))
+RECORD_BUFFER_MAX = int(os.getenv('RECORD_BUFFER_MAX', '10000'))  # oldest dropped beyond this
+CONVERSION_RECORD_TTL_DAYS = int(os.getenv('CONVERSION_RECORD_TTL_DAYS', '30'))
+
 # File upload settings
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 100 * 1024 * 1024))  # 10MB default
 
-# Logging configuration - output to console
-logging.basicConfig(
-    level=logging.DEBUG if DEBUG else logging.INFO,
-    format='%(levelname)s: %(asctime)s pid:%(process)s module:%(module)s %(message)s',
-    datefmt='%d/%m/%y %H:%M:%S',
-    handlers=[
-        logging.StreamHandler()  # Output to console instead of file
-    ]
+# Image engine: 'pillow', or 'vips' to stream pixels through libvips with
+# IMAGE_VIPS_CONCURRENCY threads per image (needs pyvips and libvips; Pillow
+# is used when they are missing or for BMP). Requests may pick with `engine`
+IMAGE_ENGINE = os.getenv('IMAGE_ENGINE', 'pillow')
+IMAGE_VIPS_CONCURRENCY = int(os.getenv('IMAGE_VIPS_CONCURRENCY', '4'))
+
+# POST /api/inspect memoises header reads of this many files per process
+INSPECT_CACHE_SIZE = int(os.getenv('INSPECT_CACHE_SIZE', '1024'))
+
+# Batch conversion (POST /api/convert/batch): up to BATCH_MAX_ENTRIES files
+# holding BATCH_MAX_SIZE bytes in all, BATCH_WORKERS of them converted at once
+# (each still waits for its converter's admission slot)
+BATCH_MAX_ENTRIES = int(os.getenv('BATCH_MAX_ENTRIES', '200'))
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 4 * MAX_FILE_SIZE))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+
+# Admission control: conversions allowed to run at once per converter, and
+# how many requests may wait for a slot before the API answers 503
+CONVERTER_CONCURRENCY = {
+    'image': int(os.getenv('IMAGE_CONCURRENCY', os.cpu_count() or 2)),
+    'pdf-to-word': int(os.getenv('PDF_TO_WORD_CONCURRENCY', '2')),
+    'word-to-pdf': int(os.getenv('WORD_TO_PDF_CONCURRENCY', '2')),
+    'pdf-to-excel': int(os.getenv('PDF_TO_EXCEL_CONCURRENCY', '1')),
+    'excel-to-pdf': int(os.getenv('EXCEL_TO_PDF_CONCURRENCY', '2')),
+}
+CONVERTER_QUEUE_DEPTH = int(os.getenv('CONVERTER_QUEUE_DEPTH', '8'))
+CONVERTER_QUEUE_TIMEOUT = float(os.getenv('CONVERTER_QUEUE_TIMEOUT', '30'))  # seconds
+
+# Rate limiting per client (X-API-Key header, else the remote address): a
+# token bucket of RATE_LIMIT_CAPACITY tokens refilled at RATE_LIMIT_REFILL_RATE
+# per second, shared by all workers. A conversion takes RATE_LIMIT_COST tokens
+# per converter on its path; beyond that the API answers 429 with Retry-After.
+# Behind a proxy, the remote address is the proxy's unless it is fixed up
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+RATE_LIMIT_CAPACITY = float(os.getenv('RATE_LIMIT_CAPACITY', '120'))
+RATE_LIMIT_REFILL_RATE = float(os.getenv('RATE_LIMIT_REFILL_RATE', '2'))  # tokens per second
+RATE_LIMIT_SLOTS = int(os.getenv('RATE_LIMIT_SLOTS', '4096'))  # clients tracked at once
+RATE_LIMIT_COST = {
+    'image': 1,
+    'word-to-pdf': 4,
+    'excel-to-pdf': 4,
+    'pdf-to-word': 10,
+    'pdf-to-excel': 20,
+}
+
+# Conversion isolation: each conversion runs in a child process that is killed
+# when it hits these limits or the client disconnects
+CONVERSION_ISOLATION = os.getenv('CONVERSION_ISOLATION', 'true').lower() in ('1', 'true', 'yes')
+CONVERSION_TIMEOUT = float(os.getenv('CONVERSION_TIMEOUT', '120'))  # seconds, 0 disables
+CONVERSION_MEMORY_LIMIT_MB = int(os.getenv('CONVERSION_MEMORY_LIMIT_MB', '2048'))  # 0 disables
+# Children start from a fork server: forking the threaded server workers
+# directly could copy a lock another thread holds (logging, metrics, lazy
+# imports) and deadlock the child. The fork server is single-threaded and
+# imports the converters once, so starting a child stays cheap. 'fork' is
+# fine for single-threaded callers such as the tests
+CONVERSION_START_METHOD = os.getenv('CONVERSION_START_METHOD', 'forkserver')
+
+# Progress: requests sent with an `X-Progress-Id` header (and queued jobs)
+# report progress at most every PROGRESS_INTERVAL_MS; GET /api/progress/<id>
+# streams it as server-sent events for PROGRESS_STREAM_TIMEOUT seconds, after
+# which the client reconnects. Each open stream holds a server thread, so a
+# process serves at most PROGRESS_MAX_STREAMS at once and answers 503 beyond
+PROGRESS_INTERVAL_MS = int(os.getenv('PROGRESS_INTERVAL_MS', '500'))
+PROGRESS_STREAM_TIMEOUT = int(os.getenv('PROGRESS_STREAM_TIMEOUT', '25'))
+PROGRESS_MAX_STREAMS = int(os.getenv('PROGRESS_MAX_STREAMS', '1'))
+
+# Job queue (POST /api/jobs/..., `python manage.py worker`): workers lease jobs
+# for JOB_LEASE_SECONDS and renew the lease every JOB_HEARTBEAT_INTERVAL; a job
+# whose worker disappears is retried until it has had JOB_MAX_ATTEMPTS.
+# Higher priority is claimed first, so quick conversions don't queue behind
+# slow ones; a path gets the priority of its slowest converter
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+JOB_HEARTBEAT_INTERVAL = int(os.getenv('JOB_HEARTBEAT_INTERVAL', '15'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', '2'))
+JOB_PRIORITY = {
+    'image': 10,
+    'word-to-pdf': 5,
+    'excel-to-pdf': 5,
+    'pdf-to-word': 1,
+    'pdf-to-excel': 1,
+}
+
+# Storage: uploads and intermediate files always live under SCRATCH_DIR, where
+# converters read and write them. Results go to STORAGE_BACKEND: 'local'
+# (RESULT_DIR), 'memory' (a tmpfs directory capped at MEMORY_STORAGE_MB, oldest
+# evicted first) or 's3' (any S3-compatible store, e.g. MinIO via
+# S3_ENDPOINT_URL; needs boto3 and the usual AWS_* credentials)
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH_DIR = os.getenv('SCRATCH_DIR', _PROJECT_ROOT)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+RESULT_DIR = os.getenv('RESULT_DIR', os.path.join(_PROJECT_ROOT, 'results'))
+MEMORY_STORAGE_DIR = os.getenv('MEMORY_STORAGE_DIR', '/dev/shm/filea-results')
+MEMORY_STORAGE_MB = int(os.getenv('MEMORY_STORAGE_MB', '512'))
+S3_BUCKET = os.getenv('S3_BUCKET')
+S3_PREFIX = os.getenv('S3_PREFIX', 'results/')
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
+S3_REGION = os.getenv('S3_REGION')
+
+# Converted files are kept this long under a result id so interrupted
+# downloads can resume (GET /api/results/<id>); 0 deletes them once sent
+RESULT_TTL = int(os.getenv('RESULT_TTL', '3600'))  # seconds
+# How result bytes are sent: 'direct' (wsgi.file_wrapper, i.e. sendfile under
+# gunicorn), 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx).
+# The proxy modes need RESULT_TTL > 0, since the proxy reads the file later
+SEND_FILE_MODE = os.getenv('SEND_FILE_MODE', 'direct')
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '/protected-results/')
+# Outputs written front to back (PNG, BMP, GIF) are streamed with chunked
+# transfer encoding while the converter is still writing them; the result is
+# kept as usual once complete. Needs CONVERSION_ISOLATION
+STREAM_OUTPUT = os.getenv('STREAM_OUTPUT', 'true').lower() in ('1', 'true', 'yes')
+
+# Storage janitor: every JANITOR_INTERVAL seconds, remove uploads and outputs
+# older than ORPHAN_TTL (left behind by crashed or killed requests) and expired
+# results. Above DISK_QUOTA_MB (0 disables) the oldest results are evicted and
+# uploads are refused, as they are when less than MIN_FREE_DISK_MB is free.
+# ORPHAN_TTL must stay above CONVERTER_QUEUE_TIMEOUT + CONVERSION_TIMEOUT
+JANITOR_INTERVAL = int(os.getenv('JANITOR_INTERVAL', '60'))  # seconds, 0 disables
+ORPHAN_TTL = int(os.getenv('ORPHAN_TTL', '900'))  # seconds
+DISK_QUOTA_MB = int(os.getenv('DISK_QUOTA_MB', '0'))
+MIN_FREE_DISK_MB = int(os.getenv('MIN_FREE_DISK_MB', '512'))
+
+# On-demand profiling: requests carrying `X-Profile-Token: <PROFILE_TOKEN>`
+# run under cProfile and write .prof files to PROFILE_DIR
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILE_DIR = os.getenv(
+    'PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profiles')
 )
+
+# Production server (gunicorn -c gunicorn_conf.py wsgi:server)
+WORKERS = int(os.getenv('WORKERS', os.cpu_count() or 2))
+THREADS = int(os.getenv('THREADS', '2'))
+WORKER_TIMEOUT = int(os.getenv('WORKER_TIMEOUT', '300'))  # seconds
+# Workers are recycled after this many conversions or above this RSS, since
+# pdf2docx and pandas fragment the heap over time
+WORKER_MAX_CONVERSIONS = int(os.getenv('WORKER_MAX_CONVERSIONS', '200'))
+WORKER_MAX_RSS_MB = int(os.getenv('WORKER_MAX_RSS_MB', '1024'))
+
+# ASGI server (uvicorn asgi:application): connections are held by the event
+# loop, the app runs on ASGI_THREADS threads per process. Bodies up to
+# ASGI_SPOOL_SIZE bytes are buffered in memory, larger ones in SCRATCH_DIR
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', '32'))
+ASGI_SPOOL_SIZE = int(os.getenv('ASGI_SPOOL_SIZE', 1024 * 1024))
+# Largest upload (a file or a batch) plus room for the form fields
+ASGI_MAX_BODY_SIZE = int(os.getenv('ASGI_MAX_BODY_SIZE', max(MAX_FILE_SIZE, BATCH_MAX_SIZE) + 1024 * 1024))
+
+# Converter import policy: 'lazy' imports the conversion libraries on first
+# use (dev, CLI), 'prewarm' imports them all before the server accepts traffic
+IMPORT_POLICY = os.getenv('IMPORT_POLICY', 'lazy')
+IMPORT_BUDGET_MS = int(os.getenv('IMPORT_BUDGET_MS', '1500'))  # `import server` budget
+
+# Logging: records are queued and written to stderr by a background thread,
+# as JSON (LOG_FORMAT=json) or the classic one-line format (text). One record
+# per API request is sampled at LOG_SAMPLE_RATE when it succeeded; warnings
+# and errors are always written. Beyond LOG_QUEUE_SIZE pending records, new
+# ones are dropped (filea_log_records_dropped_total)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    raise ValueError(f"Unknown LOG_LEVEL: {LOG_LEVEL}")
@@ -3,15 +3,37 @@ Excel Converter Module
 Supports PDF to Excel and Excel to PDF conversions
 """
 import os
-import tabula
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from util import progress, timing
+from util.lazy_import import lazy_import
+
+tabula = lazy_import('tabula')
+pd = lazy_import('pandas')
+openpyxl = lazy_import('openpyxl')
+openpyxl_styles = lazy_import('openpyxl.styles')
+pagesizes = lazy_import('reportlab.lib.pagesizes')
+platypus = lazy_import('reportlab.platypus')
+rl_styles = lazy_import('reportlab.lib.styles')
+units = lazy_import('reportlab.lib.units')
+colors = lazy_import('reportlab.lib.colors')
+xlrd = lazy_import('xlrd')
+
+# Office Open XML namespaces read by get_excel_info
+SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# <dimension ref="A1:D20"/> near the start of a worksheet part
+DIMENSION_PATTERN = re.compile(rb'<(?:\w+:)?dimension ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+DIMENSION_READ_SIZE = 4096
+
+
+def _report_pages(canvas, doc):
+    """ReportLab page callback reporting pages rendered"""
+    progress.report(pages_rendered=doc.page)
 
 
 class ExcelConverter:
@@ -19,6 +41,10 @@ class ExcelConverter:
     
     SUPPORTED_FORMATS = ['xlsx', 'xls', 'pdf']
     
+    # Estimated seconds per MB of input, used for conversion routing
+    PDF_TO_EXCEL_COST = 3.0
+    EXCEL_TO_PDF_COST = 1.0
+    
     def __init__(self):
         """Initialize the Excel converter"""
         pass
@@ -28,6 +54,23 @@ class ExcelConverter:
         """Check if format is supported"""
         return format_name.lower() in ExcelConverter.SUPPORTED_FORMATS
     
+    @staticmethod
+    def get_conversions():
+        """
+        Declare the direct conversions offered by this converter
+        
+        Returns:
+            list: (name, from_format, to_format, estimated_cost, func) tuples
+        """
+        return [
+            ('pdf-to-excel', 'pdf', 'xlsx', ExcelConverter.PDF_TO_EXCEL_COST,
+             ExcelConverter.pdf_to_excel),
+            ('excel-to-pdf', 'xlsx', 'pdf', ExcelConverter.EXCEL_TO_PDF_COST,
+             ExcelConverter.excel_to_pdf),
+            ('excel-to-pdf', 'xls', 'pdf', ExcelConverter.EXCEL_TO_PDF_COST,
+             ExcelConverter.excel_to_pdf),
+        ]
+    
     @staticmethod
     def pdf_to_excel(pdf_path, excel_path):
         """
@@ -51,27 +94,29 @@ class ExcelConverter:
             # Extract tables from PDF using tabula
             # pages='all' extracts from all pages
             # multiple_tables=True returns list of DataFrames
-            tables = tabula.read_pdf(
-                pdf_path,
-                pages='all',
-                multiple_tables=True,
-                lattice=True  # Use lattice mode for better table detection
-            )
-            
-            if not tables or len(tables) == 0:
-                # If no tables found with lattice, try stream mode
+            with timing.stage('tabula'):
                 tables = tabula.read_pdf(
                     pdf_path,
                     pages='all',
                     multiple_tables=True,
-                    stream=True
+                    lattice=True  # Use lattice mode for better table detection
                 )
+                
+                if not tables or len(tables) == 0:
+                    # If no tables found with lattice, try stream mode
+                    tables = tabula.read_pdf(
+                        pdf_path,
+                        pages='all',
+                        multiple_tables=True,
+                        stream=True
+                    )
             
             if not tables or len(tables) == 0:
                 raise Exception("No tables found in PDF. The PDF may not contain tabular data.")
+            progress.report(tables_extracted=len(tables))
             
             # Create Excel writer
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+            with timing.stage('write_excel'), pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
                 # Write each table to a separate sheet
                 for idx, table in enumerate(tables):
                     if not table.empty:
@@ -79,9 +124,11 @@ class ExcelConverter:
                         # Limit sheet name to 31 characters (Excel limit)
                         sheet_name = sheet_name[:31]
                         table.to_excel(writer, sheet_name=sheet_name, index=False)
+                    progress.report(tables_written=idx + 1)
             
             # Format the Excel file
-            ExcelConverter._format_excel(excel_path)
+            with timing.stage('format_excel'):
+                ExcelConverter._format_excel(excel_path)
             
             return excel_path
             
@@ -97,13 +144,13 @@ class ExcelConverter:
             excel_path (str): Path to Excel file to format
         """
         try:
-            wb = load_workbook(excel_path)
+            wb = openpyxl.load_workbook(excel_path)
             
             for sheet in wb.worksheets:
                 # Format header row
                 for cell in sheet[1]:
-                    cell.font = Font(bold=True)
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
+                    cell.font = openpyxl_styles.Font(bold=True)
+                    cell.alignment = openpyxl_styles.Alignment(horizontal='center', vertical='center')
                 
                 # Auto-adjust column widths
                 for column in sheet.columns:
@@ -149,20 +196,20 @@ class ExcelConverter:
             excel_file = pd.ExcelFile(excel_path)
             
             # Create PDF
-            pdf_doc = SimpleDocTemplate(
+            pdf_doc = platypus.SimpleDocTemplate(
                 pdf_path,
-                pagesize=A4,
+                pagesize=pagesizes.A4,
                 rightMargin=30,
                 leftMargin=30,
                 topMargin=30,
                 bottomMargin=30
             )
             
-            styles = getSampleStyleSheet()
+            styles = rl_styles.getSampleStyleSheet()
             story = []
             
             # Custom styles
-            title_style = ParagraphStyle(
+            title_style = rl_styles.ParagraphStyle(
                 'CustomTitle',
                 parent=styles['Heading1'],
                 fontSize=14,
@@ -177,8 +224,8 @@ class ExcelConverter:
                 
                 # Add sheet title
                 if len(excel_file.sheet_names) > 1:
-                    story.append(Paragraph(f"Sheet: {sheet_name}", title_style))
-                    story.append(Spacer(1, 0.2 * inch))
+                    story.append(platypus.Paragraph(f"Sheet: {sheet_name}", title_style))
+                    story.append(platypus.Spacer(1, 0.2 * units.inch))
                 
                 # Convert DataFrame to list of lists for ReportLab Table
                 data = [df.columns.tolist()] + df.values.tolist()
@@ -187,10 +234,10 @@ class ExcelConverter:
                 data = [[str(cell) if pd.notna(cell) else '' for cell in row] for row in data]
                 
                 # Create table
-                table = Table(data)
+                table = platypus.Table(data)
                 
                 # Style the table
-                table_style = TableStyle([
+                table_style = platypus.TableStyle([
                     # Header row
                     ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
                     ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -220,10 +267,12 @@ class ExcelConverter:
                 
                 # Add page break between sheets (except for last sheet)
                 if sheet_idx < len(excel_file.sheet_names) - 1:
-                    story.append(PageBreak())
+                    story.append(platypus.PageBreak())
+                progress.report(sheets_done=sheet_idx + 1, sheets_total=len(excel_file.sheet_names))
             
             # Build PDF
-            pdf_doc.build(story)
+            with timing.stage('reportlab_build'):
+                pdf_doc.build(story, onFirstPage=_report_pages, onLaterPages=_report_pages)
             
             return pdf_path
             
@@ -270,22 +319,31 @@ class ExcelConverter:
     @staticmethod
     def get_excel_info(file_path):
         """
-        Get information about an Excel file
+        Get information about an Excel file without loading its cells: for
+        xlsx, sheet names come from xl/workbook.xml and each sheet's extent
+        from the <dimension> element at the start of its XML; xls files are
+        opened with xlrd on demand, which reads only the workbook globals
         
         Args:
             file_path (str): Path to Excel file
         
         Returns:
-            dict: Excel file information
+            dict: Excel file information (format, size, sheets, sheet_count)
         """
         try:
-            excel_file = pd.ExcelFile(file_path)
+            if zipfile.is_zipfile(file_path):
+                sheets = ExcelConverter._xlsx_sheets(file_path)
+                file_format = 'xlsx'
+            else:
+                with xlrd.open_workbook(file_path, on_demand=True) as book:
+                    sheets = [{'name': name} for name in book.sheet_names()]
+                file_format = 'xls'
             
             info = {
-                'format': 'xlsx' if file_path.endswith('.xlsx') else 'xls',
+                'format': file_format,
                 'size': os.path.getsize(file_path),
-                'sheets': excel_file.sheet_names,
-                'sheet_count': len(excel_file.sheet_names)
+                'sheets': sheets,
+                'sheet_count': len(sheets)
             }
             
             return info
@@ -295,3 +353,50 @@ class ExcelConverter:
                 'size': os.path.getsize(file_path) if os.path.exists(file_path) else 0,
                 'error': str(e)
             }
+    
+    @staticmethod
+    def _xlsx_sheets(file_path):
+        """
+        Sheet names and extents of an xlsx file
+        
+        Returns:
+            list: {'name', 'dimension', 'rows', 'columns'} per sheet, in
+                workbook order; all but the name are missing when the sheet
+                doesn't record its used range
+        """
+        with zipfile.ZipFile(file_path) as package:
+            workbook = ElementTree.fromstring(package.read('xl/workbook.xml'))
+            relationships = ElementTree.fromstring(package.read('xl/_rels/workbook.xml.rels'))
+            targets = {
+                rel.get('Id'): rel.get('Target')
+                for rel in relationships.iter(f'{{{PACKAGE_RELATIONSHIPS_NS}}}Relationship')
+            }
+            
+            sheets = []
+            for sheet in workbook.iter(f'{{{SPREADSHEET_NS}}}sheet'):
+                info = {'name': sheet.get('name')}
+                target = targets.get(sheet.get(f'{{{RELATIONSHIPS_NS}}}id'), '')
+                part = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+                try:
+                    # <dimension> comes first, so the start of the part is enough
+                    with package.open(part) as f:
+                        head = f.read(DIMENSION_READ_SIZE)
+                except KeyError:
+                    head = b''
+                dimension = DIMENSION_PATTERN.search(head)
+                if dimension:
+                    # Used range, e.g. A1:D20; rows and columns count from A1
+                    first_column, first_row, last_column, last_row = dimension.groups()
+                    info['dimension'] = dimension.group(0).split(b'"')[1].decode()
+                    info['rows'] = int(last_row or first_row)
+                    info['columns'] = _column_number((last_column or first_column).decode())
+                sheets.append(info)
+            return sheets
+
+
+def _column_number(letters):
+    """Spreadsheet column letters to a 1-based number (A -> 1, AA -> 27)"""
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
@@ -1,16 +1,157 @@
 """
 Image Converter Module
-Supports conversion between various image formats including AVIF
+Supports conversion between various image formats including AVIF, through
+Pillow or, when installed, libvips
 """
+import functools
+import logging
 import os
-from PIL import Image
-import pillow_avif
+
+import config
+from util import timing
+from util.lazy_import import lazy_import
+
+logger = logging.getLogger(__name__)
+
+# pillow_avif registers the AVIF plugin as a side effect of being imported
+Image = lazy_import('PIL.Image', plugins=('pillow_avif',))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_pyvips():
+    """
+    Import pyvips on first use; with isolation that is in the conversion
+    child, so the parent never starts libvips' threads before forking
+
+    Returns:
+        module: pyvips, or None if it or libvips isn't installed
+    """
+    # Read by libvips when it starts
+    os.environ.setdefault('VIPS_CONCURRENCY', str(config.IMAGE_VIPS_CONCURRENCY))
+    try:
+        import pyvips
+    except (ImportError, OSError) as e:
+        logger.warning('libvips image engine unavailable: %s', e)
+        return None
+    # It logs every operation call at DEBUG
+    logging.getLogger('pyvips').setLevel(logging.WARNING)
+    # Each file is converted once, so cached operations only hold memory
+    pyvips.cache_set_max(0)
+    return pyvips
+
+
+class PillowEngine:
+    """Convert with Pillow: one thread, whole image decoded in memory"""
+    
+    name = 'pillow'
+    
+    @staticmethod
+    def available():
+        return True
+    
+    @staticmethod
+    def handles(from_format, to_format):
+        return True
+    
+    @staticmethod
+    def convert(input_path, output_path, output_format):
+        # Open the image
+        with Image.open(input_path) as img:
+            # Convert RGBA to RGB for formats that don't support transparency
+            if output_format in ['jpg', 'jpeg'] and img.mode in ['RGBA', 'LA', 'P']:
+                # Create white background
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                img = background
+            
+            # Handle JPEG format
+            save_format = 'JPEG' if output_format in ['jpg', 'jpeg'] else output_format.upper()
+            
+            # Save with appropriate quality settings
+            save_kwargs = {}
+            if output_format in ['jpg', 'jpeg']:
+                save_kwargs['quality'] = 95
+                save_kwargs['optimize'] = True
+            elif output_format == 'png':
+                save_kwargs['optimize'] = True
+            elif output_format == 'webp':
+                save_kwargs['quality'] = 95
+            elif output_format == 'avif':
+                save_kwargs['quality'] = 90
+            
+            # Save the converted image (decoding happens lazily, here too)
+            with timing.stage('pillow_save'):
+                img.save(output_path, format=save_format, **save_kwargs)
+
+
+class VipsEngine:
+    """
+    Convert with libvips: pixels stream from decoder to encoder in strips,
+    processed by IMAGE_VIPS_CONCURRENCY threads per image
+    """
+    
+    name = 'vips'
+    
+    # libvips only reads and writes BMP through ImageMagick, so leave it to Pillow
+    FORMATS = ('png', 'jpg', 'jpeg', 'webp', 'gif', 'avif')
+    
+    # Saver and options matching PillowEngine's quality settings
+    SAVERS = {
+        'jpg': ('jpegsave', {'Q': 95, 'optimize_coding': True}),
+        'jpeg': ('jpegsave', {'Q': 95, 'optimize_coding': True}),
+        'png': ('pngsave', {'compression': 9}),
+        'webp': ('webpsave', {'Q': 95}),
+        'gif': ('gifsave', {}),
+        # pillow_avif's default speed 6 is effort 3 in libvips' terms
+        'avif': ('heifsave', {'Q': 90, 'compression': 'av1', 'effort': 3}),
+    }
+    
+    @staticmethod
+    def available():
+        return _load_pyvips() is not None
+    
+    @staticmethod
+    def handles(from_format, to_format):
+        return from_format in VipsEngine.FORMATS and to_format in VipsEngine.FORMATS
+    
+    @staticmethod
+    def convert(input_path, output_path, output_format):
+        pyvips = _load_pyvips()
+        # Sequential access decodes only the strips being encoded
+        image = pyvips.Image.new_from_file(input_path, access='sequential')
+        if output_format in ['jpg', 'jpeg'] and image.hasalpha():
+            # Same white background as Pillow
+            image = image.flatten(background=255)
+        saver, save_kwargs = VipsEngine.SAVERS[output_format]
+        
+        # Decoding, processing and encoding all run here
+        with timing.stage('vips_save'):
+            getattr(image, saver)(output_path, **save_kwargs)
+
 
 class ImageConverter:
     """Handle image format conversions"""
     
     SUPPORTED_FORMATS = ['png', 'jpg', 'jpeg', 'webp', 'bmp', 'gif', 'avif']
     
+    # Estimated seconds per MB of input, used for conversion routing
+    CONVERSION_COST = 0.05
+    
+    # Written as they are encoded (rows of PNG and BMP, GIF once quantized);
+    # optimized JPEG, WebP and AVIF are encoded whole before the first byte
+    STREAMED_FORMATS = ['png', 'bmp', 'gif']
+    
+    ENGINES = {
+        PillowEngine.name: PillowEngine,
+        VipsEngine.name: VipsEngine,
+    }
+    
+    # to_format=auto: the first of these the client lists in Accept, else a
+    # format every browser shows (PNG when there is transparency to keep)
+    NEGOTIATED_FORMATS = [('image/avif', 'avif'), ('image/webp', 'webp')]
+    
     def __init__(self):
         """Initialize the image converter"""
         pass
@@ -21,7 +162,107 @@ class ImageConverter:
         return format_name.lower() in ImageConverter.SUPPORTED_FORMATS
     
     @staticmethod
-    def convert(input_path, output_path, output_format):
+    def has_transparency(file_path):
+        """
+        Check whether an image has transparent pixels; only images with an
+        alpha channel are decoded
+        
+        Args:
+            file_path (str): Path to image file
+        
+        Returns:
+            bool: True if any pixel isn't fully opaque
+        """
+        with Image.open(file_path) as img:
+            if 'transparency' in img.info:
+                return True
+            if img.mode not in ('RGBA', 'LA', 'PA'):
+                return False
+            alpha_min, _ = img.getchannel('A').getextrema()
+            return alpha_min < 255
+    
+    @staticmethod
+    def negotiate_format(accept, file_path):
+        """
+        Pick the output format for to_format=auto from an Accept header
+        
+        Only formats the client names explicitly count: browsers send
+        `*/*` whether or not they can show AVIF.
+        
+        Args:
+            accept (str): The request's Accept header
+            file_path (str): Path to the source image
+        
+        Returns:
+            str: avif, webp, png or jpg
+        """
+        accepted = set()
+        for part in (accept or '').split(','):
+            mimetype, _, params = part.strip().partition(';')
+            quality = 1.0
+            for param in params.split(';'):
+                name, _, value = param.strip().partition('=')
+                if name == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if quality > 0:
+                accepted.add(mimetype.strip().lower())
+        
+        for mimetype, output_format in ImageConverter.NEGOTIATED_FORMATS:
+            if mimetype in accepted:
+                return output_format
+        return 'png' if ImageConverter.has_transparency(file_path) else 'jpg'
+    
+    @staticmethod
+    def get_conversions():
+        """
+        Declare the direct conversions offered by this converter
+        
+        Returns:
+            list: (name, from_format, to_format, estimated_cost, func) tuples
+        """
+        conversions = []
+        for from_format in ImageConverter.SUPPORTED_FORMATS:
+            for to_format in ImageConverter.SUPPORTED_FORMATS:
+                conversions.append((
+                    'image',
+                    from_format,
+                    to_format,
+                    ImageConverter.CONVERSION_COST,
+                    lambda input_path, output_path, engine=None, to_format=to_format:
+                        ImageConverter.convert(input_path, output_path, to_format, engine)
+                ))
+        return conversions
+    
+    @staticmethod
+    def get_engine(name, from_format, to_format):
+        """
+        Pick the engine for a conversion, falling back to Pillow when the
+        requested one isn't installed or can't handle the formats
+        
+        Args:
+            name (str): Requested engine, IMAGE_ENGINE if None
+            from_format (str): Input format
+            to_format (str): Output format
+        
+        Returns:
+            PillowEngine or VipsEngine
+        
+        Raises:
+            ValueError: If the engine is unknown
+        """
+        name = (name or config.IMAGE_ENGINE).lower()
+        if name not in ImageConverter.ENGINES:
+            raise ValueError(f"Unknown image engine: {name}. Available: {', '.join(ImageConverter.ENGINES)}")
+        engine = ImageConverter.ENGINES[name]
+        if not engine.handles(from_format, to_format) or not engine.available():
+            return PillowEngine
+        return engine
+    
+    @staticmethod
+    def convert(input_path, output_path, output_format, engine=None):
         """
         Convert image from one format to another
         
@@ -29,12 +270,13 @@ class ImageConverter:
             input_path (str): Path to input image
             output_path (str): Path to save converted image
             output_format (str): Target format (png, jpg, webp, avif, etc.)
+            engine (str): 'pillow' or 'vips', IMAGE_ENGINE if None
         
         Returns:
             str: Path to converted file
         
         Raises:
-            ValueError: If format is not supported
+            ValueError: If format or engine is not supported
             FileNotFoundError: If input file doesn't exist
         """
         output_format = output_format.lower()
@@ -45,47 +287,24 @@ class ImageConverter:
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"Input file not found: {input_path}")
         
-        # Open the image
-        with Image.open(input_path) as img:
-            # Convert RGBA to RGB for formats that don't support transparency
-            if output_format in ['jpg', 'jpeg'] and img.mode in ['RGBA', 'LA', 'P']:
-                # Create white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Handle JPEG format
-            save_format = 'JPEG' if output_format in ['jpg', 'jpeg'] else output_format.upper()
-            
-            # Save with appropriate quality settings
-            save_kwargs = {}
-            if output_format in ['jpg', 'jpeg']:
-                save_kwargs['quality'] = 95
-                save_kwargs['optimize'] = True
-            elif output_format == 'png':
-                save_kwargs['optimize'] = True
-            elif output_format == 'webp':
-                save_kwargs['quality'] = 95
-            elif output_format == 'avif':
-                save_kwargs['quality'] = 90
-            
-            # Save the converted image
-            img.save(output_path, format=save_format, **save_kwargs)
+        input_format = os.path.splitext(input_path)[1].lstrip('.').lower()
+        ImageConverter.get_engine(engine, input_format, output_format).convert(
+            input_path, output_path, output_format
+        )
         
         return output_path
     
     @staticmethod
     def get_image_info(file_path):
         """
-        Get information about an image file
+        Get information about an image file from its header; Pillow
+        doesn't decode pixels until they are used
         
         Args:
             file_path (str): Path to image file
         
         Returns:
-            dict: Image information (format, size, mode)
+            dict: Image information (format, size, mode, width, height, animated)
         """
         with Image.open(file_path) as img:
             return {
@@ -93,5 +312,6 @@ class ImageConverter:
                 'size': img.size,
                 'mode': img.mode,
                 'width': img.width,
-                'height': img.height
+                'height': img.height,
+                'animated': getattr(img, 'is_animated', False)
             }
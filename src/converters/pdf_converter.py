@@ -2,14 +2,46 @@
 PDF Converter Module
 Supports PDF to Word and Word to PDF conversions
 """
+import logging
 import os
-from pdf2docx import Converter as PDFConverter
-from docx import Document
-from docx.shared import Inches, Pt
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+import zipfile
+from xml.etree import ElementTree
+
+from util import progress, timing
+from util.lazy_import import lazy_import
+from util.mapped_file import mapped
+
+pdf2docx = lazy_import('pdf2docx')
+fitz = lazy_import('fitz')
+docx = lazy_import('docx')
+pagesizes = lazy_import('reportlab.lib.pagesizes')
+platypus = lazy_import('reportlab.platypus')
+rl_styles = lazy_import('reportlab.lib.styles')
+units = lazy_import('reportlab.lib.units')
+
+# Namespace of docProps/app.xml in Office Open XML packages
+APP_PROPERTIES_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/extended-properties'
+
+
+class _PageProgress(logging.Handler):
+    """Turns pdf2docx's per-page log lines into progress reports"""
+    
+    def __init__(self):
+        super().__init__()
+        self.field = 'pages_parsed'
+    
+    def emit(self, record):
+        if record.msg == '(%d/%d) Page %d':
+            done, total, _ = record.args
+            progress.report(**{self.field: done}, pages_total=total)
+        elif 'Creating pages' in str(record.msg):
+            # The second pass over the pages writes the document
+            self.field = 'pages_written'
+
+
+def _report_pages(canvas, doc):
+    """ReportLab page callback reporting pages rendered"""
+    progress.report(pages_rendered=doc.page)
 
 
 class DocumentConverter:
@@ -17,6 +49,10 @@ class DocumentConverter:
     
     SUPPORTED_FORMATS = ['pdf', 'docx']
     
+    # Estimated seconds per MB of input, used for conversion routing
+    PDF_TO_WORD_COST = 2.0
+    WORD_TO_PDF_COST = 0.5
+    
     def __init__(self):
         """Initialize the document converter"""
         pass
@@ -26,6 +62,21 @@ class DocumentConverter:
         """Check if format is supported"""
         return format_name.lower() in DocumentConverter.SUPPORTED_FORMATS
     
+    @staticmethod
+    def get_conversions():
+        """
+        Declare the direct conversions offered by this converter
+        
+        Returns:
+            list: (name, from_format, to_format, estimated_cost, func) tuples
+        """
+        return [
+            ('pdf-to-word', 'pdf', 'docx', DocumentConverter.PDF_TO_WORD_COST,
+             DocumentConverter.pdf_to_word),
+            ('word-to-pdf', 'docx', 'pdf', DocumentConverter.WORD_TO_PDF_COST,
+             DocumentConverter.word_to_pdf),
+        ]
+    
     @staticmethod
     def pdf_to_word(pdf_path, docx_path):
         """
@@ -45,18 +96,41 @@ class DocumentConverter:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         
-        try:
-            # Create converter instance
-            cv = PDFConverter(pdf_path)
-            
-            # Convert PDF to DOCX
-            cv.convert(docx_path, start=0, end=None)
-            cv.close()
-            
-            return docx_path
+        # One read serves the pre-scan and pdf2docx. PyMuPDF 1.23 takes only
+        # bytes (or bytearray/BytesIO), not the mapping itself, so the PDF is
+        # copied once into memory and both keep that copy without another
+        with mapped(pdf_path) as buffer:
+            data = bytes(buffer)
+            try:
+                with fitz.open(stream=data, filetype='pdf') as pdf:
+                    encrypted = pdf.needs_pass
+                    progress.report(pages_total=pdf.page_count)
+            except Exception as e:
+                raise Exception(f"PDF to Word conversion failed: {str(e)}")
+            if encrypted:
+                raise ValueError("PDF is password protected")
             
-        except Exception as e:
-            raise Exception(f"PDF to Word conversion failed: {str(e)}")
+            try:
+                # Create converter instance; the path only names it in messages
+                cv = pdf2docx.Converter(pdf_path, stream=data)
+                try:
+                    # Convert PDF to DOCX, reporting pages only when someone follows
+                    page_progress = _PageProgress() if progress.current() is not None else None
+                    if page_progress is not None:
+                        logging.getLogger().addHandler(page_progress)
+                    try:
+                        with timing.stage('pdf2docx'):
+                            cv.convert(docx_path, start=0, end=None)
+                    finally:
+                        if page_progress is not None:
+                            logging.getLogger().removeHandler(page_progress)
+                finally:
+                    cv.close()
+                
+                return docx_path
+                
+            except Exception as e:
+                raise Exception(f"PDF to Word conversion failed: {str(e)}")
     
     @staticmethod
     def word_to_pdf(docx_path, pdf_path):
@@ -79,22 +153,22 @@ class DocumentConverter:
         
         try:
             # Load the Word document
-            doc = Document(docx_path)
+            doc = docx.Document(docx_path)
             
             # Create PDF
-            pdf_doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-            styles = getSampleStyleSheet()
+            pdf_doc = platypus.SimpleDocTemplate(pdf_path, pagesize=pagesizes.letter)
+            styles = rl_styles.getSampleStyleSheet()
             story = []
             
             # Custom styles
-            title_style = ParagraphStyle(
+            title_style = rl_styles.ParagraphStyle(
                 'CustomTitle',
                 parent=styles['Heading1'],
                 fontSize=16,
                 spaceAfter=12,
             )
             
-            normal_style = ParagraphStyle(
+            normal_style = rl_styles.ParagraphStyle(
                 'CustomNormal',
                 parent=styles['Normal'],
                 fontSize=11,
@@ -106,10 +180,10 @@ class DocumentConverter:
                 if para.text.strip():
                     # Determine style based on paragraph style
                     if para.style.name.startswith('Heading'):
-                        story.append(Paragraph(para.text, title_style))
+                        story.append(platypus.Paragraph(para.text, title_style))
                     else:
-                        story.append(Paragraph(para.text, normal_style))
-                    story.append(Spacer(1, 0.1 * inch))
+                        story.append(platypus.Paragraph(para.text, normal_style))
+                    story.append(platypus.Spacer(1, 0.1 * units.inch))
             
             # Process tables
             for table in doc.tables:
@@ -117,11 +191,12 @@ class DocumentConverter:
                 for row in table.rows:
                     row_text = ' | '.join([cell.text for cell in row.cells])
                     if row_text.strip():
-                        story.append(Paragraph(row_text, normal_style))
-                story.append(Spacer(1, 0.2 * inch))
+                        story.append(platypus.Paragraph(row_text, normal_style))
+                story.append(platypus.Spacer(1, 0.2 * units.inch))
             
             # Build PDF
-            pdf_doc.build(story)
+            with timing.stage('reportlab_build'):
+                pdf_doc.build(story, onFirstPage=_report_pages, onLaterPages=_report_pages)
             
             return pdf_path
             
@@ -168,26 +243,47 @@ class DocumentConverter:
     @staticmethod
     def get_document_info(file_path, format_type):
         """
-        Get information about a document file
+        Get information about a document file without reading its content:
+        PDFs through the PyMuPDF page tree, Word files through the document
+        properties (docProps/app.xml) in the zip
         
         Args:
             file_path (str): Path to document file
             format_type (str): Format type (pdf or docx)
         
         Returns:
-            dict: Document information
+            dict: Document information (pages, page_width and page_height in
+                points for PDFs; pages, words and paragraphs as last saved
+                by Word for docx, when recorded)
+        
+        Raises:
+            Exception: If the file can't be read as format_type
         """
         info = {
             'format': format_type,
             'size': os.path.getsize(file_path) if os.path.exists(file_path) else 0
         }
         
-        if format_type == 'docx':
-            try:
-                doc = Document(file_path)
-                info['paragraphs'] = len(doc.paragraphs)
-                info['tables'] = len(doc.tables)
-            except:
-                pass
+        if format_type == 'pdf':
+            # From the path: MuPDF reads only the parts it needs
+            with fitz.open(file_path, filetype='pdf') as pdf:
+                info['pages'] = pdf.page_count
+                info['encrypted'] = bool(pdf.needs_pass)
+                if pdf.page_count and not pdf.needs_pass:
+                    # Loads the page object only, not its content stream
+                    rect = pdf.load_page(0).rect
+                    info['page_width'] = round(rect.width, 1)
+                    info['page_height'] = round(rect.height, 1)
+        
+        elif format_type == 'docx':
+            with zipfile.ZipFile(file_path) as package:
+                try:
+                    properties = ElementTree.fromstring(package.read('docProps/app.xml'))
+                except KeyError:
+                    properties = None
+            for field in ('Pages', 'Words', 'Paragraphs'):
+                element = properties.find(f'{{{APP_PROPERTIES_NS}}}{field}') if properties is not None else None
+                if element is not None and (element.text or '').isdigit():
+                    info[field.lower()] = int(element.text)
         
         return info
@@ -0,0 +1,234 @@
+"""
+Converter Registry
+Builds a conversion graph from the edges each converter declares and
+routes a request through the cheapest chain of conversions
+"""
+import contextlib
+import heapq
+import os
+import threading
+import time
+
+
+class ConversionEdge:
+    """A single direct conversion offered by a converter"""
+
+    def __init__(self, name, from_format, to_format, estimated_cost, func, streamed=False):
+        """
+        Args:
+            name (str): Converter name (e.g. 'pdf-to-excel')
+            from_format (str): Input format
+            to_format (str): Output format
+            estimated_cost (float): Estimated seconds per MB of input
+            func (callable): func(input_path, output_path, **options) performing
+                the conversion; options are converter-specific request settings
+            streamed (bool): func writes the output front to back as it goes,
+                never rewriting it, so it can be sent while being written
+        """
+        self.name = name
+        self.from_format = from_format
+        self.to_format = to_format
+        self.estimated_cost = float(estimated_cost)
+        self.func = func
+        self.streamed = streamed
+        self.observed_cost = None
+        self.samples = 0
+
+    @property
+    def cost(self):
+        """Observed cost once timings exist, the declared estimate before that"""
+        if self.observed_cost is None:
+            return self.estimated_cost
+        return self.observed_cost
+
+    def to_dict(self):
+        return {
+            'converter': self.name,
+            'from': self.from_format,
+            'to': self.to_format,
+            'estimated_cost': self.estimated_cost,
+            'observed_cost': self.observed_cost,
+            'samples': self.samples,
+            'streamed': self.streamed
+        }
+
+
+class ConverterRegistry:
+    """Directed graph of formats whose edges are converter operations"""
+
+    # Weight of the newest timing in the moving average of an edge cost
+    SMOOTHING = 0.2
+
+    # Inputs smaller than this are timed as if they were this size, so tiny
+    # files don't inflate the per-MB cost of an edge
+    MIN_COST_SIZE = 256 * 1024
+
+    def __init__(self):
+        self._edges = {}
+        self._lock = threading.Lock()
+
+    def register(self, converter):
+        """
+        Register every conversion a converter declares
+
+        Args:
+            converter: Class exposing get_conversions(), and optionally
+                STREAMED_FORMATS: outputs it writes front to back
+        """
+        streamed_formats = getattr(converter, 'STREAMED_FORMATS', ())
+        for name, from_format, to_format, cost, func in converter.get_conversions():
+            self.add_edge(ConversionEdge(name, from_format, to_format, cost, func, to_format in streamed_formats))
+
+    def add_edge(self, edge):
+        """Add (or replace) the edge between two formats"""
+        self._edges.setdefault(edge.from_format, {})[edge.to_format] = edge
+
+    def get_edge(self, from_format, to_format):
+        """
+        Get the direct edge between two formats
+
+        Raises:
+            ValueError: If there is no direct conversion
+        """
+        try:
+            return self._edges[from_format][to_format]
+        except KeyError:
+            raise ValueError(f"Conversion from {from_format} to {to_format} not supported")
+
+    def formats(self):
+        """All formats that appear in the graph"""
+        result = set(self._edges)
+        for targets in self._edges.values():
+            result.update(targets)
+        return sorted(result)
+
+    def edges(self):
+        """All registered edges"""
+        return [edge for targets in self._edges.values() for edge in targets.values()]
+
+    def find_path(self, from_format, to_format):
+        """
+        Find the cheapest chain of conversions between two formats
+
+        Args:
+            from_format (str): Input format
+            to_format (str): Desired output format
+
+        Returns:
+            list: ConversionEdge objects to apply in order
+
+        Raises:
+            ValueError: If no chain of conversions exists
+        """
+        from_format = from_format.lower()
+        to_format = to_format.lower()
+
+        # Same-format requests only make sense as a direct re-encode
+        if from_format == to_format:
+            edge = self._edges.get(from_format, {}).get(to_format)
+            if edge is None:
+                raise ValueError(f"Conversion from {from_format} to {to_format} not supported")
+            return [edge]
+
+        # Dijkstra over formats; the counter keeps heap entries comparable
+        counter = 0
+        queue = [(0.0, counter, from_format, [])]
+        settled = set()
+        while queue:
+            cost, _, current, path = heapq.heappop(queue)
+            if current == to_format:
+                return path
+            if current in settled:
+                continue
+            settled.add(current)
+            for target, edge in self._edges.get(current, {}).items():
+                if target in settled or target == current:
+                    continue
+                counter += 1
+                heapq.heappush(queue, (cost + edge.cost, counter, target, path + [edge]))
+
+        raise ValueError(f"Conversion from {from_format} to {to_format} not supported")
+
+    def record_timing(self, edge, seconds, input_size):
+        """
+        Fold an observed conversion time into the edge cost
+
+        Args:
+            edge (ConversionEdge): Edge that was executed
+            seconds (float): Wall-clock duration of the conversion
+            input_size (int): Input size in bytes
+        """
+        size_mb = max(input_size, self.MIN_COST_SIZE) / (1024 * 1024)
+        observed = seconds / size_mb
+        with self._lock:
+            if edge.observed_cost is None:
+                edge.observed_cost = observed
+            else:
+                edge.observed_cost += self.SMOOTHING * (observed - edge.observed_cost)
+            edge.samples += 1
+
+    def run_path(self, path, input_path, output_path, get_intermediate_path, admit=None,
+                 runner=None):
+        """
+        Execute a chain of conversions, passing temp files between hops
+
+        Args:
+            path (list): ConversionEdge objects from find_path()
+            input_path (str): Path to the input file
+            output_path (str): Path for the final output
+            get_intermediate_path (callable): Returns a temp path for a format
+            admit (callable): Returns a context manager to hold while an
+                edge runs (admission control), optional
+            runner (callable): runner(edge, input_path, output_path) executing
+                an edge, e.g. in an isolated process; calls edge.func by default
+
+        Returns:
+            str: Path to the final output
+        """
+        intermediates = []
+        current = input_path
+        try:
+            for index, edge in enumerate(path):
+                if index == len(path) - 1:
+                    target = output_path
+                else:
+                    target = get_intermediate_path(edge.to_format)
+                    intermediates.append(target)
+
+                input_size = os.path.getsize(current)
+                with admit(edge) if admit else contextlib.nullcontext():
+                    started = time.perf_counter()
+                    if runner:
+                        runner(edge, current, target)
+                    else:
+                        edge.func(current, target)
+                    self.record_timing(edge, time.perf_counter() - started, input_size)
+                current = target
+        finally:
+            for intermediate in intermediates:
+                if os.path.exists(intermediate):
+                    os.remove(intermediate)
+
+        return output_path
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide registry, registering the built-in converters on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from converters.image_converter import ImageConverter
+                from converters.pdf_converter import DocumentConverter
+                from converters.excel_converter import ExcelConverter
+
+                registry = ConverterRegistry()
+                registry.register(ImageConverter)
+                registry.register(DocumentConverter)
+                registry.register(ExcelConverter)
+                _registry = registry
+    return _registry
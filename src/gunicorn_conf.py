@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration for production serving
+Worker counts and recycling limits come from config.py
+"""
+import logging
+
+import config
+from util import janitor
+from util.process_stats import current_rss
+
+logger = logging.getLogger('gunicorn.error')
+
+bind = f"{config.HOST or '0.0.0.0'}:{config.PORT}"
+workers = config.WORKERS
+threads = config.THREADS
+worker_class = 'gthread' if config.THREADS > 1 else 'sync'
+timeout = config.WORKER_TIMEOUT
+graceful_timeout = config.WORKER_TIMEOUT
+
+# Import the app and converter libraries in the master before forking
+preload_app = True
+
+
+def post_fork(server, worker):
+    worker.conversions = 0
+    janitor.start()
+
+
+def post_request(worker, req, environ, resp):
+    """Recycle the worker after N conversions or above the RSS watermark"""
+    if not environ.get('PATH_INFO', '').startswith('/api/convert'):
+        return
+
+    worker.conversions += 1
+    rss = current_rss()
+    if worker.conversions >= config.WORKER_MAX_CONVERSIONS:
+        reason = f"{worker.conversions} conversions"
+    elif rss > config.WORKER_MAX_RSS_MB * 1024 * 1024:
+        reason = f"RSS {rss / 1024 / 1024:.0f}MB"
+    else:
+        return
+
+    if worker.alive:
+        logger.info('Recycling worker %s after %s', worker.pid, reason)
+        # Finishes in-flight requests, then the arbiter forks a replacement
+        worker.alive = False
@@ -3,14 +3,39 @@ from flask.ext.script import Manager
 
 import config
 from model.abc import db
+from util import log
+
+log.setup(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_SAMPLE_RATE, config.LOG_QUEUE_SIZE)
 
 server = Flask(__name__)
 server.debug = config.DEBUG
-server.config['MONGODB_SETTINGS'] = config.MONGODB_SETTINGS
-db.init_app(server)
+
+# Only initialize MongoDB if URI is provided
+if config.MONGO_ENABLED:
+    server.config['MONGODB_SETTINGS'] = config.MONGODB_SETTINGS
+    db.init_app(server)
 
 manager = Manager(server)
 
+
+@manager.command
+def import_report():
+    """Summarise the per-package import cost of the server"""
+    from util.import_report import importtime_report, format_report
+    print(format_report(importtime_report('server')))
+
+
+@manager.option('-t', '--threads', dest='threads', type=int, default=config.JOB_WORKER_THREADS,
+                help='jobs to run at once')
+def worker(threads):
+    """Run conversion jobs from the MongoDB queue"""
+    if not config.MONGO_ENABLED:
+        print('The job queue needs MONGO_URI')
+        return
+    from util.job_queue import run_worker
+    run_worker(threads)
+
+
 # MongoDB doesn't require migrations like SQL databases
 # You can add custom commands here if needed
 
@@ -1,2 +1,3 @@
 # Models will be imported here
-
+from .conversion_job import ConversionJob
+from .conversion_record import ConversionRecord
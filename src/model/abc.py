@@ -25,25 +25,34 @@ class BaseModel():
     def json(self):
         """ Define a base way to jsonify models
             Fields inside `to_json_filter` are excluded """
-        result = {}
-        for field, value in self._to_dict().items():
-            if field not in self.to_json_filter:
-                if isinstance(value, datetime.datetime):
-                    result[field] = value.isoformat()
-                elif isinstance(value, datetime.date):
-                    result[field] = value.isoformat()
-                else:
-                    result[field] = value
-        return result
+        return _jsonify(self._to_dict(), self.to_json_filter)
+
+    @classmethod
+    def export_json(cls, queryset):
+        """ Jsonify a whole queryset for bulk export
+            Reads raw documents, skipping per-document model construction """
+        db_fields = [(name, field.db_field) for name, field in cls._fields.items()]
+        for raw in queryset.as_pymongo():
+            values = {name: raw.get(db_field) for name, db_field in db_fields}
+            values['id'] = str(raw['_id'])
+            yield _jsonify(values, cls.to_json_filter)
 
     def _to_dict(self):
         """ Convert document to dictionary
             Allows to_json to be overriden without impacting __repr__ """
-        result = {}
-        for field_name in self._fields:
-            value = getattr(self, field_name, None)
-            result[field_name] = value
+        # Read stored values directly; field descriptors are slow per call
+        data = self._data
+        result = {field_name: data.get(field_name) for field_name in self._fields}
         # Include id as a string
         if hasattr(self, 'id'):
             result['id'] = str(self.id)
         return result
+
+
+def _jsonify(values, excluded):
+    """ Drop excluded fields and render dates (datetimes included) as ISO 8601 """
+    return {
+        field: value.isoformat() if isinstance(value, datetime.date) else value
+        for field, value in values.items()
+        if field not in excluded
+    }
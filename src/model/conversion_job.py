@@ -0,0 +1,42 @@
+"""Durable conversion jobs shared by every API node through MongoDB."""
+import datetime
+
+from model.abc import db, BaseModel
+
+
+class ConversionJob(db.Document, BaseModel):
+    """ A conversion waiting for, or leased by, a queue worker """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    status = db.StringField(required=True, default=QUEUED)
+    priority = db.IntField(required=True, default=0)  # higher is claimed first
+    from_format = db.StringField(required=True)
+    to_format = db.StringField(required=True)
+    input_key = db.StringField(required=True)  # storage key of the upload
+    download_name = db.StringField(required=True)
+    result_id = db.StringField()
+    error = db.StringField()
+    error_code = db.StringField()
+    attempts = db.IntField(default=0)
+    lease_owner = db.StringField()
+    lease_expires = db.DateTimeField()
+    heartbeat_at = db.DateTimeField()
+    not_before = db.DateTimeField()  # released jobs wait until then
+    progress = db.DictField()  # latest progress state, for /api/progress/<id>
+    created_at = db.DateTimeField(default=datetime.datetime.utcnow)
+    finished_at = db.DateTimeField()
+
+    to_json_filter = ('_id', 'input_key', 'lease_owner')
+
+    meta = {
+        'collection': 'conversion_jobs',
+        'indexes': [
+            # The claim query: queued or lease-expired, best priority, oldest
+            ('status', '-priority', 'created_at'),
+            ('status', 'lease_expires'),
+        ]
+    }
@@ -0,0 +1,37 @@
+"""One document per conversion request, for retention and slow-path analysis."""
+import datetime
+
+import config
+from model.abc import db, BaseModel
+
+
+class ConversionRecord(db.Document, BaseModel):
+    """ Outcome and cost of a single conversion request """
+
+    input_hash = db.StringField(required=True)  # sha256 of the upload
+    from_format = db.StringField(required=True)
+    to_format = db.StringField(required=True)
+    converters = db.ListField(db.StringField())  # edges of the path taken
+    input_size = db.IntField()
+    output_size = db.IntField()
+    duration_ms = db.FloatField()
+    stages = db.DictField()  # Server-Timing stage name -> milliseconds
+    outcome = db.StringField(required=True)  # 'ok' or an error code
+    error = db.StringField()
+    streamed = db.BooleanField()  # sent while the output was being written
+    client = db.StringField()
+    created_at = db.DateTimeField(default=datetime.datetime.utcnow)
+
+    meta = {
+        'collection': 'conversion_records',
+        'indexes': [
+            # Retention: MongoDB deletes records this old on its own
+            {
+                'fields': ['created_at'],
+                'expireAfterSeconds': config.CONVERSION_RECORD_TTL_DAYS * 24 * 3600
+            },
+            # "Slowest conversions by type"
+            ('from_format', 'to_format', '-duration_ms'),
+            'input_hash',
+        ]
+    }
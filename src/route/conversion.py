@@ -2,16 +2,474 @@
 Conversion API Routes
 Handles file conversion endpoints
 """
-from flask import Blueprint, request, send_file, jsonify
+from flask import Blueprint, Response, request, jsonify, url_for
 from flask.ext.restful import Api, Resource
+from mongoengine.errors import ValidationError
+import hmac
+import logging
+import mimetypes
 import os
+import time
+import uuid
+
+import config
 
 from converters.image_converter import ImageConverter
-from util.file_handler import FileHandler
+from converters.registry import get_registry
+from model.conversion_job import ConversionJob
+from util import (
+    admission, batch, inspection, isolation, janitor, job_queue, log, metrics, progress, rate_limit, record_buffer,
+    streaming, timing
+)
+from util.file_handler import FileHandler, StorageFull
+from util.result_store import ResultStore, send_result
+from util.resumable_upload import ChecksumMismatch, ResumableUpload, UploadConflict
+
+logger = logging.getLogger(__name__)
 
 conversion_blueprint = Blueprint('conversion', __name__)
 conversion_blueprint_api = Api(conversion_blueprint)
 
+# Conversion details added to each request's log record
+LOGGED_FIELDS = (
+    'from_format', 'to_format', 'converters', 'input_size', 'output_size', 'outcome', 'error', 'streamed'
+)
+
+# Converters behind the fixed-format endpoints, which the rate limiter charges for
+ENDPOINT_CONVERTERS = {
+    'conversion.imageconversionapi': ['image'],
+    'conversion.pdftowordapi': ['pdf-to-word'],
+    'conversion.wordtopdfapi': ['word-to-pdf'],
+    'conversion.pdftoexcelapi': ['pdf-to-excel'],
+    'conversion.exceltopdfapi': ['excel-to-pdf'],
+}
+
+
+def _request_converters():
+    """Converters a request will run, found without reading its body"""
+    if request.method != 'POST':
+        return []
+    if request.endpoint in ENDPOINT_CONVERTERS:
+        return ENDPOINT_CONVERTERS[request.endpoint]
+    args = request.view_args or {}
+    if 'from_format' in args and 'to_format' in args:
+        try:
+            path = get_registry().find_path(args['from_format'].lower(), args['to_format'].lower())
+        except ValueError:
+            return []
+        return [edge.name for edge in path]
+    return []
+
+
+@conversion_blueprint.before_request
+def assign_request_id():
+    """Tag the request's log records with an id, the client's X-Request-Id if usable"""
+    log.start_request(request.headers.get('X-Request-Id'))
+
+
+@conversion_blueprint.before_request
+def check_rate_limit():
+    """Answer 429 when the client has used up its token bucket"""
+    if not config.RATE_LIMIT_ENABLED:
+        return None
+    return _charge(_request_converters())
+
+
+def _charge(converters):
+    """
+    Take a request's converters from its client's token bucket
+    
+    Returns:
+        A 429 response when the bucket is empty, else None
+    """
+    client = request.headers.get('X-API-Key') or request.remote_addr or 'unknown'
+    retry_after = rate_limit.take(client, converters)
+    if not retry_after:
+        return None
+    metrics.RATE_LIMITED.inc(request.url_rule.rule if request.url_rule else request.path)
+    response = jsonify(error=f'Rate limit exceeded, retry in {retry_after}s', code='rate_limited')
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+@conversion_blueprint.before_request
+def start_timing():
+    """Time every request, and profile it when an authorised header asks"""
+    token = request.headers.get('X-Profile-Token')
+    # As bytes: compare_digest refuses str with non-ASCII characters
+    profile = bool(
+        token and config.PROFILE_TOKEN and hmac.compare_digest(token.encode(), config.PROFILE_TOKEN.encode())
+    )
+    timing.start(config.PROFILE_DIR if profile else None)
+
+
+@conversion_blueprint.after_request
+def add_server_timing(response):
+    """Report recorded stages in the Server-Timing header"""
+    timer = timing.finish()
+    if timer is not None and timer.stages:
+        response.headers['Server-Timing'] = timer.header()
+    if timer is not None and timer.profile_dir:
+        response.headers['X-Profile-Id'] = timer.profile_id
+    return response
+
+
+@conversion_blueprint.after_request
+def log_request(response):
+    """Log the request with its timed stages (runs before add_server_timing)"""
+    stages = {}
+    timer = timing.current()
+    if timer is not None:
+        for name, duration_ms, _ in timer.stages:
+            stages[name] = round(stages.get(name, 0) + duration_ms, 1)
+    response.headers['X-Request-Id'] = log.request_id()
+    log.finish_request(
+        logger,
+        response.status_code,
+        method=request.method,
+        path=request.url_rule.rule if request.url_rule else request.path,
+        client=request.remote_addr,
+        stages=stages
+    )
+    return response
+
+
+def _receive_upload(allowed_extensions):
+    """
+    The request's input file: a finalized resumable upload named by the
+    `upload_id` field, or else the uploaded `file`
+    
+    Args:
+        allowed_extensions (list): Extensions accepted for the upload
+    
+    Returns:
+        tuple: (file_path, original_filename, file_extension), or None if
+            the request has neither
+    """
+    upload_id = request.form.get('upload_id')
+    if upload_id:
+        return ResumableUpload.claim(upload_id, allowed_extensions)
+    if 'file' not in request.files:
+        return None
+    return FileHandler.save_upload(request.files['file'], allowed_extensions)
+
+
+def _converter_options():
+    """
+    Per-converter settings a request asked for, keyed by converter name
+    
+    Raises:
+        ValueError: If a setting has an unknown value
+    """
+    options = {}
+    engine = request.form.get('engine', '').lower()
+    if engine:
+        if engine not in ImageConverter.ENGINES:
+            raise ValueError(f"Unknown image engine: {engine}. Available: {', '.join(ImageConverter.ENGINES)}")
+        options['image'] = {'engine': engine}
+    return options
+
+
+def convert_upload(allowed_extensions, to_format):
+    """
+    Save the uploaded file, convert it along the cheapest path in the
+    conversion graph and send the result back
+    
+    Args:
+        allowed_extensions (list): Extensions accepted for the upload
+        to_format (str): Target format
+    
+    Returns:
+        Flask response, or (error dict, status) tuple
+    """
+    # Clients follow progress at /progress/<id> with an id of their choosing
+    progress_id = request.headers.get('X-Progress-Id')
+    if progress_id and not progress.PROGRESS_ID_PATTERN.match(progress_id):
+        return {'error': 'X-Progress-Id must be 8 to 64 letters, digits, - or _'}, 400
+    
+    endpoint = request.url_rule.rule if request.url_rule else request.path
+    metrics.IN_FLIGHT.inc(endpoint)
+    started = time.perf_counter()
+    record = {}
+    try:
+        if progress_id:
+            progress.start(progress_id).publish(status='receiving')
+        with metrics.REQUEST_PHASE_SECONDS.time(endpoint, 'upload_save'), timing.stage('save_upload'):
+            # Reading the form receives the upload
+            upload = _receive_upload(allowed_extensions)
+            if upload is None:
+                return {'error': 'No file provided'}, 400
+            input_path, original_filename, input_ext = upload
+        progress.publish(status='waiting')
+        input_size = FileHandler.get_file_size(input_path)
+        metrics.INPUT_BYTES.inc(endpoint, amount=input_size)
+        
+        # Negotiated variants are kept under an id derived from the source,
+        # so each is converted once while retained
+        negotiated = to_format == 'auto' and ImageConverter.is_supported(input_ext)
+        input_hash = None
+        if negotiated or config.CONVERSION_RECORDS:
+            input_hash = FileHandler.file_hash(input_path)
+        if negotiated:
+            try:
+                with timing.stage('negotiate'):
+                    to_format = ImageConverter.negotiate_format(request.headers.get('Accept'), input_path)
+            except Exception:
+                FileHandler.cleanup_file(input_path)
+                raise
+        
+        record.update(
+            from_format=input_ext,
+            to_format=to_format,
+            input_size=input_size,
+            client=request.remote_addr
+        )
+        if config.CONVERSION_RECORDS:
+            record['input_hash'] = input_hash
+        registry = get_registry()
+        
+        # Generate output path
+        output_path = FileHandler.get_output_path(original_filename, to_format)
+        
+        def run_edge(edge, edge_input, edge_output):
+            with metrics.CONVERTER_SECONDS.time(edge.name):
+                isolation.run_edge(
+                    edge,
+                    edge_input,
+                    edge_output,
+                    cancelled=lambda: isolation.client_disconnected(request.environ),
+                    options=options.get(edge.name)
+                )
+        
+        download_name = f"{os.path.splitext(original_filename)[0]}.{to_format}"
+        variant_id = ResultStore.variant_id(input_hash, to_format) if negotiated else None
+        
+        try:
+            result = ResultStore.get(variant_id) if variant_id else None
+            if result is not None:
+                metrics.cache_hit('variant')
+                record['converters'] = []
+                result['download_name'] = download_name
+            else:
+                if variant_id:
+                    metrics.cache_miss('variant')
+                options = _converter_options()
+                
+                # Convert through every hop of the cheapest path
+                with metrics.REQUEST_PHASE_SECONDS.time(endpoint, 'convert'), timing.stage('convert'):
+                    path = registry.find_path(input_ext, to_format)
+                    record['converters'] = [edge.name for edge in path]
+                    if streaming.can_stream(path):
+                        # Polled after the request context is gone
+                        environ = request.environ
+                        conversion = streaming.StreamedConversion(
+                            registry,
+                            path,
+                            runner=run_edge,
+                            options=options.get(path[-1].name),
+                            cancelled=lambda: isolation.client_disconnected(environ)
+                        )
+                        streamed = conversion.start(
+                            input_path,
+                            output_path,
+                            lambda fmt: FileHandler.get_output_path(original_filename, fmt)
+                        )
+                    else:
+                        streamed = False
+                        registry.run_path(
+                            path,
+                            input_path,
+                            output_path,
+                            lambda fmt: FileHandler.get_output_path(original_filename, fmt),
+                            admit=admission.admit,
+                            runner=run_edge
+                        )
+                
+                if streamed:
+                    # Outcome and size are only known once the stream ends,
+                    # which is when _send_streamed records them
+                    record['streamed'] = True
+                    return _send_streamed(
+                        conversion,
+                        input_path,
+                        output_path,
+                        download_name,
+                        variant_id or uuid.uuid4().hex,
+                        endpoint,
+                        negotiated,
+                        record,
+                        started
+                    )
+                
+                # Keep the output under a result id so the download can resume
+                result = ResultStore.save(output_path, download_name, result_id=variant_id)
+            
+            send_started = time.perf_counter()
+            output_size = result['size']
+            record.update(output_size=output_size, outcome='ok')
+            with timing.stage('send', 'open output'):
+                response = send_result(result)
+            response.headers['Content-Location'] = url_for('conversion.resultapi', result_id=result['id'])
+            if negotiated:
+                response.headers['Vary'] = 'Accept'
+            progress.finish(
+                status='done',
+                result_id=result['id'],
+                result_url=response.headers['Content-Location'],
+                size=output_size
+            )
+            
+            # Clean up files after sending
+            @response.call_on_close
+            def cleanup():
+                metrics.REQUEST_PHASE_SECONDS.observe(time.perf_counter() - send_started, endpoint, 'send')
+                metrics.OUTPUT_BYTES.inc(endpoint, amount=output_size)
+                FileHandler.cleanup_file(input_path)
+                # Still here only when the result was uploaded to remote storage
+                FileHandler.cleanup_file(output_path)
+                if not config.RESULT_TTL:
+                    ResultStore.delete(result['id'])
+            
+            return response
+            
+        except Exception as e:
+            # Clean up on error
+            FileHandler.cleanup_file(input_path)
+            FileHandler.cleanup_file(output_path)
+            raise e
+            
+    except admission.ConverterBusy as e:
+        metrics.ERRORS.inc(endpoint, type(e).__name__)
+        record.update(outcome='converter_busy', error=str(e))
+        return {
+            'error': str(e),
+            'converter': e.converter
+        }, 503, {'Retry-After': str(e.retry_after)}
+    except StorageFull as e:
+        metrics.ERRORS.inc(endpoint, type(e).__name__)
+        record.update(outcome='storage_full', error=str(e))
+        return {
+            'error': str(e),
+            'code': 'storage_full'
+        }, 507, {'Retry-After': str(e.retry_after)}
+    except isolation.ConversionError as e:
+        metrics.ERRORS.inc(endpoint, type(e).__name__)
+        record.update(outcome=e.code, error=str(e))
+        return {'error': str(e), 'code': e.code}, e.status
+    except ValueError as e:
+        metrics.ERRORS.inc(endpoint, type(e).__name__)
+        record.update(outcome='invalid_request', error=str(e))
+        return {'error': str(e)}, 400
+    except Exception as e:
+        metrics.ERRORS.inc(endpoint, type(e).__name__)
+        record.update(outcome='conversion_failed', error=str(e))
+        return {'error': f'Conversion failed: {str(e)}'}, 500
+    finally:
+        # No-op unless tracked and not already done
+        progress.finish(
+            status='failed',
+            code=record.get('outcome', 'invalid_request'),
+            error=record.get('error')
+        )
+        metrics.IN_FLIGHT.dec(endpoint)
+        log.annotate(**{field: record[field] for field in LOGGED_FIELDS if field in record})
+        if not record.get('streamed'):
+            _record_conversion(record, started)
+
+
+def _send_streamed(conversion, input_path, output_path, download_name, result_id, endpoint, negotiated, record,
+                   started):
+    """
+    Respond with a conversion's output while it is still being written,
+    using chunked transfer encoding. Once it is complete, the output is
+    kept under result_id like any other result
+    
+    Args:
+        record (dict): The request's conversion record, written with the
+            bytes sent and the outcome when the stream ends
+        started (float): perf_counter() when the request started
+    
+    Returns:
+        Flask response
+    """
+    # The response outlives the request: keep the tracker and timer from the
+    # request's thread-local state so the final update still reaches them
+    tracker = progress.current()
+    progress.finish()
+    timer = timing.current()
+    request_id = log.request_id()
+    result_url = url_for('conversion.resultapi', result_id=result_id)
+    send_started = time.perf_counter()
+    
+    def generate():
+        sent = 0
+        try:
+            for chunk in conversion.chunks():
+                sent += len(chunk)
+                record['output_size'] = sent
+                yield chunk
+            record['outcome'] = 'ok'
+        except Exception as e:
+            # Too late for an error status: the response ends short instead
+            metrics.ERRORS.inc(endpoint, type(e).__name__)
+            logger.error('Streamed conversion failed after %d bytes: %s', sent, e, extra={'request_id': request_id})
+            code = getattr(e, 'code', 'conversion_failed')
+            record.update(outcome=code, error=str(e))
+            if tracker is not None:
+                tracker.publish(status='failed', code=code, error=str(e))
+            raise
+        
+        metrics.REQUEST_PHASE_SECONDS.observe(time.perf_counter() - send_started, endpoint, 'send')
+        metrics.OUTPUT_BYTES.inc(endpoint, amount=sent)
+        if config.RESULT_TTL:
+            try:
+                ResultStore.save(output_path, download_name, result_id=result_id)
+            except Exception as e:
+                logger.warning('Streamed result %s not kept: %s', result_id, e, extra={'request_id': request_id})
+        if tracker is not None:
+            tracker.publish(status='done', result_id=result_id, result_url=result_url, size=sent)
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename="{download_name}"',
+        'Content-Location': result_url,
+        'X-Result-Id': result_id,
+        # Let chunks through as they are written
+        'X-Accel-Buffering': 'no',
+    }
+    if negotiated:
+        headers['Vary'] = 'Accept'
+    response = Response(
+        generate(),
+        mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream',
+        headers=headers
+    )
+    
+    @response.call_on_close
+    def cleanup():
+        # Also when the client left before the first chunk was read
+        conversion.close()
+        record.setdefault('outcome', isolation.ConversionCancelled.code)
+        record.setdefault('output_size', 0)
+        _record_conversion(record, started, timer)
+        FileHandler.cleanup_file(input_path)
+        # Still here unless it was moved into local result storage
+        FileHandler.cleanup_file(output_path)
+    
+    return response
+
+
+def _record_conversion(record, started, timer=None):
+    """Queue a ConversionRecord for requests that got as far as saving an upload"""
+    if 'input_hash' not in record:
+        return
+    stages = {}
+    timer = timer or timing.current()
+    if timer is not None:
+        for name, duration_ms, _ in timer.stages:
+            stages[name] = stages.get(name, 0) + duration_ms
+    record_buffer.record(duration_ms=(time.perf_counter() - started) * 1000, stages=stages, **record)
+
 
 class ImageConversionAPI(Resource):
     """Handle image format conversions"""
@@ -21,79 +479,156 @@ class ImageConversionAPI(Resource):
         Convert image from one format to another
         
         Request:
-            - file: Image file (multipart/form-data)
-            - to_format: Target format (png, jpg, webp, avif, etc.)
+            - file: Image file (multipart/form-data), or upload_id
+            - to_format: Target format (png, jpg, webp, avif, etc.), or auto
+              to pick one from the Accept header
+            - engine: pillow or vips (optional, IMAGE_ENGINE by default)
         
         Returns:
             Converted image file
         """
+        to_format = request.form.get('to_format', '').lower()
+        
+        if not to_format:
+            return {'error': 'to_format parameter required'}, 400
+        
+        # Validate output format
+        if to_format != 'auto' and not ImageConverter.is_supported(to_format):
+            return {
+                'error': f'Unsupported format: {to_format}',
+                'supported_formats': ImageConverter.SUPPORTED_FORMATS
+            }, 400
+        
+        return convert_upload(ImageConverter.SUPPORTED_FORMATS, to_format)
+
+
+class GraphConversionAPI(Resource):
+    """Convert between any two formats connected in the conversion graph"""
+    
+    def post(self, from_format, to_format):
+        """
+        Convert a file, chaining converters when there is no direct one
+        (e.g. xls -> pdf -> docx)
+        
+        Request:
+            - file: File in from_format (multipart/form-data), or upload_id
+            - engine: Image engine for image hops (optional)
+        
+        Returns:
+            Converted file in to_format
+        """
+        return convert_upload([from_format.lower()], to_format.lower())
+
+
+class BatchConversionAPI(Resource):
+    """Convert many files in one request"""
+    
+    def post(self):
+        """
+        Convert every file of a zip archive, or of several uploaded files, in
+        parallel. Files are charged to the rate limit once the upload is read
+        
+        Request:
+            - file / files: A zip archive, or files (multipart/form-data)
+            - targets: JSON object of input extension -> format, with `*`
+              for any other, e.g. {"png": "webp", "docx": "pdf"}
+            - engine: Image engine for image entries (optional)
+        
+        Returns:
+            Zip of the converted files, streamed as they finish, ending with
+            manifest.json: status (ok, failed or skipped), error and timing
+            per entry
+        """
+        endpoint = request.url_rule.rule
         try:
-            # Check if file is present
-            if 'file' not in request.files:
-                return {'error': 'No file provided'}, 400
-            
-            file = request.files['file']
-            to_format = request.form.get('to_format', '').lower()
-            
-            if not to_format:
-                return {'error': 'to_format parameter required'}, 400
-            
-            # Validate output format
-            if not ImageConverter.is_supported(to_format):
-                return {
-                    'error': f'Unsupported format: {to_format}',
-                    'supported_formats': ImageConverter.SUPPORTED_FORMATS
-                }, 400
-            
-            # Save uploaded file
-            input_path, original_filename, input_ext = FileHandler.save_upload(
-                file, 
-                ImageConverter.SUPPORTED_FORMATS
-            )
-            
-            # Generate output path
-            output_path = FileHandler.get_output_path(original_filename, to_format)
-            
+            targets = batch.parse_targets(request.form.get('targets'))
+            options = _converter_options()
+            registry = get_registry()
+            with timing.stage('save_upload'):
+                uploads = request.files.getlist('file') + request.files.getlist('files')
+                entries = batch.receive(uploads, registry.formats())
+        except StorageFull as e:
+            return {'error': str(e), 'code': 'storage_full'}, 507, {'Retry-After': str(e.retry_after)}
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        if not entries:
+            return {'error': 'No file provided'}, 400
+        
+        converters = batch.plan(entries, targets, registry)
+        refused = _charge(converters) if config.RATE_LIMIT_ENABLED else None
+        if refused is not None:
+            for entry in entries:
+                entry.cleanup()
+            return refused
+        
+        metrics.INPUT_BYTES.inc(endpoint, amount=sum(entry.input_size for entry in entries))
+        log.annotate(entries=len(entries), converters=sorted(set(converters)))
+        environ = request.environ
+        return Response(
+            batch.stream(entries, options, cancelled=lambda: isolation.client_disconnected(environ)),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': 'attachment; filename="batch.zip"',
+                # Let entries through as they are added
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+
+class InspectAPI(Resource):
+    """Describe a file before converting it"""
+    
+    def post(self):
+        """
+        Read a file's type, dimensions and page or sheet count from its
+        headers, and estimate each conversion it allows
+        
+        Request:
+            - file: Any supported file (multipart/form-data), or
+            - upload_id: A finalized resumable upload (left for a conversion)
+        
+        Returns:
+            format, size, sha256, type, width/height (images), pages and
+            page size (PDF), sheets (spreadsheets), estimated_seconds
+        """
+        upload_id = request.form.get('upload_id')
+        if upload_id:
             try:
-                # Convert the image
-                ImageConverter.convert(input_path, output_path, to_format)
-                
-                # Send the converted file
-                response = send_file(
-                    output_path,
-                    as_attachment=True,
-                    attachment_filename=f"{os.path.splitext(original_filename)[0]}.{to_format}"
-                )
-                
-                # Clean up files after sending
-                @response.call_on_close
-                def cleanup():
-                    FileHandler.cleanup_file(input_path)
-                    FileHandler.cleanup_file(output_path)
-                
-                return response
-                
-            except Exception as e:
-                # Clean up on error
-                FileHandler.cleanup_file(input_path)
-                FileHandler.cleanup_file(output_path)
-                raise e
-                
+                input_path, _, input_ext = ResumableUpload.peek(upload_id)
+                return inspection.inspect_file(input_path, input_ext)
+            except ValueError as e:
+                return {'error': str(e)}, 400
+        
+        if 'file' not in request.files:
+            return {'error': 'No file provided'}, 400
+        try:
+            input_path, _, input_ext = FileHandler.save_upload(request.files['file'], get_registry().formats())
+        except StorageFull as e:
+            return {'error': str(e), 'code': 'storage_full'}, 507, {'Retry-After': str(e.retry_after)}
         except ValueError as e:
             return {'error': str(e)}, 400
-        except Exception as e:
-            return {'error': f'Conversion failed: {str(e)}'}, 500
+        
+        try:
+            return inspection.inspect_file(input_path, input_ext)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        finally:
+            FileHandler.cleanup_file(input_path)
 
 
 class SupportedFormatsAPI(Resource):
     """List all supported formats"""
     
     def get(self):
-        """Get list of supported formats by category"""
+        """Get list of supported formats by category, and the conversion graph"""
+        from converters.pdf_converter import DocumentConverter
+        from converters.excel_converter import ExcelConverter
+        
         return {
             'images': ImageConverter.SUPPORTED_FORMATS,
-            'documents': ['pdf', 'docx'],
-            'spreadsheets': ['xlsx', 'xls', 'pdf']  # Excel and PDF
+            'documents': DocumentConverter.SUPPORTED_FORMATS,
+            'spreadsheets': ExcelConverter.SUPPORTED_FORMATS,
+            'conversions': [edge.to_dict() for edge in get_registry().edges()]
         }
 
 
@@ -105,58 +640,12 @@ class PDFToWordAPI(Resource):
         Convert PDF to Word document
         
         Request:
-            - file: PDF file (multipart/form-data)
+            - file: PDF file (multipart/form-data), or upload_id
         
         Returns:
             Converted Word document
         """
-        try:
-            from converters.pdf_converter import DocumentConverter
-            
-            # Check if file is present
-            if 'file' not in request.files:
-                return {'error': 'No file provided'}, 400
-            
-            file = request.files['file']
-            
-            # Save uploaded file
-            input_path, original_filename, input_ext = FileHandler.save_upload(
-                file, 
-                ['pdf']
-            )
-            
-            # Generate output path
-            output_path = FileHandler.get_output_path(original_filename, 'docx')
-            
-            try:
-                # Convert PDF to Word
-                DocumentConverter.pdf_to_word(input_path, output_path)
-                
-                # Send the converted file
-                response = send_file(
-                    output_path,
-                    as_attachment=True,
-                    attachment_filename=f"{os.path.splitext(original_filename)[0]}.docx"
-                )
-                
-                # Clean up files after sending
-                @response.call_on_close
-                def cleanup():
-                    FileHandler.cleanup_file(input_path)
-                    FileHandler.cleanup_file(output_path)
-                
-                return response
-                
-            except Exception as e:
-                # Clean up on error
-                FileHandler.cleanup_file(input_path)
-                FileHandler.cleanup_file(output_path)
-                raise e
-                
-        except ValueError as e:
-            return {'error': str(e)}, 400
-        except Exception as e:
-            return {'error': f'Conversion failed: {str(e)}'}, 500
+        return convert_upload(['pdf'], 'docx')
 
 
 class WordToPDFAPI(Resource):
@@ -167,58 +656,12 @@ class WordToPDFAPI(Resource):
         Convert Word document to PDF
         
         Request:
-            - file: Word file (multipart/form-data)
+            - file: Word file, .docx (multipart/form-data), or upload_id
         
         Returns:
             Converted PDF document
         """
-        try:
-            from converters.pdf_converter import DocumentConverter
-            
-            # Check if file is present
-            if 'file' not in request.files:
-                return {'error': 'No file provided'}, 400
-            
-            file = request.files['file']
-            
-            # Save uploaded file
-            input_path, original_filename, input_ext = FileHandler.save_upload(
-                file, 
-                ['docx', 'doc']
-            )
-            
-            # Generate output path
-            output_path = FileHandler.get_output_path(original_filename, 'pdf')
-            
-            try:
-                # Convert Word to PDF
-                DocumentConverter.word_to_pdf(input_path, output_path)
-                
-                # Send the converted file
-                response = send_file(
-                    output_path,
-                    as_attachment=True,
-                    attachment_filename=f"{os.path.splitext(original_filename)[0]}.pdf"
-                )
-                
-                # Clean up files after sending
-                @response.call_on_close
-                def cleanup():
-                    FileHandler.cleanup_file(input_path)
-                    FileHandler.cleanup_file(output_path)
-                
-                return response
-                
-            except Exception as e:
-                # Clean up on error
-                FileHandler.cleanup_file(input_path)
-                FileHandler.cleanup_file(output_path)
-                raise e
-                
-        except ValueError as e:
-            return {'error': str(e)}, 400
-        except Exception as e:
-            return {'error': f'Conversion failed: {str(e)}'}, 500
+        return convert_upload(['docx'], 'pdf')
 
 
 class PDFToExcelAPI(Resource):
@@ -229,58 +672,12 @@ class PDFToExcelAPI(Resource):
         Convert PDF to Excel spreadsheet
         
         Request:
-            - file: PDF file (multipart/form-data)
+            - file: PDF file (multipart/form-data), or upload_id
         
         Returns:
             Converted Excel file (.xlsx)
         """
-        try:
-            from converters.excel_converter import ExcelConverter
-            
-            # Check if file is present
-            if 'file' not in request.files:
-                return {'error': 'No file provided'}, 400
-            
-            file = request.files['file']
-            
-            # Save uploaded file
-            input_path, original_filename, input_ext = FileHandler.save_upload(
-                file, 
-                ['pdf']
-            )
-            
-            # Generate output path
-            output_path = FileHandler.get_output_path(original_filename, 'xlsx')
-            
-            try:
-                # Convert PDF to Excel
-                ExcelConverter.pdf_to_excel(input_path, output_path)
-                
-                # Send the converted file
-                response = send_file(
-                    output_path,
-                    as_attachment=True,
-                    attachment_filename=f"{os.path.splitext(original_filename)[0]}.xlsx"
-                )
-                
-                # Clean up files after sending
-                @response.call_on_close
-                def cleanup():
-                    FileHandler.cleanup_file(input_path)
-                    FileHandler.cleanup_file(output_path)
-                
-                return response
-                
-            except Exception as e:
-                # Clean up on error
-                FileHandler.cleanup_file(input_path)
-                FileHandler.cleanup_file(output_path)
-                raise e
-                
-        except ValueError as e:
-            return {'error': str(e)}, 400
-        except Exception as e:
-            return {'error': f'Conversion failed: {str(e)}'}, 500
+        return convert_upload(['pdf'], 'xlsx')
 
 
 class ExcelToPDFAPI(Resource):
@@ -291,58 +688,241 @@ class ExcelToPDFAPI(Resource):
         Convert Excel spreadsheet to PDF
         
         Request:
-            - file: Excel file (multipart/form-data)
+            - file: Excel file (multipart/form-data), or upload_id
         
         Returns:
             Converted PDF document
         """
+        return convert_upload(['xlsx', 'xls'], 'pdf')
+
+
+class ResultAPI(Resource):
+    """Download a retained conversion result"""
+    
+    def get(self, result_id):
+        """
+        Send a converted file again, e.g. to resume an interrupted download
+        
+        Supports If-None-Match (304) and single Range requests (206).
+        
+        Returns:
+            Converted file, or 404 once the result has expired
+        """
+        result = ResultStore.get(result_id)
+        if result is None:
+            return {'error': 'Result not found or expired'}, 404
+        return send_result(result)
+
+
+class JobSubmitAPI(Resource):
+    """Queue a conversion for any worker in the cluster"""
+    
+    def post(self, from_format, to_format):
+        """
+        Store the upload and queue its conversion instead of converting
+        in this request
+        
+        Request:
+            - file: File in from_format (multipart/form-data), or
+            - upload_id: A finalized resumable upload
+        
+        Returns:
+            202 with the job, and its URL in the Location header
+        """
+        if not config.MONGO_ENABLED:
+            return {'error': 'The job queue requires MongoDB (MONGO_URI)'}, 503
         try:
-            from converters.excel_converter import ExcelConverter
-            
-            # Check if file is present
-            if 'file' not in request.files:
+            upload = _receive_upload([from_format.lower()])
+            if upload is None:
                 return {'error': 'No file provided'}, 400
-            
-            file = request.files['file']
-            
-            # Save uploaded file
-            input_path, original_filename, input_ext = FileHandler.save_upload(
-                file, 
-                ['xlsx', 'xls']
+            input_path, original_filename, input_ext = upload
+        except StorageFull as e:
+            return {'error': str(e), 'code': 'storage_full'}, 507, {'Retry-After': str(e.retry_after)}
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
+        to_format = to_format.lower()
+        try:
+            job = job_queue.enqueue(
+                input_path,
+                input_ext,
+                to_format,
+                f"{os.path.splitext(original_filename)[0]}.{to_format}"
             )
-            
-            # Generate output path
-            output_path = FileHandler.get_output_path(original_filename, 'pdf')
-            
-            try:
-                # Convert Excel to PDF
-                ExcelConverter.excel_to_pdf(input_path, output_path)
-                
-                # Send the converted file
-                response = send_file(
-                    output_path,
-                    as_attachment=True,
-                    attachment_filename=f"{os.path.splitext(original_filename)[0]}.pdf"
-                )
-                
-                # Clean up files after sending
-                @response.call_on_close
-                def cleanup():
-                    FileHandler.cleanup_file(input_path)
-                    FileHandler.cleanup_file(output_path)
-                
-                return response
-                
-            except Exception as e:
-                # Clean up on error
-                FileHandler.cleanup_file(input_path)
-                FileHandler.cleanup_file(output_path)
-                raise e
-                
         except ValueError as e:
+            FileHandler.cleanup_file(input_path)
             return {'error': str(e)}, 400
-        except Exception as e:
-            return {'error': f'Conversion failed: {str(e)}'}, 500
+        
+        return job.json, 202, {'Location': url_for('conversion.jobapi', job_id=str(job.id))}
+
+
+class JobAPI(Resource):
+    """Status of a queued conversion"""
+    
+    def get(self, job_id):
+        """
+        Get a job's status; once done, `result_url` points at the result
+        
+        Returns:
+            Job document, or 404
+        """
+        if not config.MONGO_ENABLED:
+            return {'error': 'The job queue requires MongoDB (MONGO_URI)'}, 503
+        try:
+            job = ConversionJob.objects(id=job_id).first()
+        except ValidationError:
+            job = None
+        if job is None:
+            return {'error': 'Job not found'}, 404
+        
+        result = job.json
+        if job.result_id:
+            result['result_url'] = url_for('conversion.resultapi', result_id=job.result_id)
+        return result
+
+
+class UploadsAPI(Resource):
+    """Start resumable uploads"""
+    
+    def post(self):
+        """
+        Create an upload, to be sent in chunks with PATCH /uploads/<id>
+        
+        Request (JSON or form):
+            - filename: Name of the file, with its extension
+            - size: Total size in bytes
+        
+        Returns:
+            201 with the upload, and its URL in the Location header
+        """
+        fields = request.get_json(silent=True) or request.form
+        try:
+            upload = ResumableUpload.create(fields.get('filename'), int(fields.get('size') or 0))
+        except StorageFull as e:
+            return {'error': str(e), 'code': 'storage_full'}, 507, {'Retry-After': str(e.retry_after)}
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
+        return ResumableUpload.describe(upload), 201, {
+            'Location': url_for('conversion.uploadapi', upload_id=upload['id']),
+            'Upload-Offset': '0'
+        }
+
+
+class UploadAPI(Resource):
+    """Send, inspect and abandon a resumable upload"""
+    
+    def get(self, upload_id):
+        """
+        Get an upload's progress; `offset` is where the next chunk starts
+        
+        Returns:
+            Upload, or 404
+        """
+        upload = ResumableUpload.get(upload_id)
+        if upload is None:
+            return {'error': 'Upload not found'}, 404
+        return ResumableUpload.describe(upload), 200, {'Upload-Offset': str(upload['offset'])}
+    
+    def patch(self, upload_id):
+        """
+        Append a chunk
+        
+        Request:
+            - Body: The chunk's bytes
+            - Upload-Offset header: Where the chunk starts (the current offset)
+            - Upload-Checksum header: `<sha256|sha1|md5> <hex digest>` of the chunk
+        
+        Returns:
+            Upload with its new offset; 409 with the expected Upload-Offset
+            when the chunk doesn't start there
+        """
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            checksum = ResumableUpload.parse_checksum(request.headers.get('Upload-Checksum'))
+            upload = ResumableUpload.write_chunk(
+                upload_id,
+                offset,
+                request.stream,
+                request.content_length or 0,
+                checksum
+            )
+        except FileNotFoundError:
+            return {'error': 'Upload not found'}, 404
+        except UploadConflict as e:
+            return {'error': str(e), 'code': 'offset_mismatch'}, 409, {'Upload-Offset': str(e.offset)}
+        except ChecksumMismatch as e:
+            return {'error': str(e), 'code': 'checksum_mismatch'}, 400
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
+        return ResumableUpload.describe(upload), 200, {'Upload-Offset': str(upload['offset'])}
+    
+    def delete(self, upload_id):
+        """Abandon an upload"""
+        if not ResumableUpload.delete(upload_id):
+            return {'error': 'Upload not found'}, 404
+        return Response(status=204)
+
+
+class UploadCompleteAPI(Resource):
+    """Finalize resumable uploads"""
+    
+    def post(self, upload_id):
+        """
+        Finalize an upload once every byte has arrived; its id can then
+        replace the `file` field of any conversion, once
+        
+        Returns:
+            The finalized upload; 409 if bytes are missing
+        """
+        try:
+            upload = ResumableUpload.finalize(upload_id)
+        except FileNotFoundError:
+            return {'error': 'Upload not found'}, 404
+        except UploadConflict as e:
+            return {'error': str(e), 'code': 'upload_incomplete'}, 409, {'Upload-Offset': str(e.offset)}
+        return ResumableUpload.describe(upload)
+
+
+def _read_progress(progress_id):
+    """A conversion's latest progress; a job's is on its document, as it may run on another node"""
+    state = job_queue.read_progress(progress_id) if config.MONGO_ENABLED else None
+    return state or progress.read(progress_id)
+
+
+class ProgressAPI(Resource):
+    """Progress of a conversion as server-sent events"""
+    
+    def get(self, progress_id):
+        """
+        Stream progress of the conversion sent with `X-Progress-Id:
+        <progress_id>`, or of the queued job with that id
+        
+        Returns:
+            text/event-stream of `progress` events (status, converter,
+            pages, tables, sheets, bytes_written), ending with `done`
+            (result_url) or `failed`
+        """
+        if not progress.PROGRESS_ID_PATTERN.match(progress_id):
+            return {'error': 'Invalid progress id'}, 400
+        if not progress.acquire_stream():
+            return {
+                'error': 'Too many progress streams, retry shortly',
+                'code': 'too_many_streams'
+            }, 503, {'Retry-After': '1'}
+        
+        response = Response(
+            progress.stream(progress_id, config.PROGRESS_STREAM_TIMEOUT, _read_progress),
+            content_type='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                # Don't let nginx buffer the events
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        response.call_on_close(progress.release_stream)
+        return response
 
 
 class HealthCheckAPI(Resource):
@@ -353,10 +933,45 @@ class HealthCheckAPI(Resource):
         return {
             'status': 'healthy',
             'service': 'File Conversion API',
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'converters': admission.stats(),
+            'storage': janitor.stats()
         }
 
 
+class MetricsAPI(Resource):
+    """Prometheus metrics endpoint"""
+    
+    def get(self):
+        """Expose conversion metrics in the Prometheus text format"""
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _admission_metrics():
+    """Per-converter in-flight and queued work, read at scrape time"""
+    stats = admission.stats()
+    lines = []
+    for field in ('in_flight', 'queued'):
+        name = f'filea_converter_{field}'
+        lines.append(f'# HELP {name} Conversions {field.replace("_", " ")} per converter')
+        lines.append(f'# TYPE {name} gauge')
+        for converter, values in sorted(stats.items()):
+            lines.append(f'{name}{{converter="{converter}"}} {values[field]}')
+    return lines
+
+
+def _storage_metrics():
+    """Bytes held in uploads, outputs and results as of the last sweep"""
+    return [
+        '# HELP filea_storage_usage_bytes Bytes under the storage folders',
+        '# TYPE filea_storage_usage_bytes gauge',
+        f'filea_storage_usage_bytes {FileHandler.usage.value}',
+    ]
+
+
+metrics.register_collector(_admission_metrics)
+metrics.register_collector(_storage_metrics)
+
 
 # Register endpoints
 conversion_blueprint_api.add_resource(ImageConversionAPI, '/convert/image')
@@ -364,5 +979,16 @@ conversion_blueprint_api.add_resource(PDFToWordAPI, '/convert/pdf-to-word')
 conversion_blueprint_api.add_resource(WordToPDFAPI, '/convert/word-to-pdf')
 conversion_blueprint_api.add_resource(PDFToExcelAPI, '/convert/pdf-to-excel')
 conversion_blueprint_api.add_resource(ExcelToPDFAPI, '/convert/excel-to-pdf')
+conversion_blueprint_api.add_resource(BatchConversionAPI, '/convert/batch')
+conversion_blueprint_api.add_resource(GraphConversionAPI, '/convert/<from_format>/<to_format>')
+conversion_blueprint_api.add_resource(ResultAPI, '/results/<result_id>')
+conversion_blueprint_api.add_resource(JobSubmitAPI, '/jobs/<from_format>/<to_format>')
+conversion_blueprint_api.add_resource(JobAPI, '/jobs/<job_id>')
+conversion_blueprint_api.add_resource(UploadsAPI, '/uploads')
+conversion_blueprint_api.add_resource(UploadAPI, '/uploads/<upload_id>')
+conversion_blueprint_api.add_resource(UploadCompleteAPI, '/uploads/<upload_id>/complete')
+conversion_blueprint_api.add_resource(ProgressAPI, '/progress/<progress_id>')
+conversion_blueprint_api.add_resource(InspectAPI, '/inspect')
 conversion_blueprint_api.add_resource(SupportedFormatsAPI, '/formats')
 conversion_blueprint_api.add_resource(HealthCheckAPI, '/health')
+conversion_blueprint_api.add_resource(MetricsAPI, '/metrics')
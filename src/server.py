@@ -3,12 +3,15 @@ from flask.ext.cors import CORS
 
 import config
 from model.abc import db
+from util import log
+
+log.setup(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_SAMPLE_RATE, config.LOG_QUEUE_SIZE)
 
 server = Flask(__name__)
 server.debug = config.DEBUG
 
 # Only initialize MongoDB if URI is provided
-if hasattr(config, 'MONGO_URI') and config.MONGO_URI and 'mongodb' in config.MONGO_URI:
+if config.MONGO_ENABLED:
     server.config['MONGODB_SETTINGS'] = config.MONGODB_SETTINGS
     db.init_app(server)
 
@@ -24,6 +27,13 @@ server.register_blueprint(common_blueprint)
 from route.conversion import conversion_blueprint
 server.register_blueprint(conversion_blueprint, url_prefix='/api')
 
+# Pay the converter import cost now instead of on the first request
+if config.IMPORT_POLICY == 'prewarm':
+    from util.lazy_import import prewarm
+    prewarm()
+
 
 if __name__ == '__main__':
+    from util import janitor
+    janitor.start()
     server.run(host=config.HOST, port=config.PORT)
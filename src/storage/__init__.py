@@ -0,0 +1,2 @@
+# Storage backends for conversion results
+from .base import Storage, get_storage
@@ -0,0 +1,95 @@
+"""
+Storage backend interface
+Results are stored under keys such as 'ab/<result_id>.bin'. Converters
+always work on local files; backends that don't keep files locally copy
+them in and out with put() and fetch().
+"""
+from contextlib import contextmanager
+
+import config
+
+
+class Storage:
+    """Key/file store for conversion results"""
+
+    # Whether stored files count against DISK_QUOTA_MB
+    on_disk = False
+
+    def put(self, key, path):
+        """
+        Store a local file under a key. Local backends move the file;
+        remote backends upload it and leave the local copy in place
+
+        Args:
+            key (str): Storage key
+            path (str): Local file to store
+        """
+        raise NotImplementedError
+
+    def put_bytes(self, key, data):
+        """Store a small value (e.g. JSON metadata) under a key"""
+        raise NotImplementedError
+
+    def get_bytes(self, key):
+        """
+        Read a small value
+
+        Raises:
+            FileNotFoundError: If the key doesn't exist
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove a key, ignoring keys that don't exist"""
+        raise NotImplementedError
+
+    def list(self):
+        """
+        Every stored key
+
+        Returns:
+            list: (key, size, mtime) tuples
+        """
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Path of the stored file on this machine, None for remote backends"""
+        return None
+
+    def url(self, key, expires, download_name):
+        """Pre-signed download URL for remote backends, None otherwise"""
+        return None
+
+    @contextmanager
+    def fetch(self, key):
+        """
+        Local path of a stored file for the duration of the block,
+        downloading it first when the backend is remote
+        """
+        raise NotImplementedError
+
+
+_storage = None
+
+
+def get_storage():
+    """Get the storage backend selected by config.STORAGE_BACKEND"""
+    global _storage
+    if _storage is None:
+        if config.STORAGE_BACKEND == 'local':
+            from storage.local import LocalStorage
+            _storage = LocalStorage(config.RESULT_DIR)
+        elif config.STORAGE_BACKEND == 'memory':
+            from storage.local import MemoryStorage
+            _storage = MemoryStorage(config.MEMORY_STORAGE_DIR, config.MEMORY_STORAGE_MB * 1024 * 1024)
+        elif config.STORAGE_BACKEND == 's3':
+            from storage.s3 import S3Storage
+            _storage = S3Storage(
+                config.S3_BUCKET,
+                prefix=config.S3_PREFIX,
+                endpoint_url=config.S3_ENDPOINT_URL,
+                region=config.S3_REGION
+            )
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {config.STORAGE_BACKEND}")
+    return _storage
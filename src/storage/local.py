@@ -0,0 +1,119 @@
+"""
+Local disk and RAM-backed storage
+MemoryStorage is LocalStorage on a tmpfs (e.g. /dev/shm) with a size cap,
+so every worker on the node shares it and hot results stay off slow disks.
+"""
+import errno
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+from storage.base import Storage
+from util.file_handler import StorageFull
+
+
+class LocalStorage(Storage):
+    """Files under a root directory"""
+
+    on_disk = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    @staticmethod
+    def _temp_path(target):
+        return f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def put(self, key, path):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.replace(path, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # SCRATCH_DIR and the root are on different filesystems (e.g. one
+            # is a tmpfs): copy next to the target, then rename into place
+            temp_path = self._temp_path(target)
+            try:
+                shutil.copyfile(path, temp_path)
+                os.replace(temp_path, target)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            os.remove(path)
+
+    def put_bytes(self, key, data):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write then rename so readers never see a partial value
+        temp_path = self._temp_path(target)
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, target)
+
+    def get_bytes(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        keys = []
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith('.tmp') or name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                keys.append((os.path.relpath(path, self.root), stat.st_size, stat.st_mtime))
+        return keys
+
+    def local_path(self, key):
+        return self._path(key)
+
+    @contextmanager
+    def fetch(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        yield path
+
+
+class MemoryStorage(LocalStorage):
+    """LocalStorage on tmpfs, evicting the oldest files above `max_bytes`"""
+
+    on_disk = False
+
+    def __init__(self, root, max_bytes):
+        super().__init__(root)
+        self.max_bytes = max_bytes
+
+    def put(self, key, path):
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            raise StorageFull(f"File of {size} bytes exceeds the memory storage cap", 1)
+
+        stored = sorted(self.list(), key=lambda entry: entry[2])
+        used = sum(entry[1] for entry in stored)
+        for stored_key, stored_size, _ in stored:
+            if used + size <= self.max_bytes:
+                break
+            self.delete(stored_key)
+            used -= stored_size
+        super().put(key, path)
@@ -0,0 +1,90 @@
+"""
+S3-compatible object storage
+Works with AWS S3 and with stand-ins such as MinIO via `endpoint_url`, so
+several nodes can serve each other's results. Requires boto3.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from storage.base import Storage
+from util.file_handler import FileHandler
+
+
+class S3Storage(Storage):
+    """Objects in a bucket, under an optional key prefix"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, client=None):
+        """
+        Args:
+            bucket (str): Bucket name
+            prefix (str): Prefix prepended to every key
+            endpoint_url (str): Endpoint of an S3-compatible service (MinIO)
+            region (str): Bucket region
+            client: Preconfigured boto3 S3 client, mainly for tests
+        """
+        if client is None:
+            import boto3
+            # Credentials come from the usual AWS_* environment variables
+            client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def put(self, key, path):
+        self.client.upload_file(path, self.bucket, self._key(key))
+
+    def put_bytes(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get_bytes(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(key)
+        return response['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self):
+        keys = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                keys.append((
+                    item['Key'][len(self.prefix):],
+                    item['Size'],
+                    item['LastModified'].timestamp()
+                ))
+        return keys
+
+    def url(self, key, expires, download_name):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': self._key(key),
+                'ResponseContentDisposition': f'attachment; filename="{download_name}"',
+            },
+            ExpiresIn=max(1, int(expires))
+        )
+
+    @contextmanager
+    def fetch(self, key):
+        os.makedirs(FileHandler.OUTPUT_FOLDER, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=FileHandler.OUTPUT_FOLDER)
+        os.close(fd)
+        try:
+            try:
+                self.client.download_file(self.bucket, self._key(key), path)
+            except self.client.exceptions.ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                    raise FileNotFoundError(key)
+                raise
+            yield path
+        finally:
+            FileHandler.cleanup_file(path)
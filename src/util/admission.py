@@ -0,0 +1,169 @@
+"""
+Admission control for converters
+Each converter gets a fixed number of concurrent slots and a bounded wait
+queue. Gates are created at import time, so when the app is preloaded
+before forking (gunicorn preload_app) the limits hold across all workers.
+"""
+import contextlib
+import math
+import multiprocessing
+import os
+import time
+
+import config
+
+
+class ConverterBusy(Exception):
+    """Raised when a converter's wait queue is full"""
+
+    def __init__(self, converter, retry_after):
+        super().__init__(f"Converter {converter} is busy, retry in {retry_after}s")
+        self.converter = converter
+        self.retry_after = retry_after
+
+
+def _alive(pid):
+    """Whether a process still exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AdmissionGate:
+    """
+    Concurrency slots with a bounded queue for one converter
+
+    Each slot and queue place records the pid holding it, so one left by a
+    worker that was killed (SIGKILL, OOM, gunicorn timeout) is reclaimed
+    instead of being lost until the server restarts.
+    """
+
+    # Weight of the newest duration in the moving average used for Retry-After
+    SMOOTHING = 0.2
+    # How often a queued request looks for slots whose holder died
+    REAP_INTERVAL = 0.5
+
+    def __init__(self, name, concurrency, queue_depth, queue_timeout):
+        """
+        Args:
+            name (str): Converter name
+            concurrency (int): Conversions allowed to run at once
+            queue_depth (int): Requests allowed to wait for a slot
+            queue_timeout (float): Seconds a request may wait for a slot
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self._changed = multiprocessing.Condition()
+        # Pid holding each slot and queue place, 0 when free; guarded by _changed
+        self._holders = multiprocessing.Array('i', concurrency, lock=False)
+        self._waiters = multiprocessing.Array('i', queue_depth, lock=False)
+        self._avg_duration = multiprocessing.Value('d', 1.0, lock=False)
+
+    @staticmethod
+    def _take(places, pid):
+        """Claim a free place, or one whose owner died; None if all are held"""
+        for index, owner in enumerate(places):
+            if not owner:
+                places[index] = pid
+                return index
+        for index, owner in enumerate(places):
+            if not _alive(owner):
+                places[index] = pid
+                return index
+        return None
+
+    @staticmethod
+    def _count(places):
+        return sum(1 for owner in places if owner and _alive(owner))
+
+    def retry_after(self):
+        """Estimate how long until a queued request would get a slot"""
+        with self._changed:
+            waves = (self._count(self._waiters) + 1) / self.concurrency
+            return max(1, int(math.ceil(waves * self._avg_duration.value)))
+
+    @contextlib.contextmanager
+    def admit(self):
+        """
+        Hold a slot for the duration of the block
+
+        Raises:
+            ConverterBusy: If the queue is full or the wait times out
+        """
+        pid = os.getpid()
+        with self._changed:
+            slot = self._take(self._holders, pid)
+            if slot is None:
+                place = self._take(self._waiters, pid)
+                if place is None:
+                    raise ConverterBusy(self.name, self.retry_after())
+                try:
+                    deadline = time.monotonic() + self.queue_timeout
+                    while slot is None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        # A holder that dies never notifies, so look again now and then
+                        self._changed.wait(min(remaining, self.REAP_INTERVAL))
+                        slot = self._take(self._holders, pid)
+                finally:
+                    self._waiters[place] = 0
+                if slot is None:
+                    raise ConverterBusy(self.name, self.retry_after())
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            with self._changed:
+                self._holders[slot] = 0
+                self._avg_duration.value += self.SMOOTHING * (duration - self._avg_duration.value)
+                self._changed.notify()
+
+    def stats(self):
+        with self._changed:
+            return {
+                'in_flight': self._count(self._holders),
+                'queued': self._count(self._waiters),
+                'concurrency': self.concurrency,
+                'queue_depth': self.queue_depth
+            }
+
+
+_gates = {
+    name: AdmissionGate(
+        name,
+        concurrency,
+        config.CONVERTER_QUEUE_DEPTH,
+        config.CONVERTER_QUEUE_TIMEOUT
+    )
+    for name, concurrency in config.CONVERTER_CONCURRENCY.items()
+}
+
+
+def admit(edge):
+    """
+    Admission context for running a conversion edge
+
+    Args:
+        edge (ConversionEdge): Edge about to run
+
+    Returns:
+        Context manager holding the converter's slot
+    """
+    gate = _gates.get(edge.name)
+    if gate is None:
+        return contextlib.nullcontext()
+    return gate.admit()
+
+
+def stats():
+    """In-flight work and queue depth per converter"""
+    return {name: gate.stats() for name, gate in _gates.items()}
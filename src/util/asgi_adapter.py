@@ -0,0 +1,198 @@
+"""
+ASGI front end for the WSGI app
+The event loop holds the connections: request bodies are spooled to
+SCRATCH_DIR as they arrive and responses are sent as the app yields them,
+both awaiting the client, so a slow upload or download costs a coroutine
+rather than a thread. The app itself runs in a bounded thread pool once the
+whole body is on disk, where conversions still go to isolated children
+behind admission control.
+"""
+import asyncio
+import concurrent.futures
+import json
+import sys
+import tempfile
+import threading
+
+import config
+
+_END = object()
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def _next_chunk(iterator):
+    return next(iterator, _END)
+
+
+class AsgiAdapter:
+    """
+    Serve a WSGI app over ASGI
+
+    Args:
+        app: WSGI application
+        threads (int): Requests the app handles at once
+        max_body_size (int): Largest request body accepted, in bytes
+    """
+
+    def __init__(self, app, threads=config.ASGI_THREADS, max_body_size=config.ASGI_MAX_BODY_SIZE):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.executor = concurrent.futures.ThreadPoolExecutor(threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise NotImplementedError(f"Unsupported ASGI scope: {scope['type']}")
+
+    async def lifespan(self, receive, send):
+        from util import janitor, log
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                janitor.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.to_thread(self.executor.shutdown)
+                log.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        headers = [(name.decode('latin-1').lower(), value.decode('latin-1')) for name, value in scope['headers']]
+        content_length = next((value for name, value in headers if name == 'content-length'), None)
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_size:
+            await self.reject(send, 413, 'Request body too large')
+            return
+
+        body = tempfile.SpooledTemporaryFile(config.ASGI_SPOOL_SIZE, dir=config.SCRATCH_DIR)
+        try:
+            try:
+                await self.read_body(receive, body)
+            except BodyTooLarge:
+                await self.reject(send, 413, 'Request body too large')
+                return
+            except ClientDisconnected:
+                return
+            await asyncio.to_thread(body.seek, 0)
+
+            disconnected = threading.Event()
+            watcher = asyncio.ensure_future(self.watch_disconnect(receive, disconnected))
+            try:
+                environ = self.environ(scope, headers, body)
+                environ['filea.client_disconnected'] = disconnected.is_set
+                await self.respond(environ, send, disconnected)
+            finally:
+                watcher.cancel()
+        finally:
+            await asyncio.to_thread(body.close)
+
+    async def read_body(self, receive, body):
+        """Spool the request body, awaiting each chunk from the client"""
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body_size:
+                raise BodyTooLarge()
+            if chunk:
+                await asyncio.to_thread(body.write, chunk)
+            if not message.get('more_body', False):
+                return
+
+    @staticmethod
+    async def watch_disconnect(receive, disconnected):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+    @staticmethod
+    def environ(scope, headers, body):
+        """Build the WSGI environ for an ASGI http scope"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client')
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'SERVER_SOFTWARE': 'filea-asgi',
+            'REMOTE_ADDR': client[0] if client else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers:
+            if name == 'content-type':
+                environ['CONTENT_TYPE'] = value
+            elif name == 'content-length':
+                environ['CONTENT_LENGTH'] = value
+            else:
+                key = 'HTTP_' + name.upper().replace('-', '_')
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    async def respond(self, environ, send, disconnected):
+        """Run the app in the pool and send its response as it is produced"""
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers
+            ]
+
+        loop = asyncio.get_running_loop()
+        iterable = await loop.run_in_executor(self.executor, self.app, environ, start_response)
+        try:
+            iterator = iter(iterable)
+            # The status may only be known after the first chunk
+            chunk = await loop.run_in_executor(self.executor, _next_chunk, iterator)
+            response['sent'] = True
+            await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            while chunk is not _END:
+                if disconnected.is_set():
+                    return
+                if chunk:
+                    # Awaits the client, so a slow reader holds no thread
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, _next_chunk, iterator)
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+    @staticmethod
+    async def reject(send, status, message):
+        body = json.dumps({'error': message}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
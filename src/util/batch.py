@@ -0,0 +1,374 @@
+"""
+Batch conversion
+Converts every file of an upload (zip archives are unpacked) in parallel and
+streams back a zip that grows as entries finish, ending with a manifest of
+each entry's outcome. A failed entry is recorded in the manifest instead of
+failing the batch.
+"""
+import concurrent.futures
+import json
+import os
+import posixpath
+import shutil
+import threading
+import time
+import zipfile
+import zlib
+
+import config
+from util import admission, isolation, metrics
+from util.file_handler import FileHandler
+
+MANIFEST_NAME = 'manifest.json'
+
+# Bytes copied between the zip and files at a time, and so the most the
+# response buffers before yielding
+CHUNK_SIZE = 256 * 1024
+
+
+class BatchEntry:
+    """One file of a batch and what became of it"""
+
+    def __init__(self, name, input_path, from_format):
+        self.name = name
+        self.input_path = input_path
+        self.input_size = os.path.getsize(input_path) if input_path else 0
+        self.from_format = from_format
+        self.to_format = None
+        self.path = None
+        self.output_name = None
+        self.output_path = None
+        self.output_size = None
+        self.status = 'pending'
+        self.code = None
+        self.error = None
+        self.duration_ms = None
+
+    def fail(self, status, code, error):
+        self.status, self.code, self.error = status, code, error
+
+    def to_dict(self):
+        entry = {
+            'name': self.name,
+            'output': self.output_name,
+            'from': self.from_format,
+            'to': self.to_format,
+            'status': self.status,
+            'input_size': self.input_size,
+            'output_size': self.output_size,
+            'duration_ms': self.duration_ms,
+        }
+        if self.error:
+            entry.update(code=self.code, error=self.error)
+        return entry
+
+    def cleanup(self):
+        for path in (self.input_path, self.output_path):
+            if path:
+                FileHandler.cleanup_file(path)
+
+
+class _ZipSink:
+    """Write-only stream the zip is written to, emptied after every chunk"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parse_targets(value):
+    """
+    Read the `targets` field: a JSON object mapping input extensions to
+    output formats, with `*` for every other extension
+
+    Args:
+        value (str): The field's value
+
+    Returns:
+        dict: Lowercase extension -> format
+
+    Raises:
+        ValueError: If it is missing or malformed
+    """
+    if not value:
+        raise ValueError('targets parameter required, e.g. {"png": "webp", "docx": "pdf"}')
+    try:
+        targets = json.loads(value)
+    except json.JSONDecodeError:
+        raise ValueError('targets must be a JSON object')
+    if not isinstance(targets, dict) or not all(isinstance(fmt, str) for fmt in targets.values()):
+        raise ValueError('targets must map extensions to formats')
+    return {ext.lower().lstrip('.'): fmt.lower() for ext, fmt in targets.items()}
+
+
+def _entry_name(filename):
+    """A safe relative name for an archive member, keeping its folders"""
+    parts = [
+        part for part in posixpath.normpath(filename.replace('\\', '/')).split('/')
+        if part not in ('', '.', '..')
+    ]
+    return '/'.join(parts)
+
+
+def _extension(name):
+    return name.rsplit('.', 1)[1].lower() if '.' in posixpath.basename(name) else ''
+
+
+def _unreadable(name, ext, status, code, error):
+    """An entry that won't be converted, for the manifest"""
+    entry = BatchEntry(name, None, ext)
+    entry.fail(status, code, error)
+    return entry
+
+
+def _unsupported(name, ext):
+    return _unreadable(name, ext, 'skipped', 'unsupported_format', f"Unsupported format: {ext or 'none'}")
+
+
+def _extract(archive_path, formats, entries):
+    """Unpack an archive's members into the upload folder as entries"""
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except zipfile.BadZipFile:
+        raise ValueError('Not a valid zip archive')
+
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+            and not posixpath.basename(info.filename).startswith('.')
+        ]
+        _check_limits(entries, len(members), sum(info.file_size for info in members))
+        for info in members:
+            name = _entry_name(info.filename)
+            ext = _extension(name)
+            if ext not in formats:
+                entries.append(_unsupported(name, ext))
+                continue
+            if info.file_size > FileHandler.MAX_FILE_SIZE:
+                error = f"File too large. Max size: {FileHandler.MAX_FILE_SIZE / 1024 / 1024}MB"
+                entries.append(_unreadable(name, ext, 'failed', 'too_large', error))
+                continue
+
+            path = FileHandler.get_upload_path(ext)
+            try:
+                # Reads no more than the member's declared size
+                with archive.open(info) as source, open(path, 'wb') as target:
+                    shutil.copyfileobj(source, target, CHUNK_SIZE)
+            except (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error) as e:
+                # Encrypted, unsupported compression or corrupt
+                FileHandler.cleanup_file(path)
+                entries.append(_unreadable(name, ext, 'failed', 'invalid_input', str(e)))
+                continue
+            entry = BatchEntry(name, path, ext)
+            with FileHandler.usage.get_lock():
+                FileHandler.usage.value += entry.input_size
+            entries.append(entry)
+
+
+def _check_limits(entries, incoming_count, incoming_size):
+    count = len(entries) + incoming_count
+    if count > config.BATCH_MAX_ENTRIES:
+        raise ValueError(f"Too many files: {count}. Max per batch: {config.BATCH_MAX_ENTRIES}")
+    size = sum(entry.input_size for entry in entries) + incoming_size
+    if size > config.BATCH_MAX_SIZE:
+        raise ValueError(f"Batch too large. Max size: {config.BATCH_MAX_SIZE / 1024 / 1024}MB")
+    FileHandler.check_capacity(incoming_size)
+
+
+def receive(uploads, formats):
+    """
+    Save a batch's uploads as entries, unpacking zip archives
+
+    Args:
+        uploads (list): FileStorage objects from the request
+        formats (list): Formats the conversion graph knows
+
+    Returns:
+        list: BatchEntry objects; those of unsupported formats are skipped
+
+    Raises:
+        ValueError: If an archive is unreadable or the batch is over its limits
+        StorageFull: If storage is over quota or the disk is nearly full
+    """
+    entries = []
+    try:
+        for upload in uploads:
+            if not upload or not upload.filename:
+                continue
+            if _extension(upload.filename) == 'zip':
+                archive_path, _, _ = FileHandler.save_upload(upload, ['zip'])
+                try:
+                    _extract(archive_path, formats, entries)
+                finally:
+                    FileHandler.cleanup_file(archive_path)
+                continue
+
+            name = _entry_name(upload.filename)
+            ext = _extension(name)
+            if ext not in formats:
+                entries.append(_unsupported(name, ext))
+                continue
+            _check_limits(entries, 1, upload.content_length or 0)
+            path, _, _ = FileHandler.save_upload(upload, [ext])
+            entries.append(BatchEntry(name, path, ext))
+        _check_limits(entries, 0, 0)
+    except Exception:
+        for entry in entries:
+            entry.cleanup()
+        raise
+    return entries
+
+
+def plan(entries, targets, registry):
+    """
+    Pick each entry's target format and conversion path
+
+    Args:
+        entries (list): BatchEntry objects from receive()
+        targets (dict): Extension -> format, from parse_targets()
+        registry (ConverterRegistry): Conversion graph
+
+    Returns:
+        list: Names of the converters the batch will run, for rate limiting
+    """
+    converters = []
+    taken = set()
+    for entry in entries:
+        if entry.status != 'pending':
+            continue
+        to_format = targets.get(entry.from_format, targets.get('*'))
+        if not to_format:
+            entry.fail('skipped', 'no_target', f"No target format for .{entry.from_format}")
+            continue
+        entry.to_format = to_format
+        try:
+            entry.path = registry.find_path(entry.from_format, to_format)
+        except ValueError as e:
+            entry.fail('skipped', 'unsupported_conversion', str(e))
+            continue
+        converters.extend(edge.name for edge in entry.path)
+
+        # a.png and a.jpg may both become a.webp
+        base = posixpath.splitext(entry.name)[0]
+        output_name, counter = f'{base}.{to_format}', 1
+        while output_name in taken or output_name == MANIFEST_NAME:
+            output_name = f'{base}_{counter}.{to_format}'
+            counter += 1
+        taken.add(output_name)
+        entry.output_name = output_name
+    return converters
+
+
+def _convert(entry, options, cancelled):
+    """Worker body: convert one entry, recording the outcome on it"""
+    if cancelled():
+        return
+    started = time.perf_counter()
+    entry.output_path = FileHandler.get_output_path(posixpath.basename(entry.name), entry.to_format)
+
+    def run_edge(edge, edge_input, edge_output):
+        with metrics.CONVERTER_SECONDS.time(edge.name):
+            isolation.run_edge(edge, edge_input, edge_output, cancelled=cancelled, options=options.get(edge.name))
+
+    from converters.registry import get_registry
+    try:
+        get_registry().run_path(
+            entry.path,
+            entry.input_path,
+            entry.output_path,
+            lambda fmt: FileHandler.get_output_path(posixpath.basename(entry.name), fmt),
+            admit=admission.admit,
+            runner=run_edge
+        )
+        entry.status = 'ok'
+        entry.output_size = os.path.getsize(entry.output_path)
+    except admission.ConverterBusy as e:
+        entry.fail('failed', 'converter_busy', str(e))
+    except isolation.ConversionError as e:
+        entry.fail('failed', e.code, str(e))
+    except ValueError as e:
+        entry.fail('failed', 'invalid_input', str(e))
+    except Exception as e:
+        entry.fail('failed', 'conversion_failed', f'Conversion failed: {e}')
+    finally:
+        entry.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        FileHandler.cleanup_file(entry.input_path)
+
+
+def manifest(entries):
+    """The batch's outcome, written as the archive's last member"""
+    counts = {'ok': 0, 'failed': 0, 'skipped': 0}
+    for entry in entries:
+        counts[entry.status] = counts.get(entry.status, 0) + 1
+    return dict(counts, entries=[entry.to_dict() for entry in entries])
+
+
+def stream(entries, options=None, cancelled=None, workers=None):
+    """
+    Convert the entries in parallel and yield a zip of the results, each
+    added as soon as it is converted, followed by manifest.json
+
+    Closing the generator (the client went away) cancels the conversions
+    still running and removes every file of the batch.
+
+    Args:
+        entries (list): BatchEntry objects from plan()
+        options (dict): Converter options, keyed by converter name
+        cancelled (callable): Returns True once the client has gone
+        workers (int): Entries converted at once, BATCH_WORKERS by default
+
+    Yields:
+        bytes: The next part of the zip
+    """
+    options = options or {}
+    stopped = threading.Event()
+
+    def is_cancelled():
+        return stopped.is_set() or bool(cancelled and cancelled())
+
+    sink = _ZipSink()
+    # Outputs are mostly compressed already (PNG, JPEG, DOCX, PDF), so the
+    # cheapest deflate level saves CPU for the conversions
+    archive = zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED, compresslevel=1)
+    executor = concurrent.futures.ThreadPoolExecutor(workers or config.BATCH_WORKERS, thread_name_prefix='batch')
+    try:
+        futures = {
+            executor.submit(_convert, entry, options, is_cancelled): entry
+            for entry in entries if entry.status == 'pending'
+        }
+        for future in concurrent.futures.as_completed(futures):
+            entry = futures[future]
+            if entry.status != 'ok':
+                continue
+            # Opened by name, the member takes the archive's compression level
+            with open(entry.output_path, 'rb') as source, \
+                    archive.open(entry.output_name, 'w', force_zip64=entry.output_size > zipfile.ZIP64_LIMIT) as target:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            FileHandler.cleanup_file(entry.output_path)
+
+        for entry in entries:
+            metrics.BATCH_ENTRIES.inc(entry.status)
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest(entries), indent=2))
+        archive.close()
+        yield sink.drain()
+    finally:
+        stopped.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        for entry in entries:
+            entry.cleanup()
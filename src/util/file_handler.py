@@ -1,19 +1,82 @@
 """
 File handling utilities for uploads and downloads
 """
+import hashlib
+import logging
+import multiprocessing
 import os
+import shutil
 import uuid
 from werkzeug.utils import secure_filename
 
+import config
+from util import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StorageFull(Exception):
+    """Raised when an upload would exceed the disk quota or free-space floor"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class FileHandler:
     """Handle file uploads, downloads, and storage"""
     
-    # Get project root directory (parent of src/)
-    PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    UPLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'uploads')
-    OUTPUT_FOLDER = os.path.join(PROJECT_ROOT, 'outputs')
+    # Working files converters read and write; point SCRATCH_DIR at a tmpfs
+    # such as /dev/shm to keep them off slow disks
+    UPLOAD_FOLDER = os.path.join(config.SCRATCH_DIR, 'uploads')
+    OUTPUT_FOLDER = os.path.join(config.SCRATCH_DIR, 'outputs')
     MAX_FILE_SIZE = 100 * 1024 * 1024  # 10MB
     
+    # Bytes under the storage folders: measured by the janitor on each sweep
+    # and bumped by every upload in between. Shared by preloaded workers
+    usage = multiprocessing.Value('q', 0)
+    
+    @staticmethod
+    def _sharded_path(folder, unique_id, filename):
+        """
+        Place a file in a subdirectory named after the first two hex digits
+        of its random id, so no directory grows past a few thousand entries
+        
+        Args:
+            folder (str): Storage folder
+            unique_id (str): Random hex id of the file
+            filename (str): File name inside the shard
+        
+        Returns:
+            str: Path to the file
+        """
+        shard = os.path.join(folder, unique_id[:2])
+        os.makedirs(shard, exist_ok=True)
+        return os.path.join(shard, filename)
+    
+    @staticmethod
+    def check_capacity(incoming=0):
+        """
+        Refuse new files when storage is over quota or the disk is nearly full
+        
+        Args:
+            incoming (int): Bytes about to be written
+        
+        Raises:
+            StorageFull: If the write must be refused
+        """
+        retry_after = max(1, config.JANITOR_INTERVAL)
+        quota = config.DISK_QUOTA_MB * 1024 * 1024
+        if quota and FileHandler.usage.value + incoming > quota:
+            metrics.UPLOADS_REJECTED.inc('storage_full')
+            raise StorageFull(f"Storage quota of {config.DISK_QUOTA_MB}MB reached", retry_after)
+        
+        os.makedirs(FileHandler.UPLOAD_FOLDER, exist_ok=True)
+        free = shutil.disk_usage(FileHandler.UPLOAD_FOLDER).free
+        if free - incoming < config.MIN_FREE_DISK_MB * 1024 * 1024:
+            metrics.UPLOADS_REJECTED.inc('disk_full')
+            raise StorageFull(f"Less than {config.MIN_FREE_DISK_MB}MB of disk space left", retry_after)
+    
     @staticmethod
     def allowed_file(filename, allowed_extensions):
         """
@@ -43,6 +106,7 @@ class FileHandler:
         
         Raises:
             ValueError: If file is not allowed or too large
+            StorageFull: If storage is over quota or the disk is nearly full
         """
         if not file:
             raise ValueError("No file provided")
@@ -51,27 +115,50 @@ class FileHandler:
             raise ValueError("Empty filename")
         
         if not FileHandler.allowed_file(file.filename, allowed_extensions):
+            metrics.UPLOADS_REJECTED.inc('file_type')
             raise ValueError(f"File type not allowed. Allowed: {', '.join(allowed_extensions)}")
         
+        FileHandler.check_capacity(file.content_length or 0)
+        
         # Generate unique filename
         original_filename = secure_filename(file.filename)
         file_extension = original_filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        
-        # Ensure upload directory exists
-        os.makedirs(FileHandler.UPLOAD_FOLDER, exist_ok=True)
         
         # Save file
-        file_path = os.path.join(FileHandler.UPLOAD_FOLDER, unique_filename)
+        file_path = FileHandler.get_upload_path(file_extension)
         file.save(file_path)
         
         # Check file size
-        if os.path.getsize(file_path) > FileHandler.MAX_FILE_SIZE:
+        file_size = os.path.getsize(file_path)
+        if file_size > FileHandler.MAX_FILE_SIZE:
             os.remove(file_path)
+            metrics.UPLOADS_REJECTED.inc('too_large')
             raise ValueError(f"File too large. Max size: {FileHandler.MAX_FILE_SIZE / 1024 / 1024}MB")
         
+        with FileHandler.usage.get_lock():
+            FileHandler.usage.value += file_size
+        
         return file_path, original_filename, file_extension
     
+    @staticmethod
+    def get_upload_path(file_extension):
+        """
+        Generate a path for an input that didn't arrive as its own upload
+        (e.g. extracted from an archive)
+        
+        Args:
+            file_extension (str): Extension of the input
+        
+        Returns:
+            str: Path to input file
+        """
+        unique_id = uuid.uuid4().hex
+        return FileHandler._sharded_path(
+            FileHandler.UPLOAD_FOLDER,
+            unique_id,
+            f"{unique_id}.{file_extension}"
+        )
+    
     @staticmethod
     def get_output_path(original_filename, output_extension):
         """
@@ -84,14 +171,15 @@ class FileHandler:
         Returns:
             str: Path to output file
         """
-        # Ensure output directory exists
-        os.makedirs(FileHandler.OUTPUT_FOLDER, exist_ok=True)
-        
         # Generate unique output filename
         base_name = os.path.splitext(secure_filename(original_filename))[0]
-        unique_filename = f"{base_name}_{uuid.uuid4()}.{output_extension}"
+        unique_id = uuid.uuid4().hex
         
-        return os.path.join(FileHandler.OUTPUT_FOLDER, unique_filename)
+        return FileHandler._sharded_path(
+            FileHandler.OUTPUT_FOLDER,
+            unique_id,
+            f"{base_name}_{unique_id}.{output_extension}"
+        )
     
     @staticmethod
     def cleanup_file(file_path):
@@ -105,7 +193,24 @@ class FileHandler:
             if os.path.exists(file_path):
                 os.remove(file_path)
         except Exception as e:
-            print(f"Error cleaning up file {file_path}: {e}")
+            logger.warning('Error cleaning up file %s: %s', file_path, e)
+    
+    @staticmethod
+    def file_hash(file_path):
+        """
+        SHA-256 of a file's content
+        
+        Args:
+            file_path (str): Path to file
+        
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
     
     @staticmethod
     def get_file_size(file_path):
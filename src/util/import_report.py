@@ -0,0 +1,71 @@
+"""
+Startup import report
+Summarises `python -X importtime` output per top-level package
+"""
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importtime_report(module='server', env=None):
+    """
+    Import a module in a fresh interpreter and measure what it pulls in
+
+    Args:
+        module (str): Module to import
+        env (dict): Extra environment variables for the child interpreter
+
+    Returns:
+        dict: total_ms (cumulative import time of the module) and packages,
+            a list of (package, self_ms, module_count) sorted by cost
+    """
+    child_env = dict(os.environ)
+    child_env['PYTHONPATH'] = os.pathsep.join(
+        path for path in (SRC_DIR, child_env.get('PYTHONPATH')) if path
+    )
+    child_env.update(env or {})
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC_DIR,
+        env=child_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    packages = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        package = name.split('.')[0]
+        self_total, count = packages.get(package, (0, 0))
+        packages[package] = (self_total + int(self_us), count + 1)
+        if name == module:
+            total_us = int(cumulative_us)
+
+    return {
+        'module': module,
+        'total_ms': total_us / 1000,
+        'packages': sorted(
+            ((package, self_us / 1000, count) for package, (self_us, count) in packages.items()),
+            key=lambda item: item[1],
+            reverse=True
+        )
+    }
+
+
+def format_report(report, limit=15):
+    """Render an importtime_report() result as a small table"""
+    lines = [f"import {report['module']}: {report['total_ms']:.1f}ms"]
+    lines.append(f"{'package':30s} {'self ms':>10s} {'modules':>8s}")
+    for package, self_ms, count in report['packages'][:limit]:
+        lines.append(f"{package:30s} {self_ms:10.1f} {count:8d}")
+    return '\n'.join(lines)
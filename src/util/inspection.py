@@ -0,0 +1,142 @@
+"""
+File inspection
+Reports type, dimensions and page or sheet counts from file headers and
+indexes only, plus the estimated time of each conversion the file allows.
+Header results are memoised per process by content hash, so clients that
+inspect the same file before converting it pay for one read.
+"""
+import collections
+import threading
+
+import config
+from converters.excel_converter import ExcelConverter
+from converters.image_converter import ImageConverter
+from converters.pdf_converter import DocumentConverter
+from converters.registry import get_registry
+from util import metrics
+from util.file_handler import FileHandler
+
+
+class InspectionCache:
+    """Thread-safe LRU of inspection results keyed by (sha256, extension)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+        return info
+
+    def put(self, key, info):
+        with self._lock:
+            self._entries[key] = info
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = InspectionCache(config.INSPECT_CACHE_SIZE)
+
+
+def read_headers(file_path, extension):
+    """
+    Type-specific details of a file, from its headers only
+
+    Args:
+        file_path (str): Path to the file
+        extension (str): Its format
+
+    Returns:
+        dict: type plus width/height, pages or sheets
+
+    Raises:
+        ValueError: If the file can't be read as `extension`
+    """
+    if extension in ('xlsx', 'xls'):
+        info = ExcelConverter.get_excel_info(file_path)
+        if 'error' in info:
+            raise ValueError(f"Could not read {extension} file: {info['error']}")
+        return {'type': 'spreadsheet', 'sheets': info['sheets'], 'sheet_count': info['sheet_count']}
+
+    try:
+        if extension in ImageConverter.SUPPORTED_FORMATS:
+            image = ImageConverter.get_image_info(file_path)
+            return {
+                'type': 'image',
+                'width': image['width'],
+                'height': image['height'],
+                'mode': image['mode'],
+                'animated': image['animated'],
+            }
+        if extension in ('pdf', 'docx'):
+            info = DocumentConverter.get_document_info(file_path, extension)
+            info.pop('size')
+            info.pop('format')
+            return dict(info, type='document')
+    except Exception as e:
+        raise ValueError(f"Could not read {extension} file: {e}")
+
+    raise ValueError(f"Can't inspect {extension} files")
+
+
+def estimate_conversions(extension, size):
+    """
+    Estimated seconds for every format the file can be converted to, from
+    the current (observed where available) edge costs
+
+    Returns:
+        dict: Target format -> estimated seconds
+    """
+    registry = get_registry()
+    size_mb = max(size, registry.MIN_COST_SIZE) / (1024 * 1024)
+    estimates = {}
+    for target in registry.formats():
+        if target == extension:
+            continue
+        try:
+            path = registry.find_path(extension, target)
+        except ValueError:
+            continue
+        estimates[target] = round(sum(edge.cost for edge in path) * size_mb, 3)
+    return estimates
+
+
+def inspect_file(file_path, extension):
+    """
+    Inspect an uploaded file
+
+    Args:
+        file_path (str): Path to the file
+        extension (str): Its format
+
+    Returns:
+        dict: format, size, sha256, type-specific details and
+            estimated_seconds per target format
+
+    Raises:
+        ValueError: If the file can't be read as `extension`
+    """
+    digest = FileHandler.file_hash(file_path)
+    key = (digest, extension)
+    details = _cache.get(key)
+    if details is None:
+        metrics.cache_miss('inspect')
+        details = read_headers(file_path, extension)
+        _cache.put(key, details)
+    else:
+        metrics.cache_hit('inspect')
+
+    size = FileHandler.get_file_size(file_path)
+    return dict(
+        details,
+        format=extension,
+        size=size,
+        sha256=digest,
+        # Costs move as timings come in, so they aren't memoised
+        estimated_seconds=estimate_conversions(extension, size)
+    )
@@ -0,0 +1,375 @@
+"""
+Isolated conversion runner
+Runs each conversion in a child process with wall-clock, CPU and memory
+limits, and kills it when a limit is hit or the client goes away
+"""
+import cProfile
+import math
+import multiprocessing
+import os
+import resource
+import select
+import signal
+import socket
+import time
+
+import config
+from util import log, progress, timing
+
+
+class ConversionError(Exception):
+    """A conversion failed inside the isolated child"""
+
+    code = 'conversion_failed'
+    status = 500
+
+
+class ConversionTimeout(ConversionError):
+    """The conversion ran past CONVERSION_TIMEOUT"""
+
+    code = 'conversion_timeout'
+    status = 504
+
+
+class ConversionMemoryExceeded(ConversionError):
+    """The conversion needed more than CONVERSION_MEMORY_LIMIT_MB"""
+
+    code = 'conversion_memory_limit'
+    status = 422
+
+
+class ConversionCancelled(ConversionError):
+    """The client disconnected before the conversion finished"""
+
+    code = 'client_disconnected'
+    # nginx's convention; the client is gone so nobody reads it anyway
+    status = 499
+
+
+# How often the parent checks for limits and client disconnects
+POLL_INTERVAL = 0.1
+# How often a follower looks for newly written output
+FOLLOW_INTERVAL = 0.02
+
+_forkserver_preload_set = False
+
+
+def _get_context():
+    """
+    The multiprocessing context children start from. The fork server is
+    told on first use to import the converters (and, under the prewarm
+    import policy, their libraries) once, so children forked from it start
+    with them loaded
+    """
+    global _forkserver_preload_set
+    context = multiprocessing.get_context(config.CONVERSION_START_METHOD)
+    if context.get_start_method() == 'forkserver' and not _forkserver_preload_set:
+        from converters.registry import get_registry
+        from util.lazy_import import module_names
+        # Declares the lazy modules
+        get_registry()
+        preload = ['converters.registry']
+        if config.IMPORT_POLICY == 'prewarm':
+            preload.extend(module_names())
+        context.set_forkserver_preload(preload)
+        _forkserver_preload_set = True
+    return context
+
+
+def client_disconnected(environ):
+    """
+    Check whether the client behind a WSGI request has closed its connection
+
+    Works when the server exposes the connection socket (gunicorn) or a
+    disconnect check (the ASGI adapter), otherwise always reports the client
+    as connected.
+
+    Args:
+        environ (dict): WSGI environ of the request
+
+    Returns:
+        bool: True if the peer closed the connection
+    """
+    check = environ.get('filea.client_disconnected')
+    if check is not None:
+        return check()
+    sock = environ.get('gunicorn.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        # A readable socket with nothing to peek at has reached EOF
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
+
+
+def _apply_limits(memory_limit_mb, timeout):
+    """Set resource limits in the child before converting"""
+    # Own process group, so killing it also takes tabula's JVM with it
+    os.setpgrp()
+
+    if memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        # RLIMIT_DATA tracks heap and anonymous mappings on Linux, which is
+        # close to RSS without tripping over the JVM's address space reservation
+        rlimit = getattr(resource, 'RLIMIT_DATA', resource.RLIMIT_AS)
+        resource.setrlimit(rlimit, (limit, limit))
+
+    if timeout:
+        # Backstop in case the parent dies: SIGXCPU at the soft limit
+        cpu_seconds = int(math.ceil(timeout)) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+
+
+def _child_main(conn, from_format, to_format, input_path, output_path, options, memory_limit_mb,
+                timeout, profile_path, track_progress):
+    """Entry point of the conversion child process"""
+    try:
+        _apply_limits(memory_limit_mb, timeout)
+
+        # A forked child inherits the parent's tracker, which writes files
+        progress.finish()
+        if track_progress:
+            progress.start(sink=lambda state: conn.send(('progress', state)))
+
+        from converters.registry import get_registry
+        edge = get_registry().get_edge(from_format, to_format)
+
+        # Converter stages are timed here and reported back to the request
+        timing.start()
+        if profile_path:
+            profiler = cProfile.Profile()
+            profiler.runcall(edge.func, input_path, output_path, **options)
+            profiler.dump_stats(profile_path)
+        else:
+            edge.func(input_path, output_path, **options)
+        conn.send(('ok', timing.snapshot()))
+    except MemoryError:
+        conn.send(('memory', None))
+    except ValueError as e:
+        conn.send(('invalid', str(e)))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+        # multiprocessing exits without running atexit handlers
+        log.stop()
+
+
+def _receive(conn, tracker):
+    """
+    Read one message from the child, passing progress updates on
+
+    Returns:
+        tuple: The child's final (status, detail), or None for a progress
+            update; ('eof', None) if the pipe closed without one
+    """
+    try:
+        message = conn.recv()
+    except EOFError:
+        return 'eof', None
+    if message[0] != 'progress':
+        return message
+    if tracker is not None:
+        # Already throttled in the child
+        tracker.publish(**message[1])
+    return None
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _kill(process):
+    """Kill the child and everything it started"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+    process.join()
+
+
+class EdgeProcess:
+    """
+    A conversion edge running in an isolated child process, watched by
+    the caller through poll()
+    """
+
+    def __init__(self, edge, input_path, output_path, cancelled=None, options=None):
+        """
+        Args:
+            edge (ConversionEdge): Edge to run
+            input_path (str): Path to the input file
+            output_path (str): Path for the output file
+            cancelled (callable): Returns True once the result is no longer
+                wanted (e.g. the client disconnected), optional
+            options (dict): Keyword arguments for the edge's func, optional
+        """
+        self.output_path = output_path
+        self.cancelled = cancelled
+        self.message = None
+        self.finished = False
+        # Captured here: poll() may be called from another thread
+        self.tracker = progress.current()
+        timer = timing.current()
+        profile_path = timer.profile_path(edge.name) if timer else None
+
+        self.timeout = config.CONVERSION_TIMEOUT
+        context = _get_context()
+        self._conn, child_conn = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_child_main,
+            args=(child_conn, edge.from_format, edge.to_format, input_path, output_path, options or {},
+                  config.CONVERSION_MEMORY_LIMIT_MB, self.timeout, profile_path, self.tracker is not None),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.deadline = time.monotonic() + self.timeout if self.timeout else None
+
+    def poll(self, timeout=POLL_INTERVAL):
+        """
+        Wait up to `timeout` seconds for the child to finish, enforcing the
+        limits meanwhile
+
+        Returns:
+            bool: True once the child has finished
+
+        Raises:
+            ConversionTimeout, ConversionCancelled: If the child was killed
+        """
+        if self.finished:
+            return True
+        try:
+            if self._conn.poll(timeout):
+                self.message = _receive(self._conn, self.tracker)
+                if self.message is not None:
+                    return self._finish()
+            if not self.process.is_alive():
+                # It may have reported just before exiting
+                while self.message is None and self._conn.poll():
+                    self.message = _receive(self._conn, self.tracker)
+                return self._finish()
+            if self.tracker is not None:
+                self.tracker.update(bytes_written=_file_size(self.output_path))
+            if self.deadline and time.monotonic() > self.deadline:
+                self.kill()
+                raise ConversionTimeout(f"Conversion exceeded {self.timeout:.0f}s")
+            if self.cancelled and self.cancelled():
+                self.kill()
+                raise ConversionCancelled('Client disconnected')
+        except BaseException:
+            self._conn.close()
+            raise
+        return False
+
+    def _finish(self):
+        self.finished = True
+        self._conn.close()
+        self.process.join()
+        return True
+
+    def kill(self):
+        """Stop the child if it is still running"""
+        if not self.finished:
+            self.finished = True
+            _kill(self.process)
+
+    def result(self):
+        """
+        The outcome of a finished child
+
+        Returns:
+            str: Path to the output file
+
+        Raises:
+            ValueError: If the converter rejected the input
+            ConversionMemoryExceeded, ConversionError: If the child failed
+        """
+        message = self.message
+        if message is None or message[0] == 'eof':
+            # Died without reporting back: killed by a limit or crashed
+            if self.process.exitcode == -signal.SIGXCPU:
+                raise ConversionTimeout(f"Conversion exceeded {self.timeout:.0f}s of CPU time")
+            if self.process.exitcode == -signal.SIGKILL:
+                raise ConversionMemoryExceeded('Conversion process was killed, likely out of memory')
+            raise ConversionError(f"Conversion process exited with code {self.process.exitcode}")
+
+        status, detail = message
+        if status == 'memory':
+            raise ConversionMemoryExceeded(
+                f"Conversion exceeded {config.CONVERSION_MEMORY_LIMIT_MB}MB memory limit"
+            )
+        if status == 'invalid':
+            raise ValueError(detail)
+        if status == 'error':
+            raise ConversionError(detail)
+        timing.merge(detail)
+        return self.output_path
+
+    def follow(self, chunk_size=64 * 1024):
+        """
+        Yield the output file's bytes while the child is still writing it.
+        Only for converters that write their output front to back, never
+        seeking back to rewrite it
+
+        Yields:
+            bytes: The next part of the output
+
+        Raises:
+            ConversionError (or a subclass), ValueError: If the child
+                failed, after the bytes written so far
+        """
+        try:
+            with open(self.output_path, 'rb') as f:
+                while True:
+                    data = f.read(chunk_size)
+                    if data:
+                        yield data
+                    elif self.finished:
+                        break
+                    else:
+                        self.poll(FOLLOW_INTERVAL)
+            self.result()
+        finally:
+            self.kill()
+
+
+def run_edge(edge, input_path, output_path, cancelled=None, options=None):
+    """
+    Run one conversion edge in an isolated child process
+
+    Args:
+        edge (ConversionEdge): Edge to run
+        input_path (str): Path to the input file
+        output_path (str): Path for the output file
+        cancelled (callable): Returns True once the result is no longer
+            wanted (e.g. the client disconnected), optional
+        options (dict): Keyword arguments for the edge's func, optional
+
+    Returns:
+        str: Path to the output file
+
+    Raises:
+        ValueError: If the converter rejected the input
+        ConversionTimeout, ConversionMemoryExceeded, ConversionCancelled,
+        ConversionError: If the child failed or was killed
+    """
+    progress.begin(edge.name)
+    options = options or {}
+    if not config.CONVERSION_ISOLATION:
+        edge.func(input_path, output_path, **options)
+        return output_path
+
+    child = EdgeProcess(edge, input_path, output_path, cancelled, options)
+    while not child.poll():
+        pass
+    return child.result()
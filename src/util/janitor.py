@@ -0,0 +1,167 @@
+"""
+Storage janitor
+A background thread removes uploads and outputs left behind by crashed or
+killed requests, expired results and, above the disk quota, the oldest
+results. Every worker runs one, but a file lock lets only one sweep at a
+time.
+"""
+import fcntl
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+
+import config
+from storage import get_storage
+from util import metrics, progress
+from util.file_handler import FileHandler
+from util.result_store import ResultStore
+
+logger = logging.getLogger(__name__)
+
+# Totals across workers (created before gunicorn forks them)
+_reclaimed = multiprocessing.Value('q', 0)
+_last_sweep = multiprocessing.Value('d', 0)
+
+_thread = None
+
+
+def _walk_files(folder):
+    """Yield (path, size, mtime) for every file under a storage folder"""
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.startswith('.'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def sweep(now=None):
+    """
+    Remove orphans, expired results and, over quota, the oldest results
+
+    Args:
+        now (float): Current time, for tests
+
+    Returns:
+        dict: Bytes reclaimed per reason and the storage usage left, or
+            None if another process is sweeping
+    """
+    now = time.time() if now is None else now
+    os.makedirs(FileHandler.UPLOAD_FOLDER, exist_ok=True)
+    with open(os.path.join(FileHandler.UPLOAD_FOLDER, '.janitor.lock'), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        reclaimed = {'orphan': 0, 'expired': 0, 'quota': 0}
+        usage = 0
+
+        # Uploads, outputs and progress only live as long as a request
+        for folder in (FileHandler.UPLOAD_FOLDER, FileHandler.OUTPUT_FOLDER, progress.PROGRESS_FOLDER):
+            for path, size, mtime in _walk_files(folder):
+                if mtime < now - config.ORPHAN_TTL and _remove(path):
+                    reclaimed['orphan'] += size
+                else:
+                    usage += size
+
+        # Results on tmpfs or object storage don't use the disk the quota guards
+        on_disk = get_storage().on_disk
+        results = []
+        for result_id, size, mtime, expires in ResultStore.list_results():
+            if expires < now:
+                ResultStore.delete(result_id)
+                reclaimed['expired'] += size
+            elif on_disk:
+                results.append((mtime, result_id, size))
+                usage += size
+
+        # Results can be converted again, so they go first when over quota
+        quota = config.DISK_QUOTA_MB * 1024 * 1024
+        if quota and usage > quota:
+            for _, result_id, size in sorted(results):
+                if usage <= quota:
+                    break
+                ResultStore.delete(result_id)
+                reclaimed['quota'] += size
+                usage -= size
+
+    FileHandler.usage.value = usage
+    _last_sweep.value = now
+    total = sum(reclaimed.values())
+    with _reclaimed.get_lock():
+        _reclaimed.value += total
+    for reason, amount in reclaimed.items():
+        if amount:
+            metrics.STORAGE_RECLAIMED_BYTES.inc(reason, amount=amount)
+    if total:
+        logger.info(
+            'Janitor reclaimed %.1fMB (orphan %d, expired %d, quota %d bytes), %.1fMB in use',
+            total / 1024 / 1024, reclaimed['orphan'], reclaimed['expired'], reclaimed['quota'],
+            usage / 1024 / 1024
+        )
+    return dict(reclaimed, usage=usage)
+
+
+class Janitor(threading.Thread):
+    """Daemon thread running sweep() every `interval` seconds"""
+
+    def __init__(self, interval):
+        super().__init__(name='storage-janitor', daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                sweep()
+            except Exception:
+                logger.exception('Storage janitor sweep failed')
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start():
+    """
+    Start the janitor in this process, unless disabled or already running
+    (threads don't survive fork, so each gunicorn worker calls this)
+    """
+    global _thread
+    if config.JANITOR_INTERVAL <= 0 or (_thread is not None and _thread.is_alive()):
+        return _thread
+    _thread = Janitor(config.JANITOR_INTERVAL)
+    _thread.start()
+    return _thread
+
+
+def stats():
+    """
+    Storage usage for the health endpoint
+
+    Returns:
+        dict: usage_bytes, quota_bytes, free_bytes, reclaimed_bytes, last_sweep
+    """
+    os.makedirs(FileHandler.UPLOAD_FOLDER, exist_ok=True)
+    return {
+        'usage_bytes': FileHandler.usage.value,
+        'quota_bytes': config.DISK_QUOTA_MB * 1024 * 1024,
+        'free_bytes': shutil.disk_usage(FileHandler.UPLOAD_FOLDER).free,
+        'reclaimed_bytes': _reclaimed.value,
+        'last_sweep': _last_sweep.value,
+    }
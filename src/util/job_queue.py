@@ -0,0 +1,314 @@
+"""
+MongoDB job queue for conversions
+Any node can enqueue a conversion; workers on any node claim jobs with an
+atomic findAndModify that sets a lease. A worker renews its lease with a
+heartbeat while converting; when a worker dies its lease expires and the
+job is claimed again, up to JOB_MAX_ATTEMPTS times. Inputs and results go
+through the storage backend, which must be shared (s3) across nodes.
+"""
+import datetime
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from bson import ObjectId
+from mongoengine.queryset.visitor import Q
+
+import config
+from converters.registry import get_registry
+from model.conversion_job import ConversionJob
+from storage import get_storage
+from util import admission, isolation, progress
+from util.file_handler import FileHandler
+from util.result_store import ResultStore
+
+logger = logging.getLogger(__name__)
+
+
+def job_priority(path):
+    """
+    Priority of a conversion path: that of its slowest converter, so heavy
+    jobs don't hold up quick ones
+
+    Args:
+        path (list): ConversionEdge objects from find_path()
+
+    Returns:
+        int: Priority (higher is claimed first)
+    """
+    return min(config.JOB_PRIORITY.get(edge.name, 0) for edge in path)
+
+
+def enqueue(input_path, from_format, to_format, download_name):
+    """
+    Store an upload and queue its conversion
+
+    Args:
+        input_path (str): Uploaded file (handed to the storage backend)
+        from_format (str): Input format
+        to_format (str): Target format
+        download_name (str): Filename offered for the result
+
+    Returns:
+        ConversionJob: The queued job
+
+    Raises:
+        ValueError: If no conversion path exists
+    """
+    path = get_registry().find_path(from_format, to_format)
+    input_key = f"jobs/{uuid.uuid4().hex}.{from_format}"
+    get_storage().put(input_key, input_path)
+    return ConversionJob(
+        priority=job_priority(path),
+        from_format=from_format,
+        to_format=to_format,
+        input_key=input_key,
+        download_name=download_name,
+        progress={'status': 'queued', 'updated': time.time()}
+    ).save()
+
+
+def write_progress(job_id, state):
+    """Progress sink for a job: keeps the state on its document"""
+    ConversionJob.objects(id=job_id).update_one(set__progress=dict(state, updated=time.time()))
+
+
+def read_progress(job_id):
+    """
+    A job's latest progress state, readable from any node
+
+    Returns:
+        dict: The state, or None if there is no such job
+    """
+    if not ObjectId.is_valid(job_id):
+        return None
+    job = ConversionJob.objects(id=job_id).only('progress').first()
+    if job is None or not job.progress:
+        return None
+    return job.progress
+
+
+def claim(worker_id, lease_seconds=None):
+    """
+    Atomically lease the best waiting job, including jobs whose previous
+    worker stopped heartbeating
+
+    Args:
+        worker_id (str): Identifies the claiming worker
+        lease_seconds (float): Lease length, JOB_LEASE_SECONDS by default
+
+    Returns:
+        ConversionJob: The leased job, or None if there is none
+    """
+    now = datetime.datetime.utcnow()
+    lease = datetime.timedelta(seconds=lease_seconds or config.JOB_LEASE_SECONDS)
+    claimable = (
+        (Q(status=ConversionJob.QUEUED) & (Q(not_before=None) | Q(not_before__lte=now))) |
+        Q(status=ConversionJob.RUNNING, lease_expires__lt=now)
+    ) & Q(attempts__lt=config.JOB_MAX_ATTEMPTS)
+    return ConversionJob.objects(claimable).order_by('-priority', 'created_at').modify(
+        new=True,
+        set__status=ConversionJob.RUNNING,
+        set__lease_owner=worker_id,
+        set__lease_expires=now + lease,
+        set__heartbeat_at=now,
+        inc__attempts=1
+    )
+
+
+def heartbeat(job, worker_id, lease_seconds=None):
+    """
+    Extend a lease
+
+    Returns:
+        bool: False if the lease was lost (expired and claimed elsewhere)
+    """
+    now = datetime.datetime.utcnow()
+    lease = datetime.timedelta(seconds=lease_seconds or config.JOB_LEASE_SECONDS)
+    return bool(ConversionJob.objects(
+        id=job.id, status=ConversionJob.RUNNING, lease_owner=worker_id
+    ).update_one(set__lease_expires=now + lease, set__heartbeat_at=now))
+
+
+def complete(job, worker_id, result_id):
+    """Mark a leased job done; ignored if the lease was lost meanwhile"""
+    updated = ConversionJob.objects(
+        id=job.id, status=ConversionJob.RUNNING, lease_owner=worker_id
+    ).update_one(
+        set__status=ConversionJob.DONE,
+        set__result_id=result_id,
+        set__finished_at=datetime.datetime.utcnow(),
+        unset__lease_expires=True
+    )
+    if updated:
+        get_storage().delete(job.input_key)
+    return bool(updated)
+
+
+def fail(job, worker_id, error, code, retry=True):
+    """
+    Record a failed attempt: requeue it, or fail the job for good when it
+    can't succeed or has used all its attempts
+
+    Returns:
+        str: The job's new status, or None if the lease was lost
+    """
+    final = not retry or job.attempts >= config.JOB_MAX_ATTEMPTS
+    status = ConversionJob.FAILED if final else ConversionJob.QUEUED
+    updated = ConversionJob.objects(
+        id=job.id, status=ConversionJob.RUNNING, lease_owner=worker_id
+    ).update_one(
+        set__status=status,
+        set__error=error,
+        set__error_code=code,
+        set__finished_at=datetime.datetime.utcnow() if final else None,
+        unset__lease_expires=True
+    )
+    if updated and final:
+        get_storage().delete(job.input_key)
+    return status if updated else None
+
+
+def release(job, worker_id, delay=0):
+    """
+    Give a job back to the queue without counting the attempt
+
+    Args:
+        delay (float): Seconds before any worker may claim it again
+    """
+    return bool(ConversionJob.objects(
+        id=job.id, status=ConversionJob.RUNNING, lease_owner=worker_id
+    ).update_one(
+        set__status=ConversionJob.QUEUED,
+        set__not_before=datetime.datetime.utcnow() + datetime.timedelta(seconds=delay),
+        unset__lease_expires=True,
+        dec__attempts=1
+    ))
+
+
+def reap():
+    """
+    Fail jobs whose last allowed attempt lost its lease
+
+    Returns:
+        int: Jobs failed
+    """
+    now = datetime.datetime.utcnow()
+    stale = ConversionJob.objects(
+        status=ConversionJob.RUNNING,
+        lease_expires__lt=now,
+        attempts__gte=config.JOB_MAX_ATTEMPTS
+    )
+    count = 0
+    for job in stale:
+        count += ConversionJob.objects(id=job.id, status=ConversionJob.RUNNING, lease_expires__lt=now).update_one(
+            set__status=ConversionJob.FAILED,
+            set__error='Worker lease expired on the last attempt',
+            set__error_code='lease_expired',
+            set__finished_at=now
+        )
+        get_storage().delete(job.input_key)
+    return count
+
+
+def run_job(job, worker_id):
+    """Convert a leased job, heartbeating until it finishes"""
+    lease_lost = threading.Event()
+    finished = threading.Event()
+
+    def keep_alive():
+        while not finished.wait(config.JOB_HEARTBEAT_INTERVAL):
+            if not heartbeat(job, worker_id):
+                logger.warning('Lost the lease on job %s', job.id)
+                lease_lost.set()
+                return
+
+    heartbeat_thread = threading.Thread(target=keep_alive, name=f'heartbeat-{job.id}', daemon=True)
+    heartbeat_thread.start()
+
+    registry = get_registry()
+    output_path = FileHandler.get_output_path(job.download_name, job.to_format)
+    # Followed at /api/progress/<job id>, from whichever node serves it
+    progress.start(sink=functools.partial(write_progress, job.id))
+    try:
+        with get_storage().fetch(job.input_key) as input_path:
+            registry.run_path(
+                registry.find_path(job.from_format, job.to_format),
+                input_path,
+                output_path,
+                lambda fmt: FileHandler.get_output_path(job.download_name, fmt),
+                admit=admission.admit,
+                runner=lambda edge, edge_input, edge_output: isolation.run_edge(
+                    edge, edge_input, edge_output, cancelled=lease_lost.is_set
+                )
+            )
+        result = ResultStore.save(output_path, job.download_name)
+        if complete(job, worker_id, result['id']):
+            progress.finish(status='done', result_id=result['id'], size=result['size'])
+    except isolation.ConversionCancelled:
+        # Another worker holds the job now, and reports its progress
+        progress.finish()
+    except admission.ConverterBusy as e:
+        # This process is saturated; let another worker take it, once the
+        # converter may have a slot, rather than claiming it straight back
+        release(job, worker_id, delay=e.retry_after)
+        progress.finish(status='queued')
+    except isolation.ConversionError as e:
+        # Timeouts and memory limits would hit again on retry
+        _fail(job, worker_id, str(e), e.code, retry=type(e) is isolation.ConversionError)
+    except (ValueError, FileNotFoundError) as e:
+        _fail(job, worker_id, str(e), 'invalid_request', retry=False)
+    except Exception as e:
+        logger.exception('Job %s failed', job.id)
+        _fail(job, worker_id, str(e), 'conversion_failed')
+    finally:
+        progress.finish()
+        finished.set()
+        FileHandler.cleanup_file(output_path)
+
+
+def _fail(job, worker_id, error, code, retry=True):
+    """fail() a job and report whether it will be retried"""
+    status = fail(job, worker_id, error, code, retry)
+    if status is not None:
+        progress.finish(status=status, code=code, error=error)
+
+
+def run_worker(threads=1, stop=None):
+    """
+    Claim and run jobs until `stop` is set
+
+    Args:
+        threads (int): Jobs run concurrently by this process
+        stop (threading.Event): Ends the loop once set, optional
+    """
+    stop = stop or threading.Event()
+    hostname = socket.gethostname()
+
+    def loop(index):
+        worker_id = f"{hostname}:{os.getpid()}:{index}"
+        while not stop.is_set():
+            job = claim(worker_id)
+            if job is None:
+                reap()
+                stop.wait(config.JOB_POLL_INTERVAL)
+                continue
+            logger.info('Worker %s running job %s (%s -> %s, attempt %d)',
+                        worker_id, job.id, job.from_format, job.to_format, job.attempts)
+            run_job(job, worker_id)
+
+    workers = [threading.Thread(target=loop, args=(index,), name=f'job-worker-{index}') for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(timeout=1)
+    except KeyboardInterrupt:
+        stop.set()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,115 @@
+"""
+Lazy module imports
+Heavy conversion libraries are only imported on first use, unless the
+process prewarms them before accepting traffic
+"""
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_lazy_modules = []
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name, plugins=()):
+        """
+        Args:
+            name (str): Dotted module name
+            plugins (tuple): Modules imported alongside it for their side
+                effects (e.g. Pillow format plugins)
+        """
+        self._name = name
+        self._plugins = tuple(plugins)
+        self._module = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        """Import the module (and its plugins) if not imported yet"""
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    for plugin in self._plugins:
+                        importlib.import_module(plugin)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name, plugins=()):
+    """
+    Declare a module to be imported on first use
+
+    Args:
+        name (str): Dotted module name
+        plugins (tuple): Modules to import together with it
+
+    Returns:
+        LazyModule: Proxy for the module
+    """
+    module = LazyModule(name, plugins)
+    _lazy_modules.append(module)
+    return module
+
+
+def module_names():
+    """
+    Names of every declared lazy module and its plugins
+
+    Returns:
+        list: Dotted module names, in declaration order
+    """
+    names = []
+    for module in _lazy_modules:
+        names.append(module._name)
+        names.extend(module._plugins)
+    return names
+
+
+def prewarm():
+    """
+    Import every declared lazy module now
+
+    Modules shared between libraries are charged to whichever imports
+    them first, so the per-module times add up to the total.
+
+    Returns:
+        list: (module name, seconds) tuples in import order
+    """
+    # Declarations happen when the converter modules are imported
+    import converters.image_converter  # noqa: F401
+    import converters.pdf_converter  # noqa: F401
+    import converters.excel_converter  # noqa: F401
+
+    timings = []
+    for module in list(_lazy_modules):
+        if module.loaded:
+            continue
+        started = time.perf_counter()
+        try:
+            module.load()
+        except ImportError as e:
+            logger.warning('Could not prewarm %s: %s', module._name, e)
+            continue
+        timings.append((module._name, time.perf_counter() - started))
+
+    total = sum(seconds for _, seconds in timings)
+    logger.info('Prewarmed %d modules in %.2fs: %s', len(timings), total, ', '.join(
+        f'{name}={seconds * 1000:.0f}ms' for name, seconds in timings
+    ))
+    return timings
@@ -0,0 +1,203 @@
+"""
+Structured, non-blocking logging
+Records are put on an in-memory queue by the thread that logs them and
+written by a listener thread, so request threads never wait on console or
+file I/O; when the queue is full, records are dropped and counted instead.
+Each record is one JSON object carrying the request id of the request that
+logged it. Per-request success logs are sampled at LOG_SAMPLE_RATE;
+warnings and errors are always kept.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from util import metrics
+
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,128}$')
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+TEXT_FORMAT = '%(levelname)s: %(asctime)s pid:%(process)s module:%(module)s %(message)s'
+
+_local = threading.local()
+_listener = None
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: the standard fields plus any extras"""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and name != 'sampled' and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records logged with `extra={'sampled': True}`"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that tags records with the current request id, renders
+    them in the logging thread (arguments may change once it moves on) and
+    drops them rather than block when the queue is full
+    """
+
+    def prepare(self, record):
+        # Other handlers of the same record (e.g. page progress) see the original
+        record = copy.copy(record)
+        request_id = getattr(_local, 'request_id', None)
+        if request_id is not None and not hasattr(record, 'request_id'):
+            record.request_id = request_id
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+
+def setup(level, log_format='json', sample_rate=1.0, queue_size=10000, stream=None):
+    """
+    Route all logging through the queue to a stream (stderr by default)
+
+    Args:
+        level (str): Lowest level written, e.g. 'INFO'
+        log_format (str): 'json', or 'text' for the classic one-line format
+        sample_rate (float): Fraction of sampled records kept
+        queue_size (int): Records held before new ones are dropped
+        stream: File object to write to
+    """
+    global _listener, _handler
+    stop()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if log_format == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt='%d/%m/%y %H:%M:%S'))
+
+    _handler = RequestQueueHandler(queue.Queue(queue_size))
+    _handler.setLevel(level)
+    _handler.addFilter(SamplingFilter(sample_rate))
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    # Converters' INFO lines still reach in-process handlers such as
+    # page progress; the queue handler filters by `level`
+    root.setLevel(min(logging.getLevelName(level.upper()), logging.INFO))
+    _listener.start()
+
+
+def stop():
+    """Write out queued records and stop the listener thread"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_after_fork():
+    # The listener thread doesn't survive fork, and the queue's lock may
+    # have been held by a thread that no longer exists
+    if _listener is None:
+        return
+    _handler.queue = _listener.queue = queue.Queue(_handler.queue.maxsize)
+    _listener._thread = None
+    _listener.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(stop)
+
+
+def start_request(request_id=None):
+    """
+    Begin a request on the current thread
+
+    Args:
+        request_id (str): The client's id for it, if acceptable
+
+    Returns:
+        str: The request id used
+    """
+    if not request_id or not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex
+    _local.request_id = request_id
+    _local.started = time.perf_counter()
+    _local.fields = {}
+    return request_id
+
+
+def request_id():
+    """The current request's id, None outside a request"""
+    return getattr(_local, 'request_id', None)
+
+
+def annotate(**fields):
+    """Add fields to the current request's log record"""
+    fields_so_far = getattr(_local, 'fields', None)
+    if fields_so_far is not None:
+        fields_so_far.update(fields)
+
+
+def finish_request(logger, status, **fields):
+    """
+    Log the end of the current request: sampled when it succeeded, a
+    warning or error when it didn't
+
+    Args:
+        logger (logging.Logger): Logger to write to
+        status (int): Response status
+        fields: Extra fields, e.g. method and path
+    """
+    started = getattr(_local, 'started', None)
+    if started is None:
+        return
+    entry = dict(getattr(_local, 'fields', {}), **fields)
+    entry.update(status=status, duration_ms=round((time.perf_counter() - started) * 1000, 1), sampled=True)
+    level = logging.ERROR if status >= 500 else logging.WARNING if status >= 400 else logging.INFO
+    logger.log(level, '%s %s %s', fields.get('method', ''), fields.get('path', ''), status, extra=entry)
+    _local.request_id = _local.started = _local.fields = None
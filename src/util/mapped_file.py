@@ -0,0 +1,62 @@
+"""
+Memory-mapped inputs
+A conversion maps its input once and hands the same read-only buffer to
+every reader, instead of each opening the path and reading it again. The
+kernel serves the pages from the page cache, and nested users on one
+thread share the outer mapping. Libraries that only take bytes (PyMuPDF
+1.23, and pdf2docx on top of it) get one copy of the buffer to share.
+"""
+import contextlib
+import mmap
+import os
+import threading
+
+_local = threading.local()
+
+
+class MappedFile:
+    """A whole file mapped read-only"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            # The mapping stays valid after the descriptor is closed
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.buffer = memoryview(self._mmap)
+        self.users = 0
+
+    def close(self):
+        self.buffer.release()
+        self._mmap.close()
+
+
+@contextlib.contextmanager
+def mapped(path):
+    """
+    Map a file for the duration of the block. Documents opened on the
+    buffer must be closed inside the block: their memory goes away with it
+
+    Args:
+        path (str): File to map
+
+    Yields:
+        memoryview: The file's bytes
+
+    Raises:
+        ValueError: If the file is empty
+    """
+    files = getattr(_local, 'files', None)
+    if files is None:
+        files = _local.files = {}
+    key = os.path.realpath(path)
+    mapped_file = files.get(key)
+    if mapped_file is None:
+        mapped_file = files[key] = MappedFile(path)
+    mapped_file.users += 1
+    try:
+        yield mapped_file.buffer
+    finally:
+        mapped_file.users -= 1
+        if not mapped_file.users:
+            del files[key]
+            mapped_file.close()
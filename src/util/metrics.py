@@ -0,0 +1,289 @@
+"""
+Prometheus metrics
+Each thread updates its own shard of plain lists, so recording a value
+takes no lock and allocates nothing once a label set has been seen. The
+shards are summed when /api/metrics is scraped. When a thread ends, its
+shard is folded into one shared total, so short-lived threads (batch and
+ASGI pools) don't leave shards behind. Values are per process; with several
+gunicorn workers, each worker reports its own.
+"""
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from quick image encodes to long PDF parses
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_local = threading.local()
+_shards = []
+# Values of threads that have ended, keyed like a shard
+_retired = {}
+# Reentrant: a shard may be retired by whichever thread drops the last
+# reference to its thread's locals
+_shards_lock = threading.RLock()
+_metrics = []
+_collectors = []
+
+
+class _ShardOwner:
+    """Lives in a thread's locals, so it is freed when the thread ends"""
+
+
+def _add_values(totals, key, values):
+    total = totals.get(key)
+    if total is None:
+        totals[key] = list(values)
+    else:
+        for index, value in enumerate(values):
+            total[index] += value
+
+
+def _retire(values):
+    """Fold an ended thread's shard into the shared total"""
+    with _shards_lock:
+        _shards.remove(values)
+        for key, item in values.items():
+            _add_values(_retired, key, item)
+
+
+def _shard():
+    """Return the calling thread's value store, creating it once per thread"""
+    try:
+        return _local.values
+    except AttributeError:
+        values = _local.values = {}
+        _local.owner = _ShardOwner()
+        weakref.finalize(_local.owner, _retire, values)
+        with _shards_lock:
+            _shards.append(values)
+        return values
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class holding the name, help text and label names of a metric"""
+
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _metrics.append(self)
+
+    def _collect(self):
+        """Sum the values of every thread for this metric, keyed by label values"""
+        totals = {}
+        with _shards_lock:
+            shards = list(_shards)
+            for (metric, labels), values in _retired.items():
+                if metric is self:
+                    totals[labels] = list(values)
+        for shard in shards:
+            # Copy first: the owning thread may add keys while we read
+            for (metric, labels), values in list(shard.items()):
+                if metric is self:
+                    _add_values(totals, labels, values)
+        return totals
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, values in sorted(self._collect().items()):
+            lines.extend(self._render_values(labels, values))
+        return lines
+
+    def _render_values(self, labels, values):
+        return [f"{self.name}{_format_labels(self.labels, labels)} {_format_value(values[0])}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = _shard()
+        key = (self, labels)
+        values = shard.get(key)
+        if values is None:
+            shard[key] = [amount]
+        else:
+            values[0] += amount
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    type = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels):
+        """Increment for the duration of a block"""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = _shard()
+        key = (self, labels)
+        values = shard.get(key)
+        if values is None:
+            # One slot per bucket plus +Inf, then sum and count
+            values = shard[key] = [0] * (len(self.buckets) + 3)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the duration of a block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _render_values(self, labels, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), values):
+            cumulative += count
+            bucket_labels = _format_labels(self.labels, labels, [('le', _format_value(bound))])
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        label_text = _format_labels(self.labels, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(values[-2])}")
+        lines.append(f"{self.name}_count{label_text} {values[-1]}")
+        return lines
+
+
+def register_collector(collector):
+    """
+    Add a callback producing extra exposition lines at scrape time,
+    for values that are cheaper to read on demand than to track
+
+    Args:
+        collector (callable): Returns a list of exposition lines
+    """
+    _collectors.append(collector)
+
+
+def render():
+    """
+    Render every metric in the Prometheus text exposition format
+
+    Returns:
+        str: Exposition text (version 0.0.4)
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+REQUEST_PHASE_SECONDS = Histogram(
+    'filea_request_phase_seconds',
+    'Time spent per conversion request phase (upload_save, convert, send)',
+    ('endpoint', 'phase')
+)
+CONVERTER_SECONDS = Histogram(
+    'filea_converter_seconds',
+    'Time spent in each converter, per conversion hop',
+    ('converter',)
+)
+INPUT_BYTES = Counter(
+    'filea_input_bytes_total',
+    'Bytes received in uploaded files',
+    ('endpoint',)
+)
+OUTPUT_BYTES = Counter(
+    'filea_output_bytes_total',
+    'Bytes of converted output sent to clients',
+    ('endpoint',)
+)
+UPLOADS_REJECTED = Counter(
+    'filea_uploads_rejected_total',
+    'Uploads refused by FileHandler',
+    ('reason',)
+)
+ERRORS = Counter(
+    'filea_errors_total',
+    'Failed conversion requests by exception type',
+    ('endpoint', 'exception')
+)
+IN_FLIGHT = Gauge(
+    'filea_requests_in_flight',
+    'Conversion requests currently being processed',
+    ('endpoint',)
+)
+STORAGE_RECLAIMED_BYTES = Counter(
+    'filea_storage_reclaimed_bytes_total',
+    'Bytes deleted by the storage janitor (orphan, expired, quota)',
+    ('reason',)
+)
+RATE_LIMITED = Counter(
+    'filea_rate_limited_total',
+    'Requests refused with 429 by the rate limiter',
+    ('endpoint',)
+)
+LOG_RECORDS_DROPPED = Counter(
+    'filea_log_records_dropped_total',
+    'Log records dropped because the log queue was full'
+)
+BATCH_ENTRIES = Counter(
+    'filea_batch_entries_total',
+    'Files in batch conversions by outcome (ok, failed, skipped)',
+    ('status',)
+)
+CACHE_REQUESTS = Counter(
+    'filea_cache_requests_total',
+    'Cache lookups by cache and result (hit or miss)',
+    ('cache', 'result')
+)
+
+
+def cache_hit(cache):
+    CACHE_REQUESTS.inc(cache, 'hit')
+
+
+def cache_miss(cache):
+    CACHE_REQUESTS.inc(cache, 'miss')
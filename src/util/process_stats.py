@@ -0,0 +1,107 @@
+"""
+Process statistics helpers
+"""
+import os
+import resource
+import sys
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss(pid=None):
+    """
+    Get the resident set size of a process
+
+    Args:
+        pid (int): Process id, defaults to the current process
+
+    Returns:
+        int: RSS in bytes (peak RSS where /proc is unavailable)
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        if pid is not None:
+            return 0
+        return peak_rss()
+
+
+def peak_rss():
+    """
+    Get the peak resident set size of the current process
+
+    Returns:
+        int: Peak RSS in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def read_counters():
+    """
+    Read syscalls and bytes read by the current process so far (Linux only)
+
+    Returns:
+        tuple: (read syscalls, bytes read), None where /proc is unavailable
+    """
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(':', 1) for line in f.read().splitlines())
+    except OSError:
+        return None
+    return int(fields['syscr']), int(fields['rchar'])
+
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def _read_stat(pid):
+    """Parse /proc/<pid>/stat into (ppid, cpu seconds), None if unreadable"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces, so split after its closing paren
+    fields = stat[stat.rindex(')') + 2:].split()
+    ppid = int(fields[1])
+    utime, stime = int(fields[11]), int(fields[12])
+    return ppid, (utime + stime) / _CLOCK_TICKS
+
+
+def process_tree_stats(pid=None):
+    """
+    CPU time and RSS of a process plus all its descendants, e.g. a gunicorn
+    master with its workers and their conversion children (Linux only)
+
+    Args:
+        pid (int): Root process id, defaults to the current process
+
+    Returns:
+        tuple: (cpu_seconds, rss_bytes)
+    """
+    root = pid or os.getpid()
+    stats = {}
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        stat = _read_stat(int(entry))
+        if stat is None:
+            continue
+        stats[int(entry)] = stat
+        children.setdefault(stat[0], []).append(int(entry))
+
+    cpu_seconds = 0.0
+    rss = 0
+    pending = [root]
+    while pending:
+        current = pending.pop()
+        if current not in stats:
+            continue
+        cpu_seconds += stats[current][1]
+        rss += current_rss(current)
+        pending.extend(children.get(current, ()))
+    return cpu_seconds, rss
@@ -0,0 +1,195 @@
+"""
+Conversion progress
+Converters call report() from their loops. Outside a tracked conversion it
+costs one thread-local lookup, and inside one it sends at most one update
+per PROGRESS_INTERVAL_MS. In the isolated child, updates travel to the
+parent over the result pipe; the parent keeps the latest state in a small
+JSON file per conversion under PROGRESS_FOLDER, so any worker on the node
+can stream it to clients as server-sent events. Queued jobs keep theirs on
+the job document instead, since they may run on another node.
+"""
+import functools
+import json
+import os
+import re
+import threading
+import time
+
+import config
+
+PROGRESS_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+PROGRESS_FOLDER = os.path.join(config.SCRATCH_DIR, 'progress')
+
+# States after which nothing more is reported
+FINAL_STATUSES = ('done', 'failed')
+
+# How often the event stream looks for a new state, and sends a comment to
+# keep idle proxies from closing the connection
+STREAM_POLL_INTERVAL = 0.25
+STREAM_KEEPALIVE = 15
+
+_local = threading.local()
+
+# Streams open in this process, each holding a server thread
+_stream_slots = threading.BoundedSemaphore(config.PROGRESS_MAX_STREAMS)
+
+
+class Progress:
+    """Latest state of one conversion, passed to a sink at a throttled rate"""
+
+    def __init__(self, sink, interval):
+        """
+        Args:
+            sink (callable): Receives a copy of the state dict
+            interval (float): Minimum seconds between throttled updates
+        """
+        self.sink = sink
+        self.interval = interval
+        self.state = {}
+        self._sent = 0.0
+
+    def update(self, **fields):
+        """Merge fields into the state; send it if the interval has passed"""
+        self.state.update(fields)
+        now = time.monotonic()
+        if now - self._sent >= self.interval:
+            self._sent = now
+            self.sink(dict(self.state))
+
+    def publish(self, **fields):
+        """Merge fields into the state and send it now"""
+        self.state.update(fields)
+        self._sent = time.monotonic()
+        self.sink(dict(self.state))
+
+
+def start(progress_id=None, sink=None):
+    """
+    Track progress on the current thread
+
+    Args:
+        progress_id (str): Conversion whose state file is written
+        sink (callable): Receives the state instead, e.g. a pipe to the parent
+
+    Returns:
+        Progress: The new tracker
+    """
+    if sink is None:
+        sink = functools.partial(write, progress_id)
+    progress = _local.progress = Progress(sink, config.PROGRESS_INTERVAL_MS / 1000)
+    return progress
+
+
+def finish(**fields):
+    """Stop tracking the current thread, publishing any final fields"""
+    progress = getattr(_local, 'progress', None)
+    _local.progress = None
+    if progress is not None and fields:
+        progress.publish(**fields)
+
+
+def current():
+    """The current thread's tracker, or None outside a tracked conversion"""
+    return getattr(_local, 'progress', None)
+
+
+def report(**fields):
+    """Report converter progress, e.g. report(pages_parsed=3, pages_total=10)"""
+    progress = getattr(_local, 'progress', None)
+    if progress is not None:
+        progress.update(**fields)
+
+
+def publish(**fields):
+    """Send a state change now, e.g. publish(status='waiting')"""
+    progress = getattr(_local, 'progress', None)
+    if progress is not None:
+        progress.publish(**fields)
+
+
+def begin(converter):
+    """Start a conversion hop: drop the previous hop's details"""
+    progress = getattr(_local, 'progress', None)
+    if progress is not None:
+        progress.state = {'status': 'converting', 'converter': converter}
+        progress.publish()
+
+
+def _path(progress_id):
+    return os.path.join(PROGRESS_FOLDER, f"{progress_id}.json")
+
+
+def write(progress_id, state):
+    """Replace a conversion's state file"""
+    os.makedirs(PROGRESS_FOLDER, exist_ok=True)
+    path = _path(progress_id)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(state, updated=time.time()), f)
+    os.replace(tmp_path, path)
+
+
+def read(progress_id):
+    """
+    A conversion's latest state
+
+    Returns:
+        dict: The state, or None if nothing was reported yet
+    """
+    try:
+        with open(_path(progress_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def acquire_stream():
+    """
+    Take one of this process's PROGRESS_MAX_STREAMS stream slots
+
+    Returns:
+        bool: False if every slot is in use
+    """
+    return _stream_slots.acquire(blocking=False)
+
+
+def release_stream():
+    """Give back a slot taken by acquire_stream()"""
+    _stream_slots.release()
+
+
+def stream(progress_id, timeout, reader=read):
+    """
+    Server-sent events for a conversion: a `progress` event per new state,
+    ending with a `done` or `failed` event. After `timeout` seconds the
+    stream just ends, and the client reconnects to go on following it
+
+    Args:
+        progress_id (str): Conversion to follow
+        timeout (float): Seconds to stream for at most
+        reader (callable): Returns a conversion's latest state, or None
+
+    Yields:
+        str: Event stream chunks
+    """
+    started = time.monotonic()
+    last_sent = started
+    last_updated = None
+    # Reconnect quickly when the stream ends or the connection drops
+    yield 'retry: 1000\n\n'
+    while time.monotonic() - started < timeout:
+        state = reader(progress_id)
+        if state is not None and state.get('updated') == last_updated:
+            state = None
+        if state is not None:
+            last_updated = state.get('updated')
+            last_sent = time.monotonic()
+            status = state.get('status')
+            event = status if status in FINAL_STATUSES else 'progress'
+            yield f"event: {event}\ndata: {json.dumps(state)}\n\n"
+            if event != 'progress':
+                return
+        elif time.monotonic() - last_sent >= STREAM_KEEPALIVE:
+            last_sent = time.monotonic()
+            yield ': keepalive\n\n'
+        time.sleep(STREAM_POLL_INTERVAL)
@@ -0,0 +1,121 @@
+"""
+Token-bucket rate limiting per client
+Buckets live in shared memory created at import time, so when the app is
+preloaded before forking (gunicorn preload_app) every worker draws from the
+same buckets. Requests take tokens in proportion to the expected cost of
+their converters, so one pdf-to-excel call weighs as much as many image
+conversions.
+"""
+import hashlib
+import math
+import multiprocessing
+import time
+
+import config
+
+
+class TokenBuckets:
+    """
+    Fixed-size, set-associative table of token buckets in shared memory.
+    A client maps to one set of WAYS slots; when the set is full, the slot
+    idle longest is reused (an idle bucket has refilled anyway)
+    """
+
+    WAYS = 8
+    LOCK_STRIPES = 64
+
+    def __init__(self, slots, capacity, refill_rate):
+        """
+        Args:
+            slots (int): Buckets kept, i.e. distinct clients tracked at once
+            capacity (float): Bucket size, the burst a client may spend
+            refill_rate (float): Tokens added per second
+        """
+        self.sets = max(1, slots // self.WAYS)
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        size = self.sets * self.WAYS
+        # Key 0 marks an empty slot
+        self._keys = multiprocessing.RawArray('Q', size)
+        self._tokens = multiprocessing.RawArray('d', size)
+        self._updated = multiprocessing.RawArray('d', size)
+        self._locks = [multiprocessing.Lock() for _ in range(min(self.LOCK_STRIPES, self.sets))]
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def take(self, key, cost, now=None):
+        """
+        Take `cost` tokens from a client's bucket
+
+        Args:
+            key (str): Client identity (API key or IP)
+            cost (float): Tokens the request needs
+            now (float): Monotonic time, for tests
+
+        Returns:
+            float: 0 if allowed, else seconds until enough tokens refill
+        """
+        now = time.monotonic() if now is None else now
+        hashed = self._hash(key)
+        index = hashed % self.sets
+        first = index * self.WAYS
+        cost = min(cost, self.capacity)
+
+        with self._locks[index % len(self._locks)]:
+            slot = None
+            oldest = first
+            for candidate in range(first, first + self.WAYS):
+                if self._keys[candidate] == hashed:
+                    slot = candidate
+                    break
+                if self._updated[candidate] < self._updated[oldest]:
+                    oldest = candidate
+            if slot is None:
+                slot = oldest
+                self._keys[slot] = hashed
+                self._tokens[slot] = self.capacity
+                self._updated[slot] = now
+
+            tokens = min(self.capacity, self._tokens[slot] + (now - self._updated[slot]) * self.refill_rate)
+            self._updated[slot] = now
+            if tokens >= cost:
+                self._tokens[slot] = tokens - cost
+                return 0
+            self._tokens[slot] = tokens
+            return (cost - tokens) / self.refill_rate
+
+
+_buckets = TokenBuckets(
+    config.RATE_LIMIT_SLOTS,
+    config.RATE_LIMIT_CAPACITY,
+    config.RATE_LIMIT_REFILL_RATE
+)
+
+
+def request_cost(converters):
+    """
+    Tokens a request costs
+
+    Args:
+        converters (list): Names of the converters the request will run
+
+    Returns:
+        float: Sum of the converters' RATE_LIMIT_COST
+    """
+    return sum(config.RATE_LIMIT_COST.get(name, 1) for name in converters)
+
+
+def take(key, converters):
+    """
+    Charge a client for a request
+
+    Returns:
+        int: 0 if allowed, else the Retry-After value in seconds
+    """
+    if not converters:
+        return 0
+    wait = _buckets.take(key, request_cost(converters))
+    return int(math.ceil(wait)) if wait else 0
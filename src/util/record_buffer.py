@@ -0,0 +1,164 @@
+"""
+Buffered conversion records
+Requests append a plain dict and return; a background thread bulk-inserts
+the buffer every RECORD_FLUSH_SIZE records or RECORD_FLUSH_INTERVAL_MS,
+so no request waits on MongoDB. When MongoDB falls behind, the oldest
+records are dropped rather than growing the worker without bound. Records
+are validated as they are queued, and only connection failures and
+timeouts put a batch back, so a record MongoDB won't take can't block the
+ones behind it.
+"""
+import atexit
+import collections
+import logging
+import os
+import threading
+import time
+
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, WTimeoutError
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Insert failures worth retrying; any other error drops the batch
+TRANSIENT_ERRORS = (ConnectionFailure, ExecutionTimeout, WTimeoutError)
+
+
+class RecordBuffer:
+    """Collects records and inserts them in batches from one thread"""
+
+    def __init__(self, insert, flush_size, flush_interval, max_size, validate=None):
+        """
+        Args:
+            insert (callable): Writes a list of record dicts
+            flush_size (int): Flush as soon as this many records wait
+            flush_interval (float): Flush at least this often (seconds)
+            max_size (int): Records kept while inserts are failing
+            validate (callable): Raises for a record insert would refuse
+        """
+        self.insert = insert
+        self.validate = validate
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._records = collections.deque(maxlen=max_size)
+        self._ready = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def add(self, record):
+        """Queue a record; never blocks on the database"""
+        if self.validate is not None:
+            try:
+                self.validate(record)
+            except Exception as e:
+                logger.error('Dropping invalid conversion record: %s', e)
+                with self._ready:
+                    self.dropped += 1
+                return
+        with self._ready:
+            if len(self._records) == self._records.maxlen:
+                self.dropped += 1
+            self._records.append(record)
+            if len(self._records) >= self.flush_size:
+                self._ready.notify()
+        # Threads don't survive fork, so each worker starts its own
+        if self._pid != os.getpid():
+            self._start()
+
+    def _start(self):
+        with self._ready:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='record-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._ready:
+                self._ready.wait_for(
+                    lambda: len(self._records) >= self.flush_size,
+                    timeout=self.flush_interval
+                )
+            if self.flush() is None:
+                # Don't spin while MongoDB is unavailable
+                time.sleep(self.flush_interval)
+
+    def flush(self):
+        """
+        Insert everything buffered so far
+
+        Returns:
+            int: Records inserted (0 if they were dropped), or None if the
+                insert failed and will be retried
+        """
+        with self._ready:
+            batch = list(self._records)
+            self._records.clear()
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        try:
+            self.insert(batch)
+        except TRANSIENT_ERRORS:
+            logger.exception('Inserting %d conversion records failed, will retry', len(batch))
+            # Put them back in front of newer records, within the size cap
+            with self._ready:
+                room = self._records.maxlen - len(self._records)
+                if room > 0:
+                    self._records.extendleft(reversed(batch[-room:]))
+                self.dropped += max(0, len(batch) - room)
+            return None
+        except Exception:
+            # Retrying can't help, and would hold up every later record
+            logger.exception('Inserting %d conversion records failed, dropping them', len(batch))
+            with self._ready:
+                self.dropped += len(batch)
+            return 0
+        logger.debug('Inserted %d conversion records in %.1fms', len(batch), (time.perf_counter() - started) * 1000)
+        return len(batch)
+
+
+def validate_record(record):
+    """
+    Check a record dict as a ConversionRecord
+
+    Raises:
+        FieldDoesNotExist, ValidationError: If it can't be inserted
+    """
+    from model.conversion_record import ConversionRecord
+    ConversionRecord(**record).validate()
+
+
+def insert_records(records):
+    """Bulk-insert record dicts as ConversionRecord documents"""
+    from model.conversion_record import ConversionRecord
+    ConversionRecord.objects.insert([ConversionRecord(**record) for record in records], load_bulk=False)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process-wide buffer, created on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = RecordBuffer(
+                insert_records,
+                config.RECORD_FLUSH_SIZE,
+                config.RECORD_FLUSH_INTERVAL_MS / 1000,
+                config.RECORD_BUFFER_MAX,
+                validate=validate_record
+            )
+            atexit.register(_buffer.flush)
+    return _buffer
+
+
+def record(**fields):
+    """Queue a conversion record, if records are enabled"""
+    if config.CONVERSION_RECORDS:
+        get_buffer().add(fields)
@@ -0,0 +1,269 @@
+"""
+Retained conversion results
+Outputs are kept for RESULT_TTL seconds under a stable result id, so a
+client whose download drops can resume it instead of converting again
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import time
+import uuid
+
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+import config
+from storage import get_storage
+
+RESULT_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Chunk size when streaming a byte range without sendfile
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+class ResultStore:
+    """Store converted files and their metadata under a result id"""
+
+    @staticmethod
+    def _keys(result_id):
+        # Sharded by the first two hex digits to keep directories small
+        base = f"{result_id[:2]}/{result_id}"
+        return base + '.bin', base + '.json'
+
+    @staticmethod
+    def variant_id(source_hash, to_format):
+        """
+        Result id of a source file converted to a format, so a conversion
+        done once is found again while its result is kept
+
+        Args:
+            source_hash (str): SHA-256 of the source file
+            to_format (str): Target format
+
+        Returns:
+            str: A result id
+        """
+        return hashlib.sha256(f'{source_hash}:{to_format}'.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def save(output_path, download_name, result_id=None):
+        """
+        Hand a converted file to the storage backend
+
+        Args:
+            output_path (str): Path of the converted file. Local backends
+                move it; remote ones upload it and leave it for the caller
+                to delete once the response is sent
+            download_name (str): Filename offered to the client
+            result_id (str): Id to store it under (e.g. a variant_id),
+                replacing any result already there; random by default
+
+        Returns:
+            dict: Result metadata (id, download_name, size, expires) plus
+                the local path to send from
+        """
+        storage = get_storage()
+        result_id = result_id or uuid.uuid4().hex
+        data_key, meta_key = ResultStore._keys(result_id)
+
+        result = {
+            'id': result_id,
+            'download_name': download_name,
+            'size': os.path.getsize(output_path),
+            'expires': time.time() + config.RESULT_TTL,
+        }
+        storage.put(data_key, output_path)
+        storage.put_bytes(meta_key, json.dumps(result).encode())
+        result['path'] = storage.local_path(data_key) or output_path
+        return result
+
+    @staticmethod
+    def get(result_id):
+        """
+        Look up a result
+
+        Returns:
+            dict: Result metadata, or None if unknown or expired. 'path' is
+                None when the backend doesn't keep files on this machine
+        """
+        if not RESULT_ID_PATTERN.match(result_id or ''):
+            return None
+        storage = get_storage()
+        data_key, meta_key = ResultStore._keys(result_id)
+        try:
+            result = json.loads(storage.get_bytes(meta_key))
+        except (FileNotFoundError, ValueError):
+            return None
+        if result['expires'] < time.time():
+            return None
+        result['path'] = storage.local_path(data_key)
+        if result['path'] is not None and not os.path.exists(result['path']):
+            return None
+        return result
+
+    @staticmethod
+    def delete(result_id):
+        """Remove a result and its metadata"""
+        storage = get_storage()
+        for key in ResultStore._keys(result_id):
+            storage.delete(key)
+
+    @staticmethod
+    def list_results():
+        """
+        Every stored result, expired or not. Results whose metadata is
+        missing count as expired. Only keys in the result layout are
+        listed, so queued job inputs under jobs/ are left alone
+
+        Returns:
+            list: (result_id, size, mtime, expires) tuples
+        """
+        storage = get_storage()
+        found = {}
+        for key, size, mtime in storage.list():
+            result_id, extension = os.path.splitext(os.path.basename(key))
+            if not RESULT_ID_PATTERN.match(result_id) or key not in ResultStore._keys(result_id):
+                continue
+            entry = found.setdefault(result_id, [0, 0, False])
+            if extension == '.bin':
+                entry[0], entry[1] = size, mtime
+            elif extension == '.json':
+                entry[2] = True
+
+        results = []
+        for result_id, (size, mtime, has_meta) in found.items():
+            expires = 0
+            if has_meta:
+                try:
+                    expires = json.loads(storage.get_bytes(ResultStore._keys(result_id)[1]))['expires']
+                except (FileNotFoundError, ValueError, KeyError):
+                    pass
+            results.append((result_id, size, mtime, expires))
+        return results
+
+    @staticmethod
+    def purge_expired():
+        """
+        Delete every expired result
+
+        Returns:
+            int: Bytes reclaimed
+        """
+        reclaimed = 0
+        now = time.time()
+        for result_id, size, _, expires in ResultStore.list_results():
+            if expires < now:
+                reclaimed += size
+                ResultStore.delete(result_id)
+        return reclaimed
+
+
+def _parse_range(header, size):
+    """
+    Parse a single `bytes=` range
+
+    Returns:
+        tuple: (start, end) inclusive, None for a missing or multi-part
+            range, or 'invalid' when it can't be satisfied
+    """
+    match = re.match(r'^bytes=(\d*)-(\d*)$', (header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'invalid'
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _read_range(f, length):
+    """Yield `length` bytes of an open file from its current position"""
+    try:
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def send_result(result):
+    """
+    Build the response for a stored result, honouring If-None-Match,
+    Range/If-Range and the configured transfer offload
+
+    Args:
+        result (dict): Metadata from ResultStore
+
+    Returns:
+        Response: 200, 206, 304 or 416 response
+    """
+    etag = f'"{result["id"]}"'
+    mimetype = mimetypes.guess_type(result['download_name'])[0] or 'application/octet-stream'
+    headers = {
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'attachment; filename="{result["download_name"]}"',
+        'Cache-Control': f'private, max-age={max(0, int(result["expires"] - time.time()))}',
+        'X-Result-Id': result['id'],
+    }
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        return Response(status=304, headers=headers)
+
+    # Remote backends serve ranges and conditional requests themselves
+    if result['path'] is None:
+        data_key = ResultStore._keys(result['id'])[0]
+        location = get_storage().url(data_key, result['expires'] - time.time(), result['download_name'])
+        return Response(status=307, headers={'Location': location, 'X-Result-Id': result['id']})
+
+    # Let the front proxy copy the bytes (it handles ranges itself). Without
+    # retention the file is gone before the proxy could read it
+    mode = config.SEND_FILE_MODE if config.RESULT_TTL else 'direct'
+    if mode == 'x-sendfile':
+        headers['X-Sendfile'] = result['path']
+        return Response(status=200, headers=headers, mimetype=mimetype)
+    if mode == 'x-accel-redirect':
+        headers['X-Accel-Redirect'] = config.X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + \
+            os.path.relpath(result['path'], get_storage().root)
+        return Response(status=200, headers=headers, mimetype=mimetype)
+
+    size = result['size']
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range.strip() == etag:
+        byte_range = _parse_range(request.headers.get('Range'), size)
+    if byte_range == 'invalid':
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+
+    f = open(result['path'], 'rb')
+    if byte_range is None:
+        # wsgi.file_wrapper lets gunicorn hand the file to sendfile(2)
+        headers['Content-Length'] = str(size)
+        return Response(wrap_file(request.environ, f), status=200, headers=headers,
+                        mimetype=mimetype, direct_passthrough=True)
+
+    start, end = byte_range
+    length = end - start + 1
+    f.seek(start)
+    headers['Content-Length'] = str(length)
+    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        # gunicorn's sendfile starts at the current offset and stops at Content-Length
+        body = wrap_file(request.environ, f)
+    else:
+        body = _read_range(f, length)
+    return Response(body, status=206, headers=headers, mimetype=mimetype, direct_passthrough=True)
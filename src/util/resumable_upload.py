@@ -0,0 +1,311 @@
+"""
+Resumable uploads
+A client creates an upload with the file's name and size, sends it in
+chunks (each at the offset the server reports, with a checksum) and
+finalizes it. Chunks are written in place into one file in the upload
+store, so finalizing is a rename. A dropped chunk is simply sent again.
+The finalized upload id stands in for the `file` field of a conversion,
+once; uploads left idle for ORPHAN_TTL are removed by the janitor.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from werkzeug.utils import secure_filename
+
+import config
+from util import metrics
+from util.file_handler import FileHandler
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+CHECKSUM_ALGORITHMS = ('sha256', 'sha1', 'md5')
+
+# Bytes read from the request per write
+CHUNK_READ_SIZE = 64 * 1024
+
+
+class UploadConflict(Exception):
+    """Raised when a chunk doesn't start at the upload's current offset"""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+class ChecksumMismatch(ValueError):
+    """Raised when a chunk doesn't match its checksum; it isn't kept"""
+
+
+class ResumableUpload:
+    """Create, fill and finalize uploads sent in chunks"""
+
+    @staticmethod
+    def _paths(upload_id, extension):
+        data_path = FileHandler._sharded_path(FileHandler.UPLOAD_FOLDER, upload_id, f"{upload_id}.{extension}")
+        return data_path + '.part', data_path, ResumableUpload._meta_path(upload_id)
+
+    @staticmethod
+    def _meta_path(upload_id):
+        return os.path.join(FileHandler.UPLOAD_FOLDER, upload_id[:2], f"{upload_id}.upload.json")
+
+    @staticmethod
+    def _write_meta(upload):
+        meta_path = ResumableUpload._meta_path(upload['id'])
+        upload['updated'] = time.time()
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(upload, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @staticmethod
+    def describe(upload):
+        """Public view of an upload"""
+        return {
+            'id': upload['id'],
+            'filename': upload['filename'],
+            'size': upload['size'],
+            'offset': upload['offset'],
+            'complete': upload['complete'],
+            'expires': upload['updated'] + config.ORPHAN_TTL,
+        }
+
+    @staticmethod
+    def create(filename, size):
+        """
+        Start an upload
+
+        Args:
+            filename (str): Name of the file being sent
+            size (int): Its total size in bytes
+
+        Returns:
+            dict: The upload (id, filename, size, offset, complete)
+
+        Raises:
+            ValueError: If the name or size is not acceptable
+            StorageFull: If storage can't take the file
+        """
+        filename = secure_filename(filename or '')
+        if '.' not in filename:
+            raise ValueError("filename with an extension required")
+        if size <= 0:
+            raise ValueError("size must be positive")
+        if size > FileHandler.MAX_FILE_SIZE:
+            metrics.UPLOADS_REJECTED.inc('too_large')
+            raise ValueError(f"File too large. Max size: {FileHandler.MAX_FILE_SIZE / 1024 / 1024}MB")
+        FileHandler.check_capacity(size)
+
+        upload = {
+            'id': uuid.uuid4().hex,
+            'filename': filename,
+            'extension': filename.rsplit('.', 1)[1].lower(),
+            'size': size,
+            'offset': 0,
+            'complete': False,
+        }
+        part_path, _, _ = ResumableUpload._paths(upload['id'], upload['extension'])
+        open(part_path, 'wb').close()
+        ResumableUpload._write_meta(upload)
+        # Reserved up front; the janitor measures the real usage
+        with FileHandler.usage.get_lock():
+            FileHandler.usage.value += size
+        return upload
+
+    @staticmethod
+    def get(upload_id):
+        """
+        Look up an upload
+
+        Returns:
+            dict: The upload, or None if unknown, used or expired
+        """
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            return None
+        try:
+            with open(ResumableUpload._meta_path(upload_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def parse_checksum(header):
+        """
+        Parse an `Upload-Checksum: <algorithm> <hex digest>` header
+
+        Returns:
+            tuple: (algorithm, digest)
+
+        Raises:
+            ValueError: If the header is missing or malformed
+        """
+        parts = (header or '').split()
+        if len(parts) != 2 or parts[0].lower() not in CHECKSUM_ALGORITHMS:
+            raise ValueError(f"Upload-Checksum header required: <{'|'.join(CHECKSUM_ALGORITHMS)}> <hex digest>")
+        return parts[0].lower(), parts[1].lower()
+
+    @staticmethod
+    def write_chunk(upload_id, offset, stream, length, checksum):
+        """
+        Write a chunk at `offset`, which must be the upload's current offset
+
+        Args:
+            upload_id (str): Upload id
+            offset (int): Where the chunk starts
+            stream: File-like object the chunk is read from
+            length (int): Chunk length (the request's Content-Length)
+            checksum (tuple): (algorithm, hex digest) of the chunk
+
+        Returns:
+            dict: The upload with its new offset
+
+        Raises:
+            FileNotFoundError: If the upload doesn't exist
+            UploadConflict: If the offset is wrong, the upload is already
+                finalized or another chunk is being written
+            ChecksumMismatch: If the bytes received don't match
+            ValueError: If the chunk is empty or runs past the declared size
+        """
+        upload = ResumableUpload.get(upload_id)
+        if upload is None:
+            raise FileNotFoundError(f"Unknown upload {upload_id}")
+        if upload['complete']:
+            raise UploadConflict("Upload already finalized", upload['offset'])
+        part_path, _, _ = ResumableUpload._paths(upload_id, upload['extension'])
+
+        with open(part_path, 'r+b') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadConflict("Another chunk is being written", upload['offset'])
+            # Re-read under the lock: another worker may have moved it on
+            upload = ResumableUpload.get(upload_id)
+            if upload is None:
+                raise FileNotFoundError(f"Unknown upload {upload_id}")
+            if upload['complete']:
+                raise UploadConflict("Upload already finalized", upload['offset'])
+            if offset != upload['offset']:
+                raise UploadConflict(f"Expected offset {upload['offset']}", upload['offset'])
+            if length <= 0 or offset + length > upload['size']:
+                raise ValueError(f"Chunk must be 1 to {upload['size'] - offset} bytes")
+
+            digest = hashlib.new(checksum[0])
+            received = 0
+            while received < length:
+                data = stream.read(min(CHUNK_READ_SIZE, length - received))
+                if not data:
+                    break
+                digest.update(data)
+                os.pwrite(f.fileno(), data, offset + received)
+                received += len(data)
+            # The offset only moves on a complete, verified chunk, so
+            # anything written past it is overwritten by the retry
+            if received != length:
+                raise ChecksumMismatch(f"Chunk ended after {received} of {length} bytes")
+            if digest.hexdigest() != checksum[1]:
+                metrics.UPLOADS_REJECTED.inc('checksum')
+                raise ChecksumMismatch(f"Chunk {checksum[0]} checksum mismatch")
+
+            upload['offset'] = offset + length
+            ResumableUpload._write_meta(upload)
+        return upload
+
+    @staticmethod
+    def finalize(upload_id):
+        """
+        Move a fully received upload into the upload store
+
+        Returns:
+            dict: The finalized upload
+
+        Raises:
+            FileNotFoundError: If the upload doesn't exist
+            UploadConflict: If bytes are still missing
+        """
+        upload = ResumableUpload.get(upload_id)
+        if upload is None:
+            raise FileNotFoundError(f"Unknown upload {upload_id}")
+        if upload['complete']:
+            return upload
+        part_path, data_path, _ = ResumableUpload._paths(upload_id, upload['extension'])
+        with open(part_path, 'r+b') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadConflict("A chunk is being written", upload['offset'])
+            upload = ResumableUpload.get(upload_id)
+            if upload is None:
+                raise FileNotFoundError(f"Unknown upload {upload_id}")
+            if upload['offset'] != upload['size']:
+                raise UploadConflict(
+                    f"Received {upload['offset']} of {upload['size']} bytes", upload['offset']
+                )
+            os.rename(part_path, data_path)
+            upload['complete'] = True
+            ResumableUpload._write_meta(upload)
+        return upload
+
+    @staticmethod
+    def peek(upload_id):
+        """
+        Locate a finalized upload without using it up
+
+        Returns:
+            tuple: (file_path, original_filename, file_extension)
+
+        Raises:
+            ValueError: If the upload is unknown or unfinished
+        """
+        upload = ResumableUpload.get(upload_id)
+        if upload is None or not upload['complete']:
+            raise ValueError(f"No finalized upload {upload_id}")
+        _, data_path, _ = ResumableUpload._paths(upload_id, upload['extension'])
+        return data_path, upload['filename'], upload['extension']
+
+    @staticmethod
+    def claim(upload_id, allowed_extensions):
+        """
+        Take a finalized upload for a conversion; each upload is used once
+
+        Args:
+            upload_id (str): Upload id
+            allowed_extensions (list): Extensions the endpoint accepts
+
+        Returns:
+            tuple: (file_path, original_filename, file_extension), as
+                FileHandler.save_upload returns
+
+        Raises:
+            ValueError: If the upload is unknown, unfinished, used or of a
+                type the endpoint doesn't accept
+        """
+        upload = ResumableUpload.get(upload_id)
+        if upload is None or not upload['complete']:
+            raise ValueError(f"No finalized upload {upload_id}")
+        if upload['extension'] not in allowed_extensions:
+            metrics.UPLOADS_REJECTED.inc('file_type')
+            raise ValueError(f"File type not allowed. Allowed: {', '.join(allowed_extensions)}")
+        _, data_path, meta_path = ResumableUpload._paths(upload_id, upload['extension'])
+        try:
+            # Only one request can remove the metadata
+            os.remove(meta_path)
+        except FileNotFoundError:
+            raise ValueError(f"No finalized upload {upload_id}")
+        return data_path, upload['filename'], upload['extension']
+
+    @staticmethod
+    def delete(upload_id):
+        """
+        Abandon an upload
+
+        Returns:
+            bool: False if it didn't exist
+        """
+        upload = ResumableUpload.get(upload_id)
+        if upload is None:
+            return False
+        for path in ResumableUpload._paths(upload_id, upload['extension']):
+            FileHandler.cleanup_file(path)
+        return True
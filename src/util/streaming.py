@@ -0,0 +1,121 @@
+"""
+Streamed conversion output
+When the last converter on a path writes its output front to back (its edge
+is `streamed`), the response starts with the first bytes the isolated child
+writes and follows the file as it grows, so encoding and transfer overlap.
+Other outputs, and conversions that finish before writing anything, are sent
+from the finished file as before.
+"""
+import contextlib
+import os
+import time
+
+import config
+from util import admission, isolation, metrics, progress
+from util.file_handler import FileHandler
+
+# Bytes read from the growing output and sent at a time
+CHUNK_SIZE = 64 * 1024
+
+
+def can_stream(path):
+    """Whether a path's output can be sent while it is being written"""
+    return config.STREAM_OUTPUT and config.CONVERSION_ISOLATION and path[-1].streamed
+
+
+class StreamedConversion:
+    """A conversion path whose last hop is followed while it runs"""
+
+    def __init__(self, registry, path, runner=None, options=None, cancelled=None):
+        """
+        Args:
+            registry (ConverterRegistry): Registry the path came from
+            path (list): ConversionEdge objects; can_stream(path) must hold
+            runner (callable): Runs the hops before the last, as for run_path
+            options (dict): Keyword arguments for the last edge's func
+            cancelled (callable): Returns True once the output is no longer wanted
+        """
+        self.registry = registry
+        self.head, self.last = path[:-1], path[-1]
+        self.runner = runner
+        self.options = options
+        self.cancelled = cancelled
+        self.child = None
+        self._slot = contextlib.ExitStack()
+        self._intermediate = None
+        self._input_size = 0
+        self._started = None
+
+    def start(self, input_path, output_path, get_intermediate_path):
+        """
+        Run the hops before the last one, then start the last and wait for
+        its first bytes
+
+        Args:
+            input_path (str): Path to the input file
+            output_path (str): Path for the final output
+            get_intermediate_path (callable): Returns a temp path for a format
+
+        Returns:
+            bool: True if the output is still being written (follow it with
+                chunks()), False if it is already complete
+
+        Raises:
+            Whatever run_path or run_edge raise; nothing is left running
+        """
+        try:
+            current = input_path
+            if self.head:
+                current = self._intermediate = get_intermediate_path(self.head[-1].to_format)
+                self.registry.run_path(
+                    self.head, input_path, current, get_intermediate_path,
+                    admit=admission.admit, runner=self.runner
+                )
+            self._input_size = os.path.getsize(current)
+            self._slot.enter_context(admission.admit(self.last))
+            progress.begin(self.last.name)
+            self._started = time.perf_counter()
+            self.child = isolation.EdgeProcess(self.last, current, output_path, self.cancelled, self.options)
+            while True:
+                if FileHandler.get_file_size(output_path):
+                    # Small outputs are often complete by now, and are better
+                    # sent whole (with a length, ETag and ranges)
+                    if not self.child.poll(0):
+                        return True
+                    break
+                if self.child.poll(isolation.FOLLOW_INTERVAL):
+                    break
+            self.child.result()
+            self._record()
+            self.close()
+            return False
+        except BaseException:
+            self.close()
+            raise
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """
+        Yield the output as it is written
+
+        Raises:
+            ConversionError (or a subclass), ValueError: If the conversion
+                failed after some of it was sent
+        """
+        try:
+            yield from self.child.follow(chunk_size)
+            self._record()
+        finally:
+            self.close()
+
+    def _record(self):
+        seconds = time.perf_counter() - self._started
+        self.registry.record_timing(self.last, seconds, self._input_size)
+        metrics.CONVERTER_SECONDS.observe(seconds, self.last.name)
+
+    def close(self):
+        """Stop the conversion if it still runs and release what it holds"""
+        if self.child is not None:
+            self.child.kill()
+        self._slot.close()
+        if self._intermediate:
+            FileHandler.cleanup_file(self._intermediate)
@@ -0,0 +1,112 @@
+"""
+Per-request stage timing and on-demand profiling
+Stages are recorded on a thread-local timer and reported in the
+Server-Timing response header. Code running outside a request records
+nothing, so converters can mark stages unconditionally.
+"""
+import cProfile
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class RequestTimer:
+    """Stage durations collected while handling one request"""
+
+    def __init__(self, profile_dir=None):
+        """
+        Args:
+            profile_dir (str): Where to write cProfile output for this
+                request, None when the request isn't being profiled
+        """
+        self.stages = []
+        self.profile_dir = profile_dir
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.profiler = None
+
+    def add(self, name, seconds, description=None):
+        self.stages.append((name, seconds * 1000, description))
+
+    def profile_path(self, label):
+        """Path of a profile file for part of this request, None if not profiling"""
+        if not self.profile_dir:
+            return None
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        return os.path.join(self.profile_dir, f"{stamp}-{self.profile_id}-{label}.prof")
+
+    def header(self):
+        """Render the stages as a Server-Timing header value"""
+        parts = []
+        for name, duration_ms, description in self.stages:
+            part = name
+            if description:
+                part += f';desc="{description}"'
+            parts.append(f"{part};dur={duration_ms:.1f}")
+        return ', '.join(parts)
+
+
+def start(profile_dir=None):
+    """Start timing a request on the current thread"""
+    timer = _local.timer = RequestTimer(profile_dir)
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        timer.profiler = cProfile.Profile()
+        timer.profiler.enable()
+    return timer
+
+
+def finish():
+    """
+    Stop timing the current request and write its profile, if any
+
+    Returns:
+        RequestTimer: The finished timer, or None if none was started
+    """
+    timer = getattr(_local, 'timer', None)
+    _local.timer = None
+    if timer is not None and timer.profiler is not None:
+        timer.profiler.disable()
+        timer.profiler.dump_stats(timer.profile_path('request'))
+    return timer
+
+
+def current():
+    """The current thread's timer, or None outside a timed request"""
+    return getattr(_local, 'timer', None)
+
+
+@contextmanager
+def stage(name, description=None):
+    """
+    Record the duration of a block as a named stage
+
+    Args:
+        name (str): Stage name (a Server-Timing token, e.g. 'tabula')
+        description (str): Optional human-readable description
+    """
+    timer = getattr(_local, 'timer', None)
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started, description)
+
+
+def snapshot():
+    """Stages recorded so far, in a picklable form"""
+    timer = getattr(_local, 'timer', None)
+    return list(timer.stages) if timer else []
+
+
+def merge(stages):
+    """Append stages recorded elsewhere (e.g. in a conversion child process)"""
+    timer = getattr(_local, 'timer', None)
+    if timer is not None:
+        timer.stages.extend(stages)
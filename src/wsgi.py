@@ -0,0 +1,14 @@
+"""
+Production WSGI entry point
+
+Run with the prefork server configured in gunicorn_conf.py:
+    cd src && gunicorn -c gunicorn_conf.py wsgi:server
+"""
+from util.lazy_import import prewarm
+from server import server
+
+server.debug = False
+
+# Loaded once in the gunicorn master (preload_app), so the converter
+# libraries are shared copy-on-write by every forked worker
+prewarm()
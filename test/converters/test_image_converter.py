@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from converters.image_converter import ImageConverter, PillowEngine, VipsEngine
+
+try:
+    from PIL import Image, ImageChops, ImageStat
+except ImportError:
+    Image = None
+
+
+@unittest.skipIf(Image is None, 'Pillow not installed')
+class TestImageEngines(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.input_path = os.path.join(self.tmp_dir, 'input.png')
+        # Gradient with a transparent half, so JPEG output needs flattening
+        image = Image.linear_gradient('L').resize((320, 200)).convert('RGBA')
+        image.paste((0, 0, 0, 0), (0, 0, 160, 200))
+        image.save(self.input_path)
+
+    def convert(self, output_format, engine):
+        output_path = os.path.join(self.tmp_dir, f'{engine}.{output_format}')
+        ImageConverter.convert(self.input_path, output_path, output_format, engine)
+        return output_path
+
+    def test_unknown_engine_rejected(self):
+        with self.assertRaises(ValueError):
+            self.convert('png', 'imagemagick')
+
+    def test_falls_back_to_pillow(self):
+        with mock.patch.object(VipsEngine, 'available', return_value=False):
+            self.assertIs(ImageConverter.get_engine('vips', 'png', 'webp'), PillowEngine)
+            with Image.open(self.convert('webp', 'vips')) as output:
+                self.assertEqual(output.size, (320, 200))
+        # libvips has no BMP support of its own
+        self.assertIs(ImageConverter.get_engine('vips', 'png', 'bmp'), PillowEngine)
+
+    @unittest.skipUnless(VipsEngine.available(), 'libvips not installed')
+    def test_engines_produce_equivalent_images(self):
+        for output_format in ('jpg', 'png', 'webp'):
+            with Image.open(self.convert(output_format, 'pillow')) as pillow, \
+                    Image.open(self.convert(output_format, 'vips')) as vips:
+                self.assertEqual(pillow.size, vips.size)
+                self.assertEqual(pillow.mode, vips.mode)
+                difference = ImageChops.difference(pillow, vips)
+                # Encoders differ slightly; the pixels shouldn't
+                self.assertLess(max(ImageStat.Stat(difference).mean), 2, output_format)
+
+
+@unittest.skipIf(Image is None, 'Pillow not installed')
+class TestNegotiateFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def make_image(self, mode, color):
+        path = os.path.join(self.tmp_dir, f'{mode}.png')
+        Image.new(mode, (16, 16), color).save(path)
+        return path
+
+    def test_prefers_avif_then_webp(self):
+        opaque = self.make_image('RGB', (200, 10, 10))
+        chrome = 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8'
+        self.assertEqual(ImageConverter.negotiate_format(chrome, opaque), 'avif')
+        self.assertEqual(ImageConverter.negotiate_format('image/webp,*/*', opaque), 'webp')
+        self.assertEqual(ImageConverter.negotiate_format('image/avif;q=0, image/webp', opaque), 'webp')
+
+    def test_wildcards_fall_back_by_transparency(self):
+        opaque = self.make_image('RGB', (200, 10, 10))
+        transparent = self.make_image('RGBA', (200, 10, 10, 128))
+        self.assertEqual(ImageConverter.negotiate_format('image/*,*/*;q=0.8', opaque), 'jpg')
+        self.assertEqual(ImageConverter.negotiate_format(None, transparent), 'png')
+
+    def test_opaque_alpha_channel_is_not_transparency(self):
+        self.assertFalse(ImageConverter.has_transparency(self.make_image('RGBA', (1, 2, 3, 255))))
+        self.assertTrue(ImageConverter.has_transparency(self.make_image('LA', (1, 0))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from converters import pdf_converter
+from converters.pdf_converter import DocumentConverter
+
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+try:
+    import pdf2docx
+except ImportError:
+    pdf2docx = None
+
+
+@unittest.skipIf(fitz is None, 'PyMuPDF not installed')
+class TestPdfToWord(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_password_protected_pdf_rejected(self):
+        pdf_path = os.path.join(self.tmp_dir, 'locked.pdf')
+        with fitz.open() as pdf:
+            pdf.new_page()
+            pdf.save(pdf_path, encryption=fitz.PDF_ENCRYPT_AES_256, user_pw='secret', owner_pw='secret')
+
+        with self.assertRaises(ValueError):
+            DocumentConverter.pdf_to_word(pdf_path, os.path.join(self.tmp_dir, 'locked.docx'))
+
+    @unittest.skipIf(pdf2docx is None, 'pdf2docx not installed')
+    def test_converts_from_mapping(self):
+        pdf_path = os.path.join(self.tmp_dir, 'report.pdf')
+        with fitz.open() as pdf:
+            pdf.new_page().insert_text((72, 72), 'Quarterly report')
+            pdf.save(pdf_path)
+        docx_path = os.path.join(self.tmp_dir, 'report.docx')
+
+        DocumentConverter.pdf_to_word(pdf_path, docx_path)
+        self.assertGreater(os.path.getsize(docx_path), 0)
+
+
+class TestPdfStreams(unittest.TestCase):
+    """Runs without PyMuPDF: what the libraries are handed"""
+
+    def test_libraries_get_bytes(self):
+        # PyMuPDF 1.23 refuses anything but bytes, bytearray and BytesIO
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        pdf_path = os.path.join(tmp_dir, 'report.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4 fake')
+
+        fake_fitz = mock.MagicMock()
+        fake_fitz.open.return_value.__enter__.return_value.needs_pass = False
+        fake_pdf2docx = mock.MagicMock()
+        with mock.patch.object(pdf_converter, 'fitz', fake_fitz), \
+                mock.patch.object(pdf_converter, 'pdf2docx', fake_pdf2docx):
+            DocumentConverter.pdf_to_word(pdf_path, os.path.join(tmp_dir, 'report.docx'))
+
+        stream = fake_fitz.open.call_args.kwargs['stream']
+        self.assertIs(type(stream), bytes)
+        self.assertEqual(stream, b'%PDF-1.4 fake')
+        self.assertIs(fake_pdf2docx.Converter.call_args.kwargs['stream'], stream)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from converters.registry import ConverterRegistry
+
+
+def copy_file(input_path, output_path):
+    shutil.copyfile(input_path, output_path)
+
+
+class FakeConverter:
+
+    @staticmethod
+    def get_conversions():
+        return [
+            ('a-to-b', 'a', 'b', 1.0, copy_file),
+            ('b-to-c', 'b', 'c', 1.0, copy_file),
+            ('a-to-c', 'a', 'c', 5.0, copy_file),
+        ]
+
+
+class TestConverterRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ConverterRegistry()
+        self.registry.register(FakeConverter)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_find_cheapest_path(self):
+        path = self.registry.find_path('a', 'c')
+        self.assertEqual([edge.name for edge in path], ['a-to-b', 'b-to-c'])
+
+    def test_find_path_unknown(self):
+        with self.assertRaises(ValueError):
+            self.registry.find_path('c', 'a')
+
+    def test_observed_timings_reroute(self):
+        path = self.registry.find_path('a', 'c')
+        self.registry.record_timing(path[0], 20.0, 1024 * 1024)
+        path = self.registry.find_path('a', 'c')
+        self.assertEqual([edge.name for edge in path], ['a-to-c'])
+
+    def test_run_path_removes_intermediates(self):
+        input_path = os.path.join(self.tmp_dir, 'input.a')
+        output_path = os.path.join(self.tmp_dir, 'output.c')
+        with open(input_path, 'w') as f:
+            f.write('data')
+
+        path = self.registry.find_path('a', 'c')
+        self.registry.run_path(
+            path,
+            input_path,
+            output_path,
+            lambda fmt: os.path.join(self.tmp_dir, 'intermediate.' + fmt)
+        )
+
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['input.a', 'output.c'])
+        self.assertEqual(path[0].samples, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import datetime
+import unittest
+
+from mongoengine import connect, disconnect
+from pymongo.errors import AutoReconnect
+
+from model.conversion_record import ConversionRecord
+from util.record_buffer import RecordBuffer, insert_records, validate_record
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+def make_record(**fields):
+    record = {
+        'input_hash': 'a' * 64,
+        'from_format': 'pdf',
+        'to_format': 'docx',
+        'converters': ['pdf-to-word'],
+        'input_size': 1024,
+        'output_size': 2048,
+        'duration_ms': 120.0,
+        'stages': {'pdf2docx': 100.0},
+        'outcome': 'ok',
+        'client': '127.0.0.1',
+    }
+    record.update(fields)
+    return record
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is required for the MongoDB tests')
+class TestConversionRecord(unittest.TestCase):
+
+    def setUp(self):
+        connect('filea_test', host='mongomock://localhost')
+        self.addCleanup(disconnect)
+        ConversionRecord.drop_collection()
+
+    def test_buffer_inserts_in_batches(self):
+        batches = []
+
+        def insert(records):
+            batches.append(len(records))
+            insert_records(records)
+
+        buffer = RecordBuffer(insert, flush_size=100, flush_interval=60, max_size=10)
+        for duration in (10.0, 30.0, 20.0):
+            buffer.add(make_record(duration_ms=duration))
+        self.assertEqual(buffer.flush(), 3)
+
+        self.assertEqual(batches, [3])
+        slowest = ConversionRecord.objects(from_format='pdf', to_format='docx').order_by('-duration_ms').first()
+        self.assertEqual(slowest.duration_ms, 30.0)
+
+    def test_streamed_record(self):
+        insert_records([make_record(streamed=True, outcome='client_disconnected', output_size=512)])
+        record = ConversionRecord.objects.get()
+        self.assertTrue(record.streamed)
+        self.assertEqual(record.output_size, 512)
+
+    def test_failed_insert_keeps_records(self):
+        def insert(records):
+            raise AutoReconnect('database unavailable')
+
+        buffer = RecordBuffer(insert, flush_size=100, flush_interval=60, max_size=2)
+        for _ in range(3):
+            buffer.add(make_record())
+        self.assertEqual(buffer.dropped, 1)
+        self.assertIsNone(buffer.flush())
+        self.assertEqual(len(buffer._records), 2)
+
+    def test_invalid_record_is_dropped(self):
+        buffer = RecordBuffer(insert_records, flush_size=100, flush_interval=60, max_size=10, validate=validate_record)
+        buffer.add(make_record())
+        buffer.add(make_record(unknown_field=True))
+        buffer.add(make_record(outcome=None))
+        buffer.add(make_record(duration_ms=5.0))
+
+        self.assertEqual(buffer.dropped, 2)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(ConversionRecord.objects.count(), 2)
+
+    def test_permanent_insert_error_drops_batch(self):
+        def insert(records):
+            raise ValueError('rejected')
+
+        buffer = RecordBuffer(insert, flush_size=100, flush_interval=60, max_size=10)
+        buffer.add(make_record())
+        buffer.add(make_record())
+        self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.dropped, 2)
+        self.assertEqual(len(buffer._records), 0)
+
+    def test_indexes(self):
+        specs = ConversionRecord._meta['index_specs']
+        ttl = [spec for spec in specs if 'expireAfterSeconds' in spec]
+        self.assertEqual(ttl[0]['fields'], [('created_at', 1)])
+
+        ConversionRecord.ensure_indexes()
+        indexes = ConversionRecord._get_collection().index_information()
+        self.assertIn(
+            [('from_format', 1), ('to_format', 1), ('duration_ms', -1)],
+            [index['key'] for index in indexes.values()]
+        )
+
+    def test_json(self):
+        # Recent, or the TTL index would expire it
+        created_at = datetime.datetime.utcnow().replace(microsecond=0)
+        record = ConversionRecord(created_at=created_at, **make_record()).save()
+        self.assertEqual(record.json['created_at'], created_at.isoformat())
+        self.assertEqual(record.json['id'], str(record.id))
+
+        exported = list(ConversionRecord.export_json(ConversionRecord.objects))
+        self.assertEqual(exported, [record.json])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from storage.local import LocalStorage, MemoryStorage
+from util.file_handler import StorageFull
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    boto3 = None
+
+
+class StorageTests:
+    """Behaviour every backend shares; subclasses set self.storage"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def make_file(self, content=b'converted'):
+        fd, path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_put_and_fetch(self):
+        self.storage.put('ab/result.bin', self.make_file(b'data'))
+        with self.storage.fetch('ab/result.bin') as path:
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'data')
+
+    def test_bytes_round_trip(self):
+        self.storage.put_bytes('ab/result.json', b'{}')
+        self.assertEqual(self.storage.get_bytes('ab/result.json'), b'{}')
+
+    def test_missing_key(self):
+        with self.assertRaises(FileNotFoundError):
+            self.storage.get_bytes('ab/missing.json')
+        with self.assertRaises(FileNotFoundError):
+            with self.storage.fetch('ab/missing.bin'):
+                pass
+
+    def test_list_and_delete(self):
+        self.storage.put('ab/one.bin', self.make_file(b'12345'))
+        self.assertEqual([(key, size) for key, size, _ in self.storage.list()], [('ab/one.bin', 5)])
+        self.storage.delete('ab/one.bin')
+        self.storage.delete('ab/one.bin')
+        self.assertEqual(self.storage.list(), [])
+
+
+class TestLocalStorage(StorageTests, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.storage = LocalStorage(os.path.join(self.tmp_dir, 'store'))
+
+    def test_put_across_filesystems(self):
+        source = self.make_file(b'data')
+        replace = os.replace
+
+        def cross_device_replace(src, dst):
+            # Renaming the source itself crosses devices; temp files don't
+            if src == source:
+                raise OSError(errno.EXDEV, 'Invalid cross-device link')
+            replace(src, dst)
+
+        with mock.patch('storage.local.os.replace', side_effect=cross_device_replace):
+            self.storage.put('ab/result.bin', source)
+
+        self.assertFalse(os.path.exists(source))
+        self.assertEqual([key for key, _, _ in self.storage.list()], ['ab/result.bin'])
+        with self.storage.fetch('ab/result.bin') as path, open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'data')
+
+    def test_keys_cannot_escape_root(self):
+        with self.assertRaises(ValueError):
+            self.storage.put_bytes('../outside', b'')
+
+
+class TestMemoryStorage(StorageTests, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.storage = MemoryStorage(os.path.join(self.tmp_dir, 'shm'), max_bytes=10)
+
+    def test_oldest_evicted_above_cap(self):
+        self.storage.put('aa/old.bin', self.make_file(b'123456'))
+        os.utime(self.storage.local_path('aa/old.bin'), (1, 1))
+        self.storage.put('bb/new.bin', self.make_file(b'123456'))
+        self.assertEqual([key for key, _, _ in self.storage.list()], ['bb/new.bin'])
+
+    def test_file_larger_than_cap_refused(self):
+        with self.assertRaises(StorageFull):
+            self.storage.put('aa/big.bin', self.make_file(b'x' * 11))
+
+
+@unittest.skipIf(boto3 is None, 'boto3 and moto are required for the S3 tests')
+class TestS3Storage(StorageTests, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        from storage.s3 import S3Storage
+
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='filea')
+        self.storage = S3Storage('filea', prefix='results/', client=client)
+
+    def test_presigned_url(self):
+        self.storage.put('ab/result.bin', self.make_file())
+        url = self.storage.url('ab/result.bin', 60, 'report.pdf')
+        self.assertIn('results/ab/result.bin', url)
+        self.assertIsNone(self.storage.local_path('ab/result.bin'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from benchmarks.load import percentile, summarise
+from benchmarks.run import compare, compare_engines
+
+
+def results(seconds, rss_delta_mb):
+    return {'results': {'image_convert/a.png->webp': {
+        'seconds': seconds,
+        'peak_rss_mb': 100 + rss_delta_mb,
+        'rss_delta_mb': rss_delta_mb,
+    }}}
+
+
+class TestBenchmarkCompare(unittest.TestCase):
+
+    def test_within_threshold(self):
+        self.assertEqual(compare(results(1.1, 50), results(1.0, 50), 0.15, 0.2), [])
+
+    def test_slowdown_is_regression(self):
+        self.assertEqual(len(compare(results(1.5, 50), results(1.0, 50), 0.15, 0.2)), 1)
+
+    def test_memory_growth_is_regression(self):
+        self.assertEqual(len(compare(results(1.0, 80), results(1.0, 50), 0.15, 0.2)), 1)
+
+    def test_small_memory_noise_ignored(self):
+        self.assertEqual(compare(results(1.0, 3), results(1.0, 1), 0.15, 0.2), [])
+
+
+class TestEngineComparison(unittest.TestCase):
+
+    def test_pairs_engines(self):
+        current = {
+            'image_convert/a.png->webp': {'seconds': 2.0, 'peak_rss_mb': 300},
+            'image_convert_vips/a.png->webp': {'seconds': 0.5, 'peak_rss_mb': 120},
+            'image_convert/b.png->jpg': {'seconds': 1.0, 'peak_rss_mb': 200},
+            'image_convert_vips/b.png->jpg': {'error': 'MemoryError: '},
+            'pdf_to_word/a.pdf': {'seconds': 3.0, 'peak_rss_mb': 400},
+        }
+        self.assertEqual(compare_engines(current), [('a.png->webp', 2.0, 0.5, 300, 120)])
+
+
+class TestLoadSummary(unittest.TestCase):
+
+    def test_percentile_edges(self):
+        self.assertIsNone(percentile([], 0.5))
+        self.assertEqual(percentile([7], 0.5), 7)
+        self.assertEqual(percentile([7], 0.99), 7)
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 0.5), 3)
+        self.assertEqual(percentile(values, 1.0), 5)
+
+    def test_summary_fields(self):
+        records = [
+            ('/api/convert/image', 200, 0.010),
+            ('/api/convert/image', 200, 0.030),
+            ('/api/convert/image', 503, 0.020),
+            ('/api/convert/pdf-to-word', None, 1.0),
+        ]
+        summary = summarise(records, elapsed=2.0)
+
+        self.assertEqual(set(summary), {'/api/convert/image', '/api/convert/pdf-to-word', 'all'})
+        image = summary['/api/convert/image']
+        self.assertEqual((image['requests'], image['errors']), (3, 1))
+        self.assertAlmostEqual(image['error_rate'], 1 / 3)
+        self.assertEqual(image['throughput_rps'], 1.5)
+        self.assertEqual((image['p50_ms'], image['p99_ms']), (20.0, 30.0))
+        # Connection failures (no status) count as errors
+        self.assertEqual(summary['all']['errors'], 2)
+        self.assertEqual(summary['all']['requests'], 4)
+        self.assertEqual(summarise(records, elapsed=0)['all']['throughput_rps'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
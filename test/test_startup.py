@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import unittest
+
+import config
+from util.import_report import SRC_DIR, importtime_report, format_report
+
+# Libraries that must only be imported on first use under the lazy policy
+HEAVY_MODULES = ('PIL', 'pandas', 'tabula', 'pdf2docx', 'reportlab', 'docx', 'openpyxl')
+
+# Imported before server so that only what the app's own modules pull in is
+# checked: mongoengine imports PIL itself when Pillow is installed
+FRAMEWORK_MODULES = ('flask', 'mongoengine')
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_import_server_within_budget(self):
+        report = importtime_report('server', env={'IMPORT_POLICY': 'lazy'})
+        self.assertLessEqual(report['total_ms'], config.IMPORT_BUDGET_MS, format_report(report))
+
+    def test_converter_libraries_are_lazy(self):
+        output = subprocess.check_output(
+            [sys.executable, '-c',
+             'import sys, %s; loaded = set(sys.modules); import server; '
+             'print(",".join(m for m in %r if m in sys.modules and m not in loaded))'
+             % (', '.join(FRAMEWORK_MODULES), HEAVY_MODULES)],
+            cwd=SRC_DIR,
+            env={'IMPORT_POLICY': 'lazy', 'PYTHONPATH': SRC_DIR},
+            universal_newlines=True
+        )
+        self.assertEqual(output.strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
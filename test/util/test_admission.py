@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+import signal
+import unittest
+
+from util.admission import AdmissionGate, ConverterBusy
+
+
+class TestAdmissionGate(unittest.TestCase):
+
+    def test_rejects_when_queue_full(self):
+        gate = AdmissionGate('pdf-to-excel', concurrency=1, queue_depth=0, queue_timeout=1)
+        with gate.admit():
+            self.assertEqual(gate.stats()['in_flight'], 1)
+            with self.assertRaises(ConverterBusy) as ctx:
+                with gate.admit():
+                    pass
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        self.assertEqual(gate.stats()['in_flight'], 0)
+
+    def test_queue_wait_times_out(self):
+        gate = AdmissionGate('image', concurrency=1, queue_depth=1, queue_timeout=0.05)
+        with gate.admit():
+            with self.assertRaises(ConverterBusy):
+                with gate.admit():
+                    pass
+        self.assertEqual(gate.stats()['queued'], 0)
+
+    def test_slot_released_after_error(self):
+        gate = AdmissionGate('image', concurrency=1, queue_depth=0, queue_timeout=1)
+        with self.assertRaises(RuntimeError):
+            with gate.admit():
+                raise RuntimeError('conversion failed')
+        with gate.admit():
+            pass
+
+    def test_slot_of_killed_process_reclaimed(self):
+        gate = AdmissionGate('pdf-to-excel', concurrency=1, queue_depth=1, queue_timeout=5)
+        holding = multiprocessing.get_context('fork').Event()
+
+        def hold_slot():
+            with gate.admit():
+                holding.set()
+                signal.pause()
+
+        child = multiprocessing.get_context('fork').Process(target=hold_slot)
+        child.start()
+        self.assertTrue(holding.wait(5))
+        self.assertEqual(gate.stats()['in_flight'], 1)
+        os.kill(child.pid, signal.SIGKILL)
+        child.join()
+
+        self.assertEqual(gate.stats()['in_flight'], 0)
+        with gate.admit():
+            self.assertEqual(gate.stats()['in_flight'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
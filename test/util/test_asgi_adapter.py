@@ -0,0 +1,134 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from util import isolation
+from util.asgi_adapter import AsgiAdapter
+
+
+def scope(method='POST', path='/api/echo', headers=()):
+    return {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'a=1',
+        'headers': [(name.encode(), value.encode()) for name, value in headers],
+        'client': ('10.0.0.7', 51000), 'server': ('testserver', 80),
+    }
+
+
+class Client:
+    """
+    Feeds request messages to the adapter and records what it sends; create
+    it inside the running loop, which its queue belongs to on Python < 3.10
+    """
+
+    def __init__(self, chunks=(), disconnect_after=None):
+        self.incoming = asyncio.Queue()
+        for index, chunk in enumerate(chunks):
+            self.incoming.put_nowait({'type': 'http.request', 'body': chunk, 'more_body': index < len(chunks) - 1})
+        self.sent = []
+        self.disconnect_after = disconnect_after
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, message):
+        self.sent.append(message)
+        if message['type'] == 'http.response.body' and len(self.sent) - 1 == self.disconnect_after:
+            self.incoming.put_nowait({'type': 'http.disconnect'})
+            await asyncio.sleep(0)
+
+    @property
+    def status(self):
+        return self.sent[0]['status']
+
+    @property
+    def body(self):
+        return b''.join(message.get('body', b'') for message in self.sent[1:])
+
+
+class TestAsgiAdapter(unittest.IsolatedAsyncioTestCase):
+
+    async def run_app(self, app, client, request_scope, **kwargs):
+        adapter = AsgiAdapter(app, threads=2, **kwargs)
+        self.addCleanup(adapter.executor.shutdown)
+        await adapter(request_scope, client.receive, client.send)
+        return client
+
+    async def test_body_and_environ_reach_app(self):
+        seen = {}
+
+        def app(environ, start_response):
+            seen.update(environ)
+            start_response('201 Created', [('Content-Type', 'text/plain')])
+            return [environ['wsgi.input'].read()]
+
+        headers = [('content-type', 'text/plain'), ('content-length', '11'), ('x-request-id', 'abc')]
+        client = await self.run_app(app, Client([b'hello ', b'world']), scope(headers=headers))
+        self.assertEqual(client.status, 201)
+        self.assertEqual(client.body, b'hello world')
+        self.assertEqual(client.sent[0]['headers'], [(b'content-type', b'text/plain')])
+        self.assertEqual(seen['PATH_INFO'], '/api/echo')
+        self.assertEqual(seen['QUERY_STRING'], 'a=1')
+        self.assertEqual(seen['REMOTE_ADDR'], '10.0.0.7')
+        self.assertEqual(seen['CONTENT_LENGTH'], '11')
+        self.assertEqual(seen['HTTP_X_REQUEST_ID'], 'abc')
+
+    async def test_response_streamed_in_chunks(self):
+        def app(environ, start_response):
+            start_response('200 OK', [])
+            yield b'one'
+            yield b'two'
+
+        client = await self.run_app(app, Client([b'']), scope(method='GET'))
+        self.assertEqual([message.get('body') for message in client.sent[1:]], [b'one', b'two', b''])
+        self.assertFalse(client.sent[-1]['more_body'])
+
+    async def test_oversized_body_rejected(self):
+        app = mock.Mock()
+        declared = await self.run_app(app, Client(), scope(headers=[('content-length', '100')]), max_body_size=10)
+        streamed = await self.run_app(app, Client([b'x' * 8, b'x' * 8]), scope(), max_body_size=10)
+        self.assertEqual((declared.status, streamed.status), (413, 413))
+        app.assert_not_called()
+
+    async def test_disconnect_visible_to_app(self):
+        closed = []
+
+        class Body:
+            def __init__(self, environ):
+                self.environ = environ
+
+            def __iter__(self):
+                for _ in range(50):
+                    if isolation.client_disconnected(self.environ):
+                        return
+                    time.sleep(0.01)
+                    yield b'chunk'
+
+            def close(self):
+                closed.append(isolation.client_disconnected(self.environ))
+
+        def app(environ, start_response):
+            start_response('200 OK', [])
+            return Body(environ)
+
+        client = await self.run_app(app, Client([b''], disconnect_after=1), scope(method='GET'))
+        self.assertLess(len(client.sent), 50)
+        self.assertEqual(closed, [True])
+
+    async def test_lifespan(self):
+        messages = asyncio.Queue()
+        messages.put_nowait({'type': 'lifespan.startup'})
+        messages.put_nowait({'type': 'lifespan.shutdown'})
+        sent = []
+
+        async def send(message):
+            sent.append(message['type'])
+
+        with mock.patch('util.janitor.start') as start:
+            await AsgiAdapter(mock.Mock(), threads=1)({'type': 'lifespan'}, messages.get, send)
+        start.assert_called_once_with()
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+import zlib
+from unittest import mock
+
+from werkzeug.datastructures import FileStorage
+
+import config
+from converters.registry import get_registry
+from util import batch
+from util.file_handler import FileHandler
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def png_bytes(color):
+    data = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(data, 'PNG')
+    return data.getvalue()
+
+
+@unittest.skipIf(Image is None, 'Pillow not installed')
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        for target, name, value in (
+            (FileHandler, 'UPLOAD_FOLDER', os.path.join(self.tmp_dir, 'uploads')),
+            (FileHandler, 'OUTPUT_FOLDER', os.path.join(self.tmp_dir, 'outputs')),
+            (config, 'MIN_FREE_DISK_MB', 0),
+            (config, 'CONVERSION_ISOLATION', False),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def archive(self, members):
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, 'w') as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+        return FileStorage(io.BytesIO(data.getvalue()), 'photos.zip')
+
+    def run_batch(self, uploads, targets):
+        registry = get_registry()
+        entries = batch.receive(uploads, registry.formats())
+        batch.plan(entries, batch.parse_targets(json.dumps(targets)), registry)
+        body = b''.join(batch.stream(entries, workers=2))
+        return zipfile.ZipFile(io.BytesIO(body))
+
+    def leftover_files(self):
+        return [files for _, _, files in os.walk(self.tmp_dir) if files]
+
+    def test_archive_converted_with_manifest(self):
+        upload = self.archive({
+            'red.png': png_bytes('red'),
+            'nested/blue.png': png_bytes('blue'),
+            '../escape.png': png_bytes('green'),
+            'broken.png': b'not an image',
+            'notes.txt': b'hello',
+        })
+        with self.run_batch([upload], {'png': 'webp'}) as result:
+            names = result.namelist()
+            manifest = json.loads(result.read(batch.MANIFEST_NAME))
+            with Image.open(io.BytesIO(result.read('nested/blue.webp'))) as image:
+                self.assertEqual(image.format, 'WEBP')
+
+        self.assertEqual(names[-1], batch.MANIFEST_NAME)
+        self.assertEqual(sorted(names[:-1]), ['escape.webp', 'nested/blue.webp', 'red.webp'])
+        self.assertEqual((manifest['ok'], manifest['failed'], manifest['skipped']), (3, 1, 1))
+        by_name = {entry['name']: entry for entry in manifest['entries']}
+        self.assertEqual(by_name['broken.png']['status'], 'failed')
+        self.assertEqual(by_name['notes.txt']['code'], 'unsupported_format')
+        self.assertGreater(by_name['red.png']['output_size'], 0)
+        self.assertIsNotNone(by_name['red.png']['duration_ms'])
+        self.assertEqual(self.leftover_files(), [])
+
+    def test_entries_use_fast_compression(self):
+        compressobj = zlib.compressobj
+        levels = []
+
+        def record_level(level, *args):
+            levels.append(level)
+            return compressobj(level, *args)
+
+        with mock.patch('zlib.compressobj', side_effect=record_level):
+            with self.run_batch([FileStorage(io.BytesIO(png_bytes('red')), 'a.png')], {'png': 'bmp'}) as result:
+                self.assertEqual(sorted(result.namelist()), ['a.bmp', 'manifest.json'])
+        self.assertEqual(levels, [1, 1])
+
+    def test_separate_files_and_name_clashes(self):
+        bmp = io.BytesIO()
+        Image.new('RGB', (8, 8)).save(bmp, 'BMP')
+        uploads = [
+            FileStorage(io.BytesIO(png_bytes('red')), 'cover.png'),
+            FileStorage(io.BytesIO(bmp.getvalue()), 'cover.bmp'),
+        ]
+        with self.run_batch(uploads, {'*': 'jpg'}) as result:
+            self.assertEqual(sorted(result.namelist()), ['cover.jpg', 'cover_1.jpg', 'manifest.json'])
+
+    def test_limits(self):
+        with mock.patch.object(config, 'BATCH_MAX_ENTRIES', 1):
+            with self.assertRaises(ValueError):
+                batch.receive([self.archive({'a.png': b'1', 'b.png': b'2'})], ['png'])
+        with self.assertRaises(ValueError):
+            batch.parse_targets('["webp"]')
+        self.assertEqual(self.leftover_files(), [])
+
+    def test_closing_stream_cancels_and_cleans_up(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_convert(input_path, output_path, fmt, engine=None):
+            calls.append(input_path)
+            started.set()
+            if len(calls) == 1:
+                release.wait(5)
+            else:
+                # Still converting when the stream is closed
+                time.sleep(0.5)
+            shutil.copy(input_path, output_path)
+
+        upload = self.archive({f'{index}.png': png_bytes('red') for index in range(4)})
+        registry = get_registry()
+        entries = batch.receive([upload], registry.formats())
+        batch.plan(entries, {'png': 'webp'}, registry)
+        with mock.patch('converters.image_converter.ImageConverter.convert', side_effect=slow_convert):
+            stream = batch.stream(entries, workers=1)
+            thread = threading.Thread(target=lambda: next(stream, None))
+            thread.start()
+            started.wait(5)
+            release.set()
+            thread.join(5)
+            stream.close()
+        self.assertLess(sum(entry.status == 'ok' for entry in entries), 4)
+        self.assertEqual(self.leftover_files(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
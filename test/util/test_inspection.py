@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from util import inspection
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+APP_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+    '<Pages>3</Pages><Words>420</Words><Paragraphs>12</Paragraphs></Properties>'
+)
+
+
+class TestInspection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        patcher = mock.patch.object(inspection, '_cache', inspection.InspectionCache(8))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    @unittest.skipIf(Image is None, 'Pillow is required')
+    def test_image(self):
+        Image.new('RGB', (320, 200)).save(self.path('photo.png'))
+        info = inspection.inspect_file(self.path('photo.png'), 'png')
+        self.assertEqual((info['type'], info['width'], info['height']), ('image', 320, 200))
+        self.assertIn('jpg', info['estimated_seconds'])
+        self.assertEqual(len(info['sha256']), 64)
+
+    @unittest.skipIf(fitz is None, 'PyMuPDF is required')
+    def test_pdf(self):
+        with fitz.open() as pdf:
+            for _ in range(4):
+                pdf.new_page(width=595, height=842)
+            pdf.save(self.path('report.pdf'))
+        info = inspection.inspect_file(self.path('report.pdf'), 'pdf')
+        self.assertEqual(info['pages'], 4)
+        self.assertEqual((info['page_width'], info['page_height']), (595, 842))
+        self.assertIn('docx', info['estimated_seconds'])
+
+    def test_docx_properties(self):
+        with zipfile.ZipFile(self.path('letter.docx'), 'w') as package:
+            package.writestr('docProps/app.xml', APP_XML)
+        info = inspection.inspect_file(self.path('letter.docx'), 'docx')
+        self.assertEqual((info['pages'], info['words'], info['paragraphs']), (3, 420, 12))
+
+    @unittest.skipIf(openpyxl is None, 'openpyxl is required')
+    def test_xlsx_sheets(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.title = 'Summary'
+        workbook.active['C5'] = 'x'
+        workbook.create_sheet('Data')['B2'] = 'y'
+        workbook.save(self.path('book.xlsx'))
+
+        info = inspection.inspect_file(self.path('book.xlsx'), 'xlsx')
+        self.assertEqual(info['sheet_count'], 2)
+        self.assertEqual(info['sheets'][0], {'name': 'Summary', 'dimension': 'C5:C5', 'rows': 5, 'columns': 3})
+        self.assertEqual(info['sheets'][1]['name'], 'Data')
+
+    def test_memoised_by_content(self):
+        with zipfile.ZipFile(self.path('a.docx'), 'w') as package:
+            package.writestr('docProps/app.xml', APP_XML)
+        shutil.copyfile(self.path('a.docx'), self.path('b.docx'))
+
+        with mock.patch.object(inspection, 'read_headers', wraps=inspection.read_headers) as read_headers:
+            first = inspection.inspect_file(self.path('a.docx'), 'docx')
+            second = inspection.inspect_file(self.path('b.docx'), 'docx')
+        self.assertEqual(read_headers.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_unreadable_file(self):
+        with open(self.path('broken.xlsx'), 'wb') as f:
+            f.write(b'not a spreadsheet')
+        with self.assertRaises(ValueError):
+            inspection.inspect_file(self.path('broken.xlsx'), 'xlsx')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from mock import patch
+
+import config
+from converters import registry as registry_module
+from converters.registry import ConverterRegistry
+from util import isolation, progress
+
+
+def copy_file(input_path, output_path, suffix=''):
+    shutil.copyfile(input_path, output_path)
+    with open(output_path, 'a') as f:
+        f.write(suffix)
+
+
+def sleep_forever(input_path, output_path):
+    time.sleep(60)
+
+
+def allocate(input_path, output_path):
+    bytearray(512 * 1024 * 1024)
+
+
+def reject(input_path, output_path):
+    raise ValueError('Unsupported input')
+
+
+def report_pages(input_path, output_path):
+    for page in range(1, 4):
+        progress.report(pages_parsed=page, pages_total=3)
+    shutil.copyfile(input_path, output_path)
+
+
+class FakeConverter:
+
+    @staticmethod
+    def get_conversions():
+        return [
+            ('copy', 'a', 'b', 1.0, copy_file),
+            ('sleep', 'a', 'c', 1.0, sleep_forever),
+            ('allocate', 'a', 'd', 1.0, allocate),
+            ('reject', 'a', 'e', 1.0, reject),
+            ('pages', 'a', 'f', 1.0, report_pages),
+        ]
+
+
+@patch.object(config, 'CONVERSION_ISOLATION', True)
+@patch.object(config, 'CONVERSION_START_METHOD', 'fork')
+@patch.object(config, 'CONVERSION_MEMORY_LIMIT_MB', 256)
+@patch.object(config, 'CONVERSION_TIMEOUT', 1)
+class TestIsolation(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ConverterRegistry()
+        self.registry.register(FakeConverter)
+        self.patcher = patch.object(registry_module, '_registry', self.registry)
+        self.patcher.start()
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.tmp_dir, 'input.a')
+        with open(self.input_path, 'w') as f:
+            f.write('data')
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def run_edge(self, to_format, **kwargs):
+        edge = self.registry.get_edge('a', to_format)
+        output_path = os.path.join(self.tmp_dir, 'output.' + to_format)
+        return isolation.run_edge(edge, self.input_path, output_path, **kwargs)
+
+    def test_success(self):
+        output_path = self.run_edge('b')
+        self.assertTrue(os.path.exists(output_path))
+
+    def test_options_reach_child(self):
+        output_path = self.run_edge('b', options={'suffix': '!'})
+        with open(output_path) as f:
+            self.assertEqual(f.read(), 'data!')
+
+    def test_timeout(self):
+        with self.assertRaises(isolation.ConversionTimeout):
+            self.run_edge('c')
+
+    def test_memory_limit(self):
+        with self.assertRaises(isolation.ConversionMemoryExceeded):
+            self.run_edge('d')
+
+    def test_cancelled(self):
+        with self.assertRaises(isolation.ConversionCancelled):
+            self.run_edge('c', cancelled=lambda: True)
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            self.run_edge('e')
+
+    def test_progress_from_child(self):
+        states = []
+        progress.start(sink=states.append)
+        self.addCleanup(progress.finish)
+        self.run_edge('f')
+
+        self.assertEqual(states[0], {'status': 'converting', 'converter': 'pages'})
+        # Throttled in the child: the first report goes through, the rest wait
+        self.assertEqual(states[1]['pages_parsed'], 1)
+        self.assertEqual(states[1]['converter'], 'pages')
+
+
+@unittest.skipIf(importlib.util.find_spec('PIL') is None, 'Pillow is required for a real conversion')
+@patch.object(config, 'CONVERSION_ISOLATION', True)
+@patch.object(config, 'CONVERSION_START_METHOD', 'forkserver')
+class TestForkServer(unittest.TestCase):
+
+    def test_converts_in_fork_server_child(self):
+        from PIL import Image
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        input_path = os.path.join(tmp_dir, 'input.png')
+        output_path = os.path.join(tmp_dir, 'output.bmp')
+        Image.new('RGB', (8, 8), 'red').save(input_path)
+
+        edge = registry_module.get_registry().get_edge('png', 'bmp')
+        isolation.run_edge(edge, input_path, output_path)
+        with Image.open(output_path) as image:
+            self.assertEqual((image.format, image.size), ('BMP', (8, 8)))
+
+
+if __name__ == '__main__':
+    unittest.main()
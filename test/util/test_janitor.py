@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import config
+from util import janitor, progress
+from util.file_handler import FileHandler, StorageFull
+from storage.local import LocalStorage
+from util.result_store import ResultStore
+
+
+class TestJanitor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        for target, name, value in (
+            (FileHandler, 'UPLOAD_FOLDER', os.path.join(self.tmp_dir, 'uploads')),
+            (FileHandler, 'OUTPUT_FOLDER', os.path.join(self.tmp_dir, 'outputs')),
+            (progress, 'PROGRESS_FOLDER', os.path.join(self.tmp_dir, 'progress')),
+            (config, 'ORPHAN_TTL', 60),
+            (config, 'DISK_QUOTA_MB', 0),
+            (config, 'MIN_FREE_DISK_MB', 0),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('storage.base._storage', LocalStorage(os.path.join(self.tmp_dir, 'results')))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, path, size, age=0):
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def test_output_paths_are_sharded(self):
+        path = FileHandler.get_output_path('report.pdf', 'docx')
+        shard = os.path.basename(os.path.dirname(path))
+        self.assertEqual(os.path.dirname(os.path.dirname(path)), FileHandler.OUTPUT_FOLDER)
+        self.assertEqual(len(shard), 2)
+        self.assertIn(shard, os.path.basename(path))
+
+    def test_orphans_removed(self):
+        old = self.write(FileHandler.get_output_path('old.pdf', 'docx'), 100, age=120)
+        new = self.write(FileHandler.get_output_path('new.pdf', 'docx'), 10)
+
+        report = janitor.sweep()
+
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+        self.assertEqual(report['orphan'], 100)
+        self.assertEqual(report['usage'], 10)
+
+    def test_oldest_results_evicted_over_quota(self):
+        results = []
+        for age in (300, 200, 100):
+            output = self.write(FileHandler.get_output_path('a.pdf', 'docx'), 400 * 1024)
+            result = ResultStore.save(output, 'a.docx')
+            os.utime(result['path'], (time.time() - age, time.time() - age))
+            results.append(result['id'])
+
+        with mock.patch.object(config, 'DISK_QUOTA_MB', 1):
+            report = janitor.sweep()
+
+        self.assertEqual(report['quota'], 400 * 1024)
+        self.assertIsNone(ResultStore.get(results[0]))
+        self.assertIsNotNone(ResultStore.get(results[2]))
+        self.assertEqual(FileHandler.usage.value, 800 * 1024)
+
+    def test_uploads_refused_over_quota(self):
+        self.write(FileHandler._sharded_path(FileHandler.UPLOAD_FOLDER, 'ab', 'ab.pdf'), 2 * 1024 * 1024)
+        janitor.sweep()
+        with mock.patch.object(config, 'DISK_QUOTA_MB', 1):
+            with self.assertRaises(StorageFull):
+                FileHandler.check_capacity()
+
+    def test_uploads_refused_when_disk_nearly_full(self):
+        with mock.patch.object(config, 'MIN_FREE_DISK_MB', 1 << 40):
+            with self.assertRaises(StorageFull):
+                FileHandler.check_capacity()
+
+
+if __name__ == '__main__':
+    unittest.main()
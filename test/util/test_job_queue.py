@@ -0,0 +1,153 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from mock import patch
+
+from mongoengine import connect, disconnect
+
+import config
+from converters import registry as registry_module
+from converters.registry import ConverterRegistry
+from model.conversion_job import ConversionJob
+from storage.local import LocalStorage
+from util import admission, job_queue, progress
+from util.file_handler import FileHandler
+from util.result_store import ResultStore
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+def copy_file(input_path, output_path):
+    shutil.copyfile(input_path, output_path)
+
+
+def reject(input_path, output_path):
+    raise ValueError('Unsupported input')
+
+
+class FakeConverter:
+
+    @staticmethod
+    def get_conversions():
+        return [
+            ('image', 'png', 'jpg', 0.05, copy_file),
+            ('pdf-to-word', 'pdf', 'docx', 2.0, copy_file),
+            ('pdf-to-excel', 'pdf', 'xlsx', 3.0, reject),
+        ]
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is required for the MongoDB tests')
+@patch.object(config, 'CONVERSION_ISOLATION', False)
+@patch.object(config, 'JOB_MAX_ATTEMPTS', 2)
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        connect('filea_test', host='mongomock://localhost')
+        self.addCleanup(disconnect)
+        ConversionJob.drop_collection()
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        registry = ConverterRegistry()
+        registry.register(FakeConverter)
+        for target, name, value in (
+            (registry_module, '_registry', registry),
+            (FileHandler, 'OUTPUT_FOLDER', os.path.join(self.tmp_dir, 'outputs')),
+            (progress, 'PROGRESS_FOLDER', os.path.join(self.tmp_dir, 'progress')),
+        ):
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch('storage.base._storage', LocalStorage(os.path.join(self.tmp_dir, 'store')))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def enqueue(self, from_format, to_format):
+        path = os.path.join(self.tmp_dir, f'upload.{from_format}')
+        with open(path, 'w') as f:
+            f.write('data')
+        return job_queue.enqueue(path, from_format, to_format, f'report.{to_format}')
+
+    def expire_lease(self, job):
+        ConversionJob.objects(id=job.id).update_one(
+            set__lease_expires=datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+        )
+
+    def test_queued_job_reports_progress(self):
+        job = self.enqueue('png', 'jpg')
+        self.assertEqual(job_queue.read_progress(str(job.id))['status'], 'queued')
+        self.assertIsNone(job_queue.read_progress('not-a-job-id'))
+
+    def test_quick_conversions_claimed_first(self):
+        slow = self.enqueue('pdf', 'docx')
+        quick = self.enqueue('png', 'jpg')
+
+        self.assertEqual(job_queue.claim('a').id, quick.id)
+        self.assertEqual(job_queue.claim('b').id, slow.id)
+        self.assertIsNone(job_queue.claim('c'))
+
+    def test_expired_lease_is_retried(self):
+        job = self.enqueue('png', 'jpg')
+        self.assertEqual(job_queue.claim('a').id, job.id)
+        self.assertIsNone(job_queue.claim('b'))
+
+        self.expire_lease(job)
+        retried = job_queue.claim('b')
+        self.assertEqual(retried.lease_owner, 'b')
+        self.assertEqual(retried.attempts, 2)
+        # The first worker lost its lease and can't finish the job
+        self.assertFalse(job_queue.heartbeat(job, 'a'))
+        self.assertFalse(job_queue.complete(job, 'a', 'result'))
+
+    def test_last_attempt_expiring_fails_job(self):
+        job = self.enqueue('png', 'jpg')
+        for worker_id in ('a', 'b'):
+            job_queue.claim(worker_id)
+            self.expire_lease(job)
+
+        self.assertIsNone(job_queue.claim('c'))
+        self.assertEqual(job_queue.reap(), 1)
+        self.assertEqual(ConversionJob.objects.get(id=job.id).status, ConversionJob.FAILED)
+
+    def test_run_job(self):
+        job = self.enqueue('pdf', 'docx')
+        job_queue.run_job(job_queue.claim('a'), 'a')
+
+        job.reload()
+        self.assertEqual(job.status, ConversionJob.DONE)
+        self.assertIsNotNone(ResultStore.get(job.result_id))
+        # On the job, so any node can stream it
+        self.assertEqual(job_queue.read_progress(str(job.id))['status'], 'done')
+        self.assertIsNone(progress.read(str(job.id)))
+
+    def test_rejected_input_not_retried(self):
+        job = self.enqueue('pdf', 'xlsx')
+        job_queue.run_job(job_queue.claim('a'), 'a')
+
+        job.reload()
+        self.assertEqual(job.status, ConversionJob.FAILED)
+        self.assertEqual(job.error_code, 'invalid_request')
+
+    def test_busy_converter_releases_job_with_backoff(self):
+        job = self.enqueue('png', 'jpg')
+        with patch.object(admission, 'admit', side_effect=admission.ConverterBusy('image', 30)):
+            job_queue.run_job(job_queue.claim('a'), 'a')
+
+        job.reload()
+        self.assertEqual(job.status, ConversionJob.QUEUED)
+        self.assertEqual(job.attempts, 0)
+        # Not claimable again until the converter may have a slot
+        self.assertIsNone(job_queue.claim('b'))
+        ConversionJob.objects(id=job.id).update_one(
+            set__not_before=datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+        )
+        self.assertEqual(job_queue.claim('b').id, job.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import io
+import json
+import logging
+import os
+import queue
+import tempfile
+import unittest
+
+from util import log, metrics
+
+
+class TestLog(unittest.TestCase):
+
+    def setUp(self):
+        root = logging.getLogger()
+        handlers, level = list(root.handlers), root.level
+
+        def restore():
+            log.stop()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            for handler in handlers:
+                root.addHandler(handler)
+            root.setLevel(level)
+        self.addCleanup(restore)
+        self.logger = logging.getLogger('filea.test')
+
+    def records(self, stream):
+        log.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_json_records_carry_request_id(self):
+        stream = io.StringIO()
+        log.setup('INFO', stream=stream)
+        request_id = log.start_request('edge-1234')
+        self.logger.info('converted %s', 'report.pdf', extra={'converter': 'pdf-to-word'})
+        try:
+            raise RuntimeError('boom')
+        except RuntimeError:
+            self.logger.exception('failed')
+        self.logger.debug('not written')
+
+        first, second = self.records(stream)
+        self.assertEqual(request_id, 'edge-1234')
+        self.assertEqual(first['message'], 'converted report.pdf')
+        self.assertEqual(first['request_id'], 'edge-1234')
+        self.assertEqual(first['converter'], 'pdf-to-word')
+        self.assertEqual(second['level'], 'ERROR')
+        self.assertIn('RuntimeError: boom', second['exception'])
+
+    def test_unusable_request_id_replaced(self):
+        self.assertNotEqual(log.start_request('bad id\n'), 'bad id\n')
+
+    def test_successes_sampled_errors_kept(self):
+        stream = io.StringIO()
+        log.setup('INFO', sample_rate=0, stream=stream)
+        for status in (200, 404, 500):
+            log.start_request()
+            log.annotate(outcome='ok')
+            log.finish_request(self.logger, status, method='POST', path='/convert/image', stages={'convert': 12.5})
+
+        records = self.records(stream)
+        self.assertEqual([record['status'] for record in records], [404, 500])
+        self.assertEqual([record['level'] for record in records], ['WARNING', 'ERROR'])
+        self.assertEqual(records[1]['stages'], {'convert': 12.5})
+        self.assertEqual(records[1]['outcome'], 'ok')
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = log.RequestQueueHandler(queue.Queue(1))
+        record = logging.LogRecord('filea.test', logging.INFO, __file__, 1, 'message', (), None)
+        before = metrics.LOG_RECORDS_DROPPED._collect().get((), [0])[0]
+        handler.handle(record)
+        handler.handle(record)
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(metrics.LOG_RECORDS_DROPPED._collect()[()][0], before + 1)
+
+    def test_forked_child_logs(self):
+        with tempfile.TemporaryFile('w+') as stream:
+            log.setup('INFO', stream=stream)
+            pid = os.fork()
+            if pid == 0:
+                self.logger.info('from the child')
+                log.stop()
+                os._exit(0)
+            os.waitpid(pid, 0)
+            log.stop()
+            stream.seek(0)
+            self.assertEqual(json.loads(stream.readline())['message'], 'from the child')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from util import mapped_file
+from util.mapped_file import mapped
+
+
+class TestMappedFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'input.pdf')
+        with open(self.path, 'wb') as f:
+            f.write(b'%PDF-1.7 content')
+
+    def test_maps_file(self):
+        with mapped(self.path) as buffer:
+            self.assertEqual(bytes(buffer[:8]), b'%PDF-1.7')
+            self.assertTrue(buffer.readonly)
+
+    def test_nested_users_share_one_mapping(self):
+        with mapped(self.path) as outer:
+            with mapped(os.path.join(self.tmp_dir, '.', 'input.pdf')) as inner:
+                self.assertIs(inner, outer)
+            # Still mapped for the outer user
+            self.assertEqual(bytes(outer[-7:]), b'content')
+        self.assertEqual(mapped_file._local.files, {})
+        with self.assertRaises(ValueError):
+            outer[0]
+
+    def test_empty_file_rejected(self):
+        empty_path = os.path.join(self.tmp_dir, 'empty.pdf')
+        open(empty_path, 'wb').close()
+        with self.assertRaises(ValueError):
+            with mapped(empty_path):
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import threading
+import unittest
+
+from util import metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_counter_sums_threads(self):
+        counter = metrics.Counter('test_events_total', 'Test events', ('kind',))
+
+        def worker():
+            for _ in range(100):
+                counter.inc('a')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIn('test_events_total{kind="a"} 400', counter.render())
+
+    def test_ended_threads_are_folded_in(self):
+        counter = metrics.Counter('test_retired_total', 'Test events')
+        shards = len(metrics._shards)
+        for _ in range(20):
+            thread = threading.Thread(target=counter.inc, kwargs={'amount': 2})
+            thread.start()
+            thread.join()
+
+        self.assertEqual(len(metrics._shards), shards)
+        self.assertIn('test_retired_total 40', counter.render())
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'Test latency', ('endpoint',), buckets=(0.1, 1))
+        histogram.observe(0.05, '/x')
+        histogram.observe(0.5, '/x')
+        histogram.observe(5, '/x')
+
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{endpoint="/x",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{endpoint="/x",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{endpoint="/x",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{endpoint="/x"} 3', lines)
+
+    def test_gauge_track(self):
+        gauge = metrics.Gauge('test_in_flight', 'Test gauge')
+        with gauge.track():
+            self.assertIn('test_in_flight 1', gauge.render())
+        self.assertIn('test_in_flight 0', gauge.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from util import progress
+
+
+class TestProgress(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        patcher = mock.patch.object(progress, 'PROGRESS_FOLDER', self.tmp_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(progress.finish)
+
+    def test_untracked_report_is_ignored(self):
+        progress.report(pages_parsed=1)
+        self.assertIsNone(progress.current())
+
+    def test_reports_are_throttled(self):
+        states = []
+        with mock.patch.object(config, 'PROGRESS_INTERVAL_MS', 60000):
+            progress.start(sink=states.append)
+        for page in range(1, 101):
+            progress.report(pages_parsed=page, pages_total=100)
+        self.assertEqual(len(states), 1)
+
+        progress.finish(status='done')
+        self.assertEqual(states[-1], {'pages_parsed': 100, 'pages_total': 100, 'status': 'done'})
+
+    def test_begin_resets_details(self):
+        states = []
+        progress.start(sink=states.append)
+        progress.report(pages_parsed=3)
+        progress.begin('word-to-pdf')
+        self.assertEqual(states[-1], {'status': 'converting', 'converter': 'word-to-pdf'})
+
+    def test_stream_ends_with_final_event(self):
+        progress.start('conversion-1').publish(status='converting', pages_parsed=2)
+        progress.finish(status='done', result_id='abc')
+
+        events = list(progress.stream('conversion-1', timeout=5))
+        self.assertEqual(events[0], 'retry: 1000\n\n')
+        name, data = events[1].strip().split('\n')
+        self.assertEqual(name, 'event: done')
+        state = json.loads(data[len('data: '):])
+        self.assertEqual(state['result_id'], 'abc')
+        self.assertEqual(state['pages_parsed'], 2)
+
+    def test_stream_ends_after_window(self):
+        with mock.patch.object(progress, 'STREAM_POLL_INTERVAL', 0.01):
+            events = list(progress.stream('unknown-conversion', timeout=0.05))
+        # The client reconnects after `retry` to keep following
+        self.assertEqual(events, ['retry: 1000\n\n'])
+
+    def test_stream_reads_from_reader(self):
+        states = iter([None, {'status': 'queued', 'updated': 1}, {'status': 'queued', 'updated': 1},
+                       {'status': 'done', 'updated': 2}])
+        with mock.patch.object(progress, 'STREAM_POLL_INTERVAL', 0):
+            events = list(progress.stream('job-1234', timeout=5, reader=lambda progress_id: next(states)))
+        self.assertEqual([event.split('\n')[0] for event in events[1:]], ['event: progress', 'event: done'])
+
+    def test_streams_are_capped(self):
+        with mock.patch.object(progress, '_stream_slots', progress.threading.BoundedSemaphore(1)):
+            self.assertTrue(progress.acquire_stream())
+            self.assertFalse(progress.acquire_stream())
+            progress.release_stream()
+            self.assertTrue(progress.acquire_stream())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import unittest
+
+from util import rate_limit
+from util.rate_limit import TokenBuckets
+
+
+class TestTokenBuckets(unittest.TestCase):
+
+    def test_allows_burst_then_asks_to_wait(self):
+        buckets = TokenBuckets(slots=64, capacity=10, refill_rate=2)
+        self.assertEqual(buckets.take('client', 4, now=100), 0)
+        self.assertEqual(buckets.take('client', 6, now=100), 0)
+        self.assertAlmostEqual(buckets.take('client', 4, now=100), 2.0)
+
+    def test_refills_over_time(self):
+        buckets = TokenBuckets(slots=64, capacity=10, refill_rate=2)
+        buckets.take('client', 10, now=100)
+        self.assertGreater(buckets.take('client', 4, now=101), 0)
+        self.assertEqual(buckets.take('client', 4, now=102), 0)
+
+    def test_clients_have_separate_buckets(self):
+        buckets = TokenBuckets(slots=64, capacity=5, refill_rate=1)
+        buckets.take('partner', 5, now=100)
+        self.assertGreater(buckets.take('partner', 1, now=100), 0)
+        self.assertEqual(buckets.take('someone-else', 1, now=100), 0)
+
+    def test_cost_above_capacity_needs_a_full_bucket(self):
+        buckets = TokenBuckets(slots=64, capacity=5, refill_rate=1)
+        self.assertEqual(buckets.take('client', 50, now=100), 0)
+        self.assertAlmostEqual(buckets.take('client', 50, now=100), 5.0)
+
+    def test_full_set_reuses_idlest_slot(self):
+        buckets = TokenBuckets(slots=TokenBuckets.WAYS, capacity=5, refill_rate=1)
+        for index in range(TokenBuckets.WAYS + 4):
+            self.assertEqual(buckets.take(f'client-{index}', 5, now=100 + index), 0)
+        # client-0 was evicted, so it starts over with a full bucket
+        self.assertEqual(buckets.take('client-0', 5, now=200), 0)
+
+    def test_shared_across_fork(self):
+        buckets = TokenBuckets(slots=64, capacity=10, refill_rate=0.001)
+        pid = os.fork()
+        if pid == 0:
+            buckets.take('client', 10)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertGreater(buckets.take('client', 1), 0)
+
+
+class TestRequestCost(unittest.TestCase):
+
+    def test_weights_by_converter(self):
+        self.assertGreater(rate_limit.request_cost(['pdf-to-excel']), rate_limit.request_cost(['image']))
+        self.assertEqual(
+            rate_limit.request_cost(['excel-to-pdf', 'pdf-to-word']),
+            rate_limit.request_cost(['excel-to-pdf']) + rate_limit.request_cost(['pdf-to-word'])
+        )
+
+    def test_requests_without_converters_are_free(self):
+        self.assertEqual(rate_limit.take('client', []), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
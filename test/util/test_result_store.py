@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from storage import get_storage
+from storage.local import LocalStorage
+from util.result_store import ResultStore, _parse_range
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        patcher = mock.patch('storage.base._storage', LocalStorage(os.path.join(self.tmp_dir, 'results')))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def make_output(self, content=b'converted'):
+        path = os.path.join(self.tmp_dir, 'output.pdf')
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_save_and_get(self):
+        output_path = self.make_output()
+        result = ResultStore.save(output_path, 'report.pdf')
+
+        self.assertFalse(os.path.exists(output_path))
+        stored = ResultStore.get(result['id'])
+        self.assertEqual(stored['download_name'], 'report.pdf')
+        self.assertEqual(stored['size'], len(b'converted'))
+
+    def test_unknown_or_malformed_id(self):
+        self.assertIsNone(ResultStore.get('0' * 32))
+        self.assertIsNone(ResultStore.get('../../etc/passwd'))
+
+    def test_expired_results_purged(self):
+        with mock.patch.object(config, 'RESULT_TTL', -1):
+            result = ResultStore.save(self.make_output(), 'old.pdf')
+        self.assertIsNone(ResultStore.get(result['id']))
+
+        self.assertEqual(ResultStore.purge_expired(), len(b'converted'))
+        self.assertEqual(ResultStore.list_results(), [])
+
+    def test_live_results_kept_by_purge(self):
+        result = ResultStore.save(self.make_output(), 'new.pdf')
+        self.assertEqual(ResultStore.purge_expired(), 0)
+        self.assertIsNotNone(ResultStore.get(result['id']))
+
+    def test_job_inputs_not_listed(self):
+        ResultStore.save(self.make_output(), 'kept.pdf')
+        get_storage().put('jobs/' + 'cd' * 16 + '.png', self.make_output(b'queued input'))
+
+        listed = [result_id for result_id, _, _, _ in ResultStore.list_results()]
+        self.assertEqual(len(listed), 1)
+        self.assertNotIn('cd' * 16, listed)
+        self.assertEqual(ResultStore.purge_expired(), 0)
+
+    def test_variant_stored_under_its_id(self):
+        variant_id = ResultStore.variant_id('ab' * 32, 'avif')
+        self.assertNotEqual(variant_id, ResultStore.variant_id('ab' * 32, 'webp'))
+        self.assertIsNone(ResultStore.get(variant_id))
+
+        ResultStore.save(self.make_output(), 'photo.avif', result_id=variant_id)
+        self.assertEqual(ResultStore.get(variant_id)['download_name'], 'photo.avif')
+
+
+class TestParseRange(unittest.TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(_parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(_parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(_parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(_parse_range('bytes=990-2000', 1000), (990, 999))
+
+    def test_missing_or_multipart_range_sends_everything(self):
+        self.assertIsNone(_parse_range(None, 1000))
+        self.assertIsNone(_parse_range('bytes=0-1,5-6', 1000))
+
+    def test_unsatisfiable(self):
+        self.assertEqual(_parse_range('bytes=1000-', 1000), 'invalid')
+        self.assertEqual(_parse_range('bytes=5-1', 1000), 'invalid')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from util.file_handler import FileHandler
+from util.resumable_upload import ChecksumMismatch, ResumableUpload, UploadConflict
+
+
+def sha256(data):
+    return 'sha256', hashlib.sha256(data).hexdigest()
+
+
+class TestResumableUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        for target, name, value in (
+            (FileHandler, 'UPLOAD_FOLDER', self.tmp_dir),
+            (config, 'MIN_FREE_DISK_MB', 0),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, upload, offset, data, checksum=None):
+        return ResumableUpload.write_chunk(
+            upload['id'], offset, io.BytesIO(data), len(data), checksum or sha256(data)
+        )
+
+    def test_chunks_assembled_in_place(self):
+        data = os.urandom(300 * 1024)
+        upload = ResumableUpload.create('report.pdf', len(data))
+        for offset in range(0, len(data), 128 * 1024):
+            upload = self.send(upload, offset, data[offset:offset + 128 * 1024])
+        self.assertEqual(upload['offset'], len(data))
+
+        ResumableUpload.finalize(upload['id'])
+        path, filename, extension = ResumableUpload.claim(upload['id'], ['pdf'])
+        self.assertEqual((filename, extension), ('report.pdf', 'pdf'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_bad_checksum_not_kept(self):
+        upload = ResumableUpload.create('report.pdf', 8)
+        with self.assertRaises(ChecksumMismatch):
+            self.send(upload, 0, b'abcd', checksum=sha256(b'abce'))
+        self.assertEqual(ResumableUpload.get(upload['id'])['offset'], 0)
+
+        # The retry overwrites what the failed chunk wrote
+        self.assertEqual(self.send(upload, 0, b'abcd')['offset'], 4)
+
+    def test_dropped_chunk_resent(self):
+        upload = ResumableUpload.create('report.pdf', 8)
+        with self.assertRaises(ChecksumMismatch):
+            ResumableUpload.write_chunk(upload['id'], 0, io.BytesIO(b'ab'), 4, sha256(b'abcd'))
+        self.assertEqual(self.send(upload, 0, b'abcd')['offset'], 4)
+
+    def test_wrong_offset_conflicts(self):
+        upload = ResumableUpload.create('report.pdf', 8)
+        self.send(upload, 0, b'abcd')
+        with self.assertRaises(UploadConflict) as ctx:
+            self.send(upload, 0, b'abcd')
+        self.assertEqual(ctx.exception.offset, 4)
+        with self.assertRaises(ValueError):
+            self.send(upload, 4, b'abcdefgh')
+
+    def test_finalize_needs_every_byte(self):
+        upload = ResumableUpload.create('report.pdf', 8)
+        self.send(upload, 0, b'abcd')
+        with self.assertRaises(UploadConflict):
+            ResumableUpload.finalize(upload['id'])
+        with self.assertRaises(ValueError):
+            ResumableUpload.claim(upload['id'], ['pdf'])
+
+    def test_claimed_once(self):
+        upload = ResumableUpload.create('report.pdf', 4)
+        self.send(upload, 0, b'abcd')
+        ResumableUpload.finalize(upload['id'])
+
+        with self.assertRaises(ValueError):
+            ResumableUpload.claim(upload['id'], ['docx'])
+        ResumableUpload.claim(upload['id'], ['pdf'])
+        with self.assertRaises(ValueError):
+            ResumableUpload.claim(upload['id'], ['pdf'])
+
+    def test_create_validates(self):
+        with self.assertRaises(ValueError):
+            ResumableUpload.create('no-extension', 10)
+        with self.assertRaises(ValueError):
+            ResumableUpload.create('huge.pdf', FileHandler.MAX_FILE_SIZE + 1)
+        with self.assertRaises(ValueError):
+            ResumableUpload.parse_checksum('crc32 1234')
+        self.assertIsNone(ResumableUpload.get('../../etc/passwd'))
+
+
+if __name__ == '__main__':
+    unittest.main()
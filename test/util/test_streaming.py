@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from mock import patch
+
+import config
+from converters import registry as registry_module
+from converters.registry import ConverterRegistry
+from util import isolation, streaming
+
+PART = b'x' * 1000
+
+
+def copy_file(input_path, output_path):
+    shutil.copyfile(input_path, output_path)
+
+
+def write_slowly(input_path, output_path):
+    with open(output_path, 'wb', buffering=0) as f:
+        for _ in range(5):
+            f.write(PART)
+            time.sleep(0.05)
+
+
+def fail_midway(input_path, output_path):
+    with open(output_path, 'wb', buffering=0) as f:
+        f.write(PART)
+        time.sleep(0.05)
+        raise RuntimeError('encoder crashed')
+
+
+class FakeConverter:
+
+    STREAMED_FORMATS = ['s', 'f']
+
+    @staticmethod
+    def get_conversions():
+        return [
+            ('copy', 'a', 'b', 1.0, copy_file),
+            ('slow', 'b', 's', 1.0, write_slowly),
+            ('slow', 'a', 's', 1.0, write_slowly),
+            ('fail', 'a', 'f', 1.0, fail_midway),
+        ]
+
+
+@patch.object(config, 'CONVERSION_ISOLATION', True)
+@patch.object(config, 'CONVERSION_START_METHOD', 'fork')
+@patch.object(config, 'STREAM_OUTPUT', True)
+@patch.object(config, 'CONVERSION_TIMEOUT', 10)
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ConverterRegistry()
+        self.registry.register(FakeConverter)
+        patcher = patch.object(registry_module, '_registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.input_path = os.path.join(self.tmp_dir, 'input.a')
+        with open(self.input_path, 'w') as f:
+            f.write('data')
+        self.output_path = os.path.join(self.tmp_dir, 'output')
+
+    def start(self, path):
+        conversion = streaming.StreamedConversion(self.registry, path)
+        streamed = conversion.start(
+            self.input_path, self.output_path, lambda fmt: os.path.join(self.tmp_dir, f'intermediate.{fmt}')
+        )
+        return conversion, streamed
+
+    def test_output_followed_while_written(self):
+        path = [self.registry.get_edge('a', 'b'), self.registry.get_edge('b', 's')]
+        self.assertTrue(streaming.can_stream(path))
+        self.assertFalse(streaming.can_stream(path[:1]))
+
+        conversion, streamed = self.start(path)
+        self.assertTrue(streamed)
+        # The first bytes are there long before the converter is done
+        self.assertLess(os.path.getsize(self.output_path), len(PART) * 5)
+        self.assertEqual(b''.join(conversion.chunks(chunk_size=512)), PART * 5)
+        self.assertEqual(path[1].samples, 1)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['input.a', 'output'])
+
+    def test_failure_after_first_bytes(self):
+        conversion, streamed = self.start([self.registry.get_edge('a', 'f')])
+        self.assertTrue(streamed)
+        received = []
+        with self.assertRaises(isolation.ConversionError):
+            for chunk in conversion.chunks():
+                received.append(chunk)
+        self.assertEqual(b''.join(received), PART)
+
+    def test_close_stops_the_converter(self):
+        conversion, _ = self.start([self.registry.get_edge('a', 's')])
+        conversion.close()
+        self.assertFalse(conversion.child.process.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
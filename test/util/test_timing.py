@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from util import timing
+
+
+class TestTiming(unittest.TestCase):
+
+    def tearDown(self):
+        timing.finish()
+
+    def test_stage_outside_request_is_noop(self):
+        with timing.stage('tabula'):
+            pass
+        self.assertIsNone(timing.current())
+
+    def test_server_timing_header(self):
+        timing.start()
+        with timing.stage('save_upload'):
+            pass
+        timing.merge([('tabula', 12.5, None)])
+        with timing.stage('send', 'open output'):
+            pass
+
+        header = timing.finish().header()
+        self.assertRegex(header, r'^save_upload;dur=[\d.]+, tabula;dur=12\.5, send;desc="open output";dur=[\d.]+$')
+
+    def test_profile_written(self):
+        profile_dir = tempfile.mkdtemp()
+        try:
+            timing.start(profile_dir)
+            sum(range(1000))
+            timer = timing.finish()
+            files = os.listdir(profile_dir)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].endswith(f'{timer.profile_id}-request.prof'))
+        finally:
+            shutil.rmtree(profile_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()